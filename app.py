@@ -2,11 +2,30 @@ import streamlit as st
 import pandas as pd
 import mlflow
 import time
+import os
 import json
 import difflib
-from prompt_visualization.llm_engine import configure_genai, run_prompt_experiment
-from prompt_visualization.consistency_evaluator import calculate_consistency_metric
-from prompt_visualization.utils import get_clean_json
+from prompt_visualization.llm_engine import (
+    LLMEngine, configure_context_cache, configure_genai, get_engine, init_tracking, parse_model_spec, run_prompt_batch,
+    run_adaptive_experiment, run_model_comparison, DEFAULT_MAX_CONCURRENCY
+)
+from llm_providers.catalog import get_model_catalog
+from prompt_visualization.adaptive import AdaptiveStopRule
+from prompt_visualization.scheduler import configure_scheduler
+from prompt_visualization.response_cache import CACHE_MODES, OFF, configure_response_cache
+from prompt_visualization.context_cache import AUTO, OFF as CONTEXT_CACHE_OFF
+from prompt_visualization.session_store import SessionResultStore
+from prompt_visualization.consistency_evaluator import (
+    SIMILARITY_METHODS, IncrementalConsistencyEvaluator, compile_normalizer, field_consistency_from_outputs,
+    mean_pairwise_similarity, similarity_matrix_from_outputs
+)
+from prompt_visualization.embeddings import EMBEDDING_BACKENDS, HASHING, configure_embeddings
+from prompt_visualization.diffing import DEFAULT_PAGE_SIZE, diff_runs, field_variance_for_runs, paginate
+from prompt_visualization.normalizers import parse_field_specs
+from prompt_visualization.history_store import (
+    DEFAULT_HISTORY_PATH, configure_results_store, get_results_store, prompt_hash, summarize_history
+)
+from prompt_visualization.tracing import Trace
 import streamlit.components.v1 as components
 
 # --- Page Configuration and Initialization ---
@@ -18,7 +37,7 @@ st.title("LLM Prompt Consistency & Evaluation Tool")
 def get_mlflow_client():
     """Initializes and caches the MLflow client."""
     try:
-        mlflow.set_tracking_uri("http://localhost:5010")
+        init_tracking()
         client = mlflow.tracking.MlflowClient()
         client.search_experiments()
         return client
@@ -61,6 +80,8 @@ try:
     api_key = st.secrets["GOOGLE_API_KEY"]
     model_name = st.secrets.get("MODEL_NAME")
     configure_genai(api_key)
+    # The model catalog's Google provider reads the key from the environment
+    os.environ.setdefault("GOOGLE_API_KEY", api_key)
 except (KeyError, FileNotFoundError):
     st.error("`GOOGLE_API_KEY` not found. Please create a `.streamlit/secrets.toml` file.")
     st.stop()
@@ -74,19 +95,130 @@ if 'raw_json_input' not in st.session_state:
     st.session_state.raw_json_input = '{\n  "recipe_text": "A simple cake recipe with 2 cups of flour, 1 cup of sugar, and 3 eggs."\n}'
 if 'results' not in st.session_state:
     st.session_state.results = []
+if 'result_store' not in st.session_state:
+    # Results are spilled to disk per session and read back lazily on each rerun; only the
+    # batch on display is kept
+    st.session_state.result_store = SessionResultStore(max_batches=1)
+if 'comparison' not in st.session_state:
+    st.session_state.comparison = None
+if 'trace' not in st.session_state:
+    st.session_state.trace = None
 
 
 # --- Sidebar ---
 with st.sidebar:
     st.header("Experiment Configuration")
+    # Served from the on-disk catalog; a stale catalog is refreshed in the background.
+    # It lists through the engine's provider clients, so listing and running share them.
+    catalog = get_model_catalog(get_engine().get_provider)
+    # Gemini models go by their plain name, others as "<provider>:<model>"
+    model_options = [m.name.removeprefix("models/") if m.provider.lower() == "google"
+                     else f"{m.provider.lower()}:{m.name}"
+                     for m in catalog.list_models() if m.provider.lower() in LLMEngine.SUPPORTED_PROVIDERS]
+    if model_name and model_name not in model_options:
+        model_options.insert(0, model_name)
+    if model_options:
+        model_name = st.selectbox("Model", options=model_options,
+                                  index=model_options.index(model_name) if model_name else 0)
+    experiment_mode = st.radio("Experiment Mode", options=["Fixed", "Adaptive", "Compare Models"], horizontal=True,
+                               help="Adaptive mode keeps launching runs in parallel waves until the consistency "
+                                    "score, latency and token estimates reach the target precision. Compare Models "
+                                    "runs the same batch on several models at once.")
+    adaptive = experiment_mode == "Adaptive"
+    compare = experiment_mode == "Compare Models"
+    if compare:
+        compare_models = st.multiselect("Models to Compare", options=model_options,
+                                        default=[model_name] if model_name in model_options else [])
+    if adaptive:
+        num_runs_label = "Maximum Runs (Budget)"
+    else:
+        num_runs_label = "Runs per Model" if compare else "Number of Runs for Consistency Check"
     num_runs = st.number_input(
-        "Number of Runs for Consistency Check",
+        num_runs_label,
         min_value=1,
         max_value=100,
-        value=3,
+        value=50 if adaptive else 3,
         help="Max limit is 100",
         step=1,
     )
+    max_concurrency = st.number_input(
+        "Max Concurrent Requests",
+        min_value=1,
+        max_value=32,
+        value=DEFAULT_MAX_CONCURRENCY,
+        help="How many runs are sent to the model(s) at the same time",
+        step=1,
+    )
+    stream_responses = st.checkbox("Stream Responses", value=False, disabled=compare,
+                                   help="Stream each response to show partial output while runs are in flight "
+                                        "and log time-to-first-token and throughput metrics.")
+    if adaptive:
+        score_precision = st.number_input("Target Score Precision (±)", min_value=0.01, max_value=0.25, value=0.05,
+                                          step=0.01, help="Half-width of the 95% confidence interval of the "
+                                                          "consistency score.")
+        metric_precision = st.number_input("Target Latency/Token Precision (±%)", min_value=1, max_value=50,
+                                           value=10, step=1, help="Half-width of the 95% confidence interval of "
+                                                                  "mean latency and tokens, relative to the mean.")
+        stop_early = False
+    elif compare:
+        stop_early = False
+    else:
+        stop_early = st.checkbox("Stop Early When Score Is Stable", value=False,
+                                 help="Skip the remaining runs once the consistency score's 95% confidence "
+                                      "interval is narrower than the tolerance below.")
+        score_tolerance = st.number_input("Score Tolerance (±)", min_value=0.01, max_value=0.25, value=0.05,
+                                          step=0.01, disabled=not stop_early)
+    with st.expander("Consistency Fields"):
+        field_specs = st.text_area("Fields to Compare", value="", height=100,
+                                   placeholder="ingredients=$.ingredient_composition[*].name",
+                                   help="One `name=selector` per line, e.g. `items=$.items[*].name` or "
+                                        "`tags=$..tag`. Each field also gets its own consistency score. "
+                                        "Leave empty for the recipe ingredient names.")
+        try:
+            normalizer = compile_normalizer(parse_field_specs(field_specs.splitlines()) or None)
+        except ValueError as e:
+            st.error(str(e))
+            normalizer = compile_normalizer()
+        embedding_backend = st.selectbox("Embedding Backend", options=EMBEDDING_BACKENDS,
+                                         index=EMBEDDING_BACKENDS.index(HASHING),
+                                         help="Embeds items for the `semantic` similarity metric. `hashing` is "
+                                              "local and free; `gemini` uses Gemini's embedding model. Vectors "
+                                              "are cached on disk.")
+    if st.session_state.get("embedding_backend") != embedding_backend:
+        configure_embeddings(embedding_backend)
+        st.session_state.embedding_backend = embedding_backend
+    with st.expander("Rate Limits"):
+        requests_per_minute = st.number_input("Requests per Minute", min_value=0, value=0, step=1,
+                                              help="Provider request quota. 0 means unlimited.")
+        tokens_per_minute = st.number_input("Tokens per Minute", min_value=0, value=0, step=1000,
+                                            help="Provider token quota. 0 means unlimited.")
+    # Only rebuild the scheduler when the limits change so its adaptive state survives reruns
+    rate_limits = (model_name, requests_per_minute, tokens_per_minute)
+    if st.session_state.get("rate_limits") != rate_limits:
+        provider, provider_model = parse_model_spec(model_name)
+        configure_scheduler(provider_model, provider=provider, requests_per_minute=requests_per_minute or None,
+                            tokens_per_minute=tokens_per_minute or None)
+        st.session_state.rate_limits = rate_limits
+    cache_mode = st.selectbox("Response Cache", options=CACHE_MODES, index=CACHE_MODES.index(OFF),
+                              help="`read_write` reuses recorded responses for identical runs, `record` refreshes "
+                                   "them, and `replay` only serves recorded responses without calling the model.")
+    if st.session_state.get("cache_mode") != cache_mode:
+        configure_response_cache(cache_mode)
+        st.session_state.cache_mode = cache_mode
+    context_cache_mode = AUTO if st.checkbox(
+        "Provider Context Cache", value=True,
+        help="Cache a long system prompt on the provider's side once per batch, so repeats send only the input "
+             "and its tokens are billed at the cached rate.") else CONTEXT_CACHE_OFF
+    if st.session_state.get("context_cache_mode") != context_cache_mode:
+        configure_context_cache(context_cache_mode)
+        st.session_state.context_cache_mode = context_cache_mode
+    archive_runs = st.checkbox("Archive Runs Locally", value=False,
+                               help="Keep every run, output and system prompt included, as Parquet files for "
+                                    "the Experiment History section.")
+    history_path = st.text_input("Archive Directory", value=DEFAULT_HISTORY_PATH, disabled=not archive_runs)
+    if st.session_state.get("history_setting") != (archive_runs, history_path):
+        configure_results_store(history_path, enabled=archive_runs)
+        st.session_state.history_setting = (archive_runs, history_path)
     st.info(f"Using model: `{model_name}`")
 
     has_prompt_registry = hasattr(mlflow, 'search_prompts')
@@ -147,42 +279,148 @@ with col2:
 
 # --- Execution and Evaluation ---
 if st.button("Run Experiment", type="primary"):
+    experiment_name = "LLM_Consistency_Tests"
+    exp = client.get_experiment_by_name(experiment_name)
+    exp_id = exp.experiment_id if exp else client.create_experiment(experiment_name)
+
     if not st.session_state.system_prompt or not st.session_state.raw_json_input:
         st.error("Please provide both a system prompt and raw JSON input.")
-    else:
-        results = []
-        run_ids = []
-        experiment_name = "LLM_Consistency_Tests"
-        exp = client.get_experiment_by_name(experiment_name)
-        exp_id = exp.experiment_id if exp else client.create_experiment(experiment_name)
+    elif compare and len(compare_models) < 2:
+        st.error("Please select at least two models to compare.")
+    elif compare:
+        progress_bar = st.progress(0)
+        total_runs = num_runs * len(compare_models)
+
+        def update_comparison_progress(completed, model, index, result):
+            progress_bar.progress(min(1.0, completed / total_runs))
 
+        trace = Trace("comparison")
+        with st.spinner(f"Running {num_runs} runs on each of {len(compare_models)} models..."):
+            st.session_state.comparison = run_model_comparison(
+                st.session_state.raw_json_input, st.session_state.system_prompt, f"compare_{int(time.time())}",
+                compare_models, num_runs, max_concurrency=max_concurrency, on_result=update_comparison_progress,
+                normalizer=normalizer, trace=trace, experiment_id=exp_id)
+        st.session_state.results = []
+        st.session_state.trace = trace
+    else:
         progress_bar = st.progress(0)
-        for i in range(num_runs):
-            run_name = f"batch_{int(time.time())}_run_{i + 1}"
-            result = run_prompt_experiment(st.session_state.raw_json_input, st.session_state.system_prompt, run_name,
-                                           model_name)
-            results.append(result)
-            if result.get("run_id"):
-                run_ids.append(result["run_id"])
-            progress_bar.progress((i + 1) / num_runs)
-        st.session_state.results = results
+        live_score = st.empty()
+        live_output = st.empty()
+        partial_outputs = {}
+        last_refresh = [0.0]
+        batch_name = f"batch_{int(time.time())}"
+        trace = Trace(batch_name)
+        if adaptive:
+            stop_rule = AdaptiveStopRule(consistency_precision=score_precision,
+                                         metric_precision=metric_precision / 100, normalizer=normalizer)
+            evaluator = stop_rule.evaluator
+        else:
+            evaluator = IncrementalConsistencyEvaluator(normalizer=normalizer)
+
+        def update_progress(completed, index, result):
+            progress_bar.progress(min(1.0, completed / num_runs))
+            if not adaptive:
+                evaluator.add_result(result)
+            if evaluator.n > 1:
+                low, high = evaluator.confidence_interval()
+                live_score.metric("Live Consistency Score", f"{evaluator.score:.4f}",
+                                  help=f"95% confidence interval: {low:.3f} to {high:.3f}")
+
+        def show_partial_output(index, text):
+            partial_outputs[index] = text
+            # Redrawing the table on every chunk would swamp the browser
+            if time.time() - last_refresh[0] < 0.25:
+                return
+            last_refresh[0] = time.time()
+            live_output.table(pd.DataFrame([{"Run": i + 1, "Partial Output": partial_outputs[i][-200:]}
+                                            for i in sorted(partial_outputs)]))
+
+        chunk_callback = show_partial_output if stream_responses else None
+
+        def score_is_stable():
+            return evaluator.is_converged(tolerance=score_tolerance)
+
+        if adaptive:
+            results = run_adaptive_experiment(st.session_state.raw_json_input, st.session_state.system_prompt,
+                                              batch_name, model_name, stop_rule, max_runs=num_runs,
+                                              max_concurrency=max_concurrency, on_result=update_progress,
+                                              stream=stream_responses, on_chunk=chunk_callback, trace=trace,
+                                              experiment_id=exp_id)
+            if stop_rule.is_satisfied():
+                st.info(f"Target precision reached after {len(results)} of at most {num_runs} runs.")
+            else:
+                st.warning(f"Run budget of {num_runs} spent before reaching the target precision.")
+        else:
+            results = run_prompt_batch(st.session_state.raw_json_input, st.session_state.system_prompt,
+                                       batch_name, model_name, num_runs,
+                                       max_concurrency=max_concurrency, on_result=update_progress,
+                                       should_stop=score_is_stable if stop_early else None,
+                                       stream=stream_responses, on_chunk=chunk_callback, normalizer=normalizer,
+                                       trace=trace, experiment_id=exp_id)
+            if len(results) < num_runs:
+                st.info(f"Consistency score stabilized after {len(results)} of {num_runs} runs; "
+                        "the remaining runs were skipped.")
+        live_output.empty()
+        st.session_state.results = st.session_state.result_store.put(batch_name, results)
+        st.session_state.comparison = None
+        st.session_state.trace = trace
+
+# --- Display Model Comparison ---
+if st.session_state.comparison:
+    comparison = st.session_state.comparison
+    st.header("Model Comparison")
+
+    def format_value(value, pattern):
+        return pattern.format(value) if value is not None else "n/a"
+
+    st.table(pd.DataFrame([{
+        "Model": model,
+        "Passed": f"{entry['summary']['passed']}/{entry['summary']['runs']}",
+        "Latency p50 (s)": format_value(entry["summary"]["latency_p50"], "{:.2f}"),
+        "Latency p95 (s)": format_value(entry["summary"]["latency_p95"], "{:.2f}"),
+        "Total Tokens": format_value(entry["summary"]["total_tokens"], "{:,}"),
+        "Billed Tokens": format_value(entry["summary"]["billed_tokens"], "{:,}"),
+        "Cached Prompt Tokens": format_value(entry["summary"]["cached_prompt_tokens"], "{:,}"),
+        "Cost (USD)": format_value(entry["summary"]["cost"], "${:.4f}"),
+        "Consistency": format_value(entry["summary"]["consistency_score"], "{:.4f}"),
+    } for model, entry in comparison["models"].items()]))
+    st.caption(f"Logged as sibling runs under parent run `{comparison['parent_run_id']}`. "
+               "Cost uses list prices where known; runs served from the response cache are not billed.")
 
 # --- Display Results ---
 if st.session_state.results:
     results = st.session_state.results
     st.header("Experiment Run Results")
     display_data = [{"Run": i + 1, "Status": r["status"], "Latency (s)": f"{r['latency']:.2f}",
-                      "Output Preview": r["output_text"][:200] + "..."} for i, r in enumerate(results)]
+                     "Cached": "Yes" if r.get("cache_hit") else "No",
+                     "Output Preview": r.preview() + "..."} for i, r in enumerate(results)]
     st.table(pd.DataFrame(display_data))
 
     run_ids = [r["run_id"] for r in results if "run_id" in r]
     if client and len(run_ids) > 1:
         st.header("Consistency Evaluation")
-        exp_id = client.get_experiment_by_name("LLM_Consistency_Tests").experiment_id
-        consistency_score = calculate_consistency_metric(exp_id, run_ids, artifact_path="output.json")
-        client.log_metric(run_ids[0], "batch_consistency_score", consistency_score)
+        similarity_method = st.selectbox("Similarity Metric", options=SIMILARITY_METHODS,
+                                         help="Set similarity of the normalized items of each pair of runs. "
+                                              "`minhash` approximates Jaccard for very large batches; "
+                                              "`semantic` also matches paraphrased items (e.g. \"all-purpose "
+                                              "flour\" and \"flour, all purpose\").")
+        outputs = results.column("parsed_output")
+        similarity = similarity_matrix_from_outputs(outputs, method=similarity_method, normalizer=normalizer)
+        consistency_score = mean_pairwise_similarity(similarity)
+        parent_run_id = results[0].get("parent_run_id")
         st.metric("Batch Consistency Score", f"{consistency_score:.4f}")
-        st.caption(f"Score logged to parent run: `{run_ids[0]}`")
+        field_scores = field_consistency_from_outputs(outputs, normalizer, method=similarity_method)
+        if len(field_scores) > 1:
+            st.table(pd.DataFrame([{"Field": name, "Consistency": f"{score:.4f}"}
+                                   for name, score in field_scores.items()]))
+        if parent_run_id:
+            client.log_metric(parent_run_id, f"consistency_score_{similarity_method}", consistency_score)
+            for name, score in field_scores.items():
+                client.log_metric(parent_run_id, f"consistency_{name}_{similarity_method}", score)
+            st.caption(f"Score logged to parent run: `{parent_run_id}`")
+        with st.expander("Pairwise Similarity Matrix"):
+            labels = [f"Run {i + 1}" for i in range(len(results))]
+            st.dataframe(pd.DataFrame(similarity, index=labels, columns=labels).round(3))
 
     if len(results) > 1:
         st.header("Visual Diffing")
@@ -197,7 +435,111 @@ if st.session_state.results:
         run_a = results[run_options[run_a_idx]]
         run_b = results[run_options[run_b_idx]]
 
-        differ = difflib.HtmlDiff(wrapcolumn=80)
-        diff_html = differ.make_table(run_a['output_text'].splitlines(), run_b['output_text'].splitlines(),
-                                      fromdesc=f"Output of {run_a_idx}", todesc=f"Output of {run_b_idx}")
-        components.html(diff_html, height=600, scrolling=True)
+        # Structural diff of the parsed JSON (line diff for non-JSON outputs), memoized per run pair
+        hunks = diff_runs(run_a, run_b)
+        if not hunks:
+            st.success("The outputs are identical.")
+        else:
+            kinds = pd.Series([h["kind"] for h in hunks]).value_counts()
+            st.caption(", ".join(f"{count} {kind}" for kind, count in kinds.items()))
+            page_size = st.select_slider("Hunks per Page", options=[10, 20, 50, 100], value=DEFAULT_PAGE_SIZE)
+            num_pages = paginate(hunks, page_size=page_size)[1]
+            page = st.number_input("Page", min_value=1, max_value=num_pages, value=1, step=1) if num_pages > 1 else 1
+            page_hunks, _ = paginate(hunks, page=page, page_size=page_size)
+            for hunk in page_hunks:
+                with st.expander(f"{hunk['kind'].capitalize()}: `{hunk['path']}`"):
+                    old_col, new_col = st.columns(2)
+                    with old_col:
+                        st.caption(run_a_idx)
+                        st.code(json.dumps(hunk["old"], indent=2) if not isinstance(hunk["old"], str) else hunk["old"])
+                    with new_col:
+                        st.caption(run_b_idx)
+                        st.code(json.dumps(hunk["new"], indent=2) if not isinstance(hunk["new"], str) else hunk["new"])
+
+        if st.checkbox("Show Full Text Diff", value=False):
+            differ = difflib.HtmlDiff(wrapcolumn=80)
+            diff_html = differ.make_table(run_a['output_text'].splitlines(), run_b['output_text'].splitlines(),
+                                          fromdesc=f"Output of {run_a_idx}", todesc=f"Output of {run_b_idx}",
+                                          context=True)
+            components.html(diff_html, height=600, scrolling=True)
+
+        st.subheader("Field Variance Across Runs")
+        variance = field_variance_for_runs(results)
+        if not variance:
+            st.info("No run produced valid JSON.")
+        else:
+            variance_frame = pd.DataFrame(variance)
+            only_differing = st.checkbox("Only Fields That Differ", value=True)
+            if only_differing:
+                variance_frame = variance_frame[variance_frame["agreement"] < 1]
+            variance_frame["most_common"] = variance_frame["most_common"].map(lambda v: json.dumps(v)[:200])
+            st.dataframe(variance_frame.rename(columns={
+                "path": "Field", "present": "Present In", "distinct": "Distinct Values",
+                "agreement": "Agreement", "most_common": "Most Common Value",
+            }), hide_index=True)
+
+# --- Timing Breakdown ---
+if st.session_state.trace is not None and st.session_state.trace.spans:
+    trace = st.session_state.trace
+    st.header("Timing Breakdown")
+    st.write("Where the batch spent its time: the model, the tracking server, the consistency evaluator or "
+             "the engine itself. Times are summed over all runs, so they can exceed the wall time.")
+    breakdown = trace.breakdown()
+    metrics = trace.as_metrics()
+    breakdown_cols = st.columns(len(breakdown) + 1)
+    breakdown_cols[0].metric("Wall Time (s)", f"{metrics['time_wall']:.2f}")
+    for col, (category, seconds) in zip(breakdown_cols[1:], breakdown.items()):
+        col.metric(f"{category.capitalize()} (s)", f"{seconds:.2f}")
+    st.dataframe(pd.DataFrame([{"Stage": name, "Category": stage["category"], "Count": stage["count"],
+                                "Total (s)": stage["total"], "Mean (ms)": stage["mean"] * 1000,
+                                "Max (ms)": stage["max"] * 1000}
+                               for name, stage in trace.stage_totals().items()]).round(3), hide_index=True)
+    with st.expander("Waterfall"):
+        waterfall = pd.DataFrame(trace.waterfall())
+        st.vega_lite_chart(waterfall, {
+            "mark": {"type": "bar", "tooltip": True},
+            "encoding": {
+                "y": {"field": "lane", "type": "nominal", "sort": None, "title": None},
+                "x": {"field": "start", "type": "quantitative", "title": "Seconds"},
+                "x2": {"field": "end"},
+                "color": {"field": "category", "type": "nominal"},
+                "yOffset": {"field": "depth", "type": "ordinal"},
+                "detail": {"field": "stage", "type": "nominal"},
+            },
+        }, use_container_width=True)
+        st.caption("The full trace is logged to the parent run as `trace.json` "
+                   "(open it in Perfetto or chrome://tracing for a flame chart).")
+
+# --- Experiment History ---
+st.divider()
+st.header("Experiment History")
+with st.expander("Browse Past Runs"):
+    history_store = get_results_store()
+    if history_store is None:
+        st.info("Turn on *Archive Runs Locally* in the sidebar to keep a browsable history of runs.")
+    else:
+        history_col1, history_col2 = st.columns(2)
+        with history_col1:
+            days = st.number_input("Last N Days", min_value=1, max_value=365, value=7, step=1)
+            current_prompt_only = st.checkbox("Current System Prompt Only", value=False)
+        history = history_store.query(
+            prompt_hash=prompt_hash(st.session_state.system_prompt) if current_prompt_only else None,
+            since=time.time() - days * 86400,
+        )
+        with history_col2:
+            history_models = st.multiselect("Models", options=sorted(history["model_name"].dropna().unique()))
+        if history_models:
+            history = history[history["model_name"].isin(history_models)]
+
+        if history.empty:
+            st.info("No archived runs match these filters.")
+        else:
+            summary = summarize_history(history)
+            prompt_previews = history.drop_duplicates("prompt_hash").set_index("prompt_hash")["system_prompt"]
+            summary.insert(1, "prompt_preview", summary["prompt_hash"].map(lambda h: prompt_previews[h][:60]))
+            summary["last_run"] = pd.to_datetime(summary["last_run"], unit="s")
+            st.subheader(f"{len(history):,} runs")
+            st.dataframe(summary.round(3), hide_index=True)
+            st.dataframe(history.assign(timestamp=pd.to_datetime(history["timestamp"], unit="s"))
+                         [["timestamp", "model_name", "status", "latency", "total_token_count", "output_text"]]
+                         .head(500), hide_index=True)
@@ -1,24 +1,43 @@
+import importlib
 from .base import LLMProvider
-from .google import GoogleProvider
-from .openrouter import OpenRouterProvider
-from .huggingface import HuggingFaceProvider
 
-def get_provider(provider_name: str) -> LLMProvider:
+# Provider modules import their SDK at the top, so each one is only loaded when
+# that provider is first requested.
+_PROVIDER_CLASSES = {
+    "google": ("google", "GoogleProvider"),
+    "openrouter": ("openrouter", "OpenRouterProvider"),
+    "huggingface": ("huggingface", "HuggingFaceProvider"),
+    "mock": ("mock", "MockProvider"),
+}
+
+
+def _load_provider_class(provider_name):
+    module_name, class_name = _PROVIDER_CLASSES[provider_name]
+    module = importlib.import_module(f".{module_name}", __name__)
+    return getattr(module, class_name)
+
+
+def __getattr__(name):
+    # Keeps `from llm_providers import GoogleProvider` working without eager imports
+    for provider_name, (_, class_name) in _PROVIDER_CLASSES.items():
+        if name == class_name:
+            return _load_provider_class(provider_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def get_provider(provider_name: str, **options) -> LLMProvider:
     """
     Factory function to get an instance of a model provider.
 
     Args:
         provider_name: The name of the provider (e.g., 'google', 'openrouter').
+        **options: Passed to the provider's constructor (e.g. ``api_key`` for 'google').
 
     Returns:
         An instance of the corresponding LLMProvider class.
     """
     provider_name = provider_name.lower()
-    if provider_name == "google":
-        return GoogleProvider()
-    elif provider_name == "openrouter":
-        return OpenRouterProvider()
-    elif provider_name == "huggingface":
-        return HuggingFaceProvider()
-    else:
-        raise ValueError(f"Unknown provider: '{provider_name}'. Supported providers are 'google', 'openrouter', 'huggingface'.")
\ No newline at end of file
+    if provider_name not in _PROVIDER_CLASSES:
+        raise ValueError(f"Unknown provider: '{provider_name}'. "
+                         "Supported providers are 'google', 'openrouter', 'huggingface', 'mock'.")
+    return _load_provider_class(provider_name)(**options)
@@ -1,5 +1,19 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_BATCH_CONCURRENCY = 8
+
+# OpenAI-style finish reasons mapped onto the Gemini names the engine already logs
+_FINISH_REASONS = {
+    "stop": "STOP",
+    "eos_token": "STOP",
+    "length": "MAX_TOKENS",
+    "content_filter": "SAFETY",
+    "tool_calls": "TOOL_CALLS",
+}
 
 class Model:
     """A simple, standardized data structure for a model."""
@@ -10,10 +24,220 @@ class Model:
     def __repr__(self) -> str:
         return f"Model(name='{self.name}', provider='{self.provider}')"
 
+class Generation:
+    """
+    A standardized data structure for one model response.
+
+    ``usage`` uses the same keys on every provider (``prompt_token_count``,
+    ``candidates_token_count`` and ``total_token_count``, plus
+    ``cached_content_token_count`` when the provider reports how many of the prompt
+    tokens were served from its cache) and ``finish_reason`` the
+    Gemini names (``STOP``, ``MAX_TOKENS``, ``SAFETY``...), so results of different
+    providers can be compared directly. A failed call in a batch has ``error`` set.
+    """
+    def __init__(self, text: str, model: str, provider: str, latency: float,
+                 usage: Optional[Dict[str, Optional[int]]] = None, finish_reason: Optional[str] = None,
+                 error: Optional[str] = None):
+        self.text = text
+        self.model = model
+        self.provider = provider
+        self.latency = latency
+        self.usage = usage
+        self.finish_reason = finish_reason
+        self.error = error
+
+    def __repr__(self) -> str:
+        return (f"Generation(model='{self.model}', provider='{self.provider}', latency={self.latency:.2f}, "
+                f"finish_reason='{self.finish_reason}')")
+
+class ContextCache:
+    """
+    A handle on a provider-side cache of a system prompt.
+
+    Calls made with the handle send only the user message; the provider reads the
+    cached prefix instead of processing (and billing) it again at the full input price.
+
+    Args:
+        name: The provider's name for the cache.
+        model: The model the cache was created for; it can't be used with another.
+        provider: The provider's display name.
+        token_count: Tokens held by the cache, if the provider reports them.
+        expire_time: When the cache expires, as a ``time.time()`` value.
+        resource: The provider SDK's own object for the cache, if any.
+    """
+    def __init__(self, name: str, model: str, provider: str, token_count: Optional[int] = None,
+                 expire_time: Optional[float] = None, resource=None):
+        self.name = name
+        self.model = model
+        self.provider = provider
+        self.token_count = token_count
+        self.expire_time = expire_time
+        self.resource = resource
+
+    def expires_in(self, now: Optional[float] = None) -> float:
+        """Seconds until the cache expires (infinite if it doesn't)."""
+        if self.expire_time is None:
+            return float("inf")
+        return self.expire_time - (time.time() if now is None else now)
+
+    def __repr__(self) -> str:
+        return f"ContextCache(name='{self.name}', model='{self.model}', provider='{self.provider}')"
+
+def normalize_finish_reason(reason) -> Optional[str]:
+    """Maps a provider's finish reason onto the Gemini names."""
+    if reason is None:
+        return None
+    reason = getattr(reason, "name", reason)
+    return _FINISH_REASONS.get(str(reason).lower(), str(reason).upper())
+
+def normalize_usage(prompt_tokens=None, completion_tokens=None, total_tokens=None,
+                    cached_tokens=None) -> Dict[str, Optional[int]]:
+    """
+    Builds a usage dict with the engine's token count keys.
+
+    ``prompt_token_count`` includes the cached tokens; ``cached_content_token_count``
+    is only added when the provider reported a count.
+    """
+    if total_tokens is None and prompt_tokens is not None and completion_tokens is not None:
+        total_tokens = prompt_tokens + completion_tokens
+    usage = {
+        "prompt_token_count": prompt_tokens,
+        "candidates_token_count": completion_tokens,
+        "total_token_count": total_tokens,
+    }
+    if isinstance(cached_tokens, int):
+        usage["cached_content_token_count"] = cached_tokens
+    return usage
+
+def chat_messages(prompt: str, system_prompt: Optional[str] = None) -> List[dict]:
+    """Builds the message list of an OpenAI-compatible chat completion request."""
+    messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+def chat_completion_kwargs(generation_config: Optional[dict]) -> dict:
+    """Translates a Gemini-style generation config into chat completion arguments."""
+    config = dict(generation_config or {})
+    if "max_output_tokens" in config:
+        config["max_tokens"] = config.pop("max_output_tokens")
+    return config
+
+def generation_from_chat_completion(response, model_name: str, provider: str, latency: float) -> Generation:
+    """Normalizes an OpenAI-compatible chat completion response."""
+    choice = response.choices[0]
+    usage = getattr(response, "usage", None)
+    # OpenAI-compatible APIs cache long prompt prefixes on their own and report the hits here
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    return Generation(
+        text=choice.message.content or "",
+        model=model_name,
+        provider=provider,
+        latency=latency,
+        usage=normalize_usage(getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None),
+                              getattr(usage, "total_tokens", None), cached_tokens) if usage else None,
+        finish_reason=normalize_finish_reason(choice.finish_reason),
+    )
+
 class LLMProvider(ABC):
-    """Abstract base class for a generic LLM provider."""
+    """
+    Abstract base class for a generic LLM provider.
+
+    Concrete providers hold one long-lived API client, so every call made through
+    the same provider instance reuses its connection pool.
+    """
+
+    display_name = "Unknown"
+    # Whether create_context_cache can return a handle
+    supports_context_cache = False
 
     @abstractmethod
     def list_models(self) -> List[Model]:
         """Lists all generative models available from the provider."""
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def generate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                 generation_config: Optional[dict] = None) -> Generation:
+        """
+        Generates one response.
+
+        Args:
+            model_name: The provider's name for the model.
+            prompt: The user message.
+            system_prompt: Optional system instructions.
+            generation_config: Sampling options in Gemini terms (``temperature``,
+                ``top_p``, ``max_output_tokens``...).
+
+        Providers that support context caching also take a ``context_cache`` handle
+        (see :meth:`create_context_cache`); the system prompt is then read from it.
+
+        Returns:
+            The normalized response.
+        """
+        pass
+
+    def create_context_cache(self, model_name: str, system_prompt: str, ttl: float) -> Optional[ContextCache]:
+        """
+        Caches ``system_prompt`` on the provider's side for ``ttl`` seconds, so calls
+        that pass the returned handle don't send it again.
+
+        Returns:
+            The cache handle, or None if the provider has no explicit caching.
+        """
+        return None
+
+    def delete_context_cache(self, context_cache: ContextCache) -> None:
+        """Deletes a cache made by :meth:`create_context_cache` before it expires."""
+
+    async def agenerate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                        generation_config: Optional[dict] = None, **kwargs) -> Generation:
+        """Async counterpart of ``generate``; runs it in a worker thread unless overridden."""
+        return await asyncio.to_thread(self.generate, model_name, prompt, system_prompt, generation_config, **kwargs)
+
+    def stream(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+               generation_config: Optional[dict] = None,
+               on_chunk: Optional[Callable[[str], None]] = None, **kwargs) -> Generation:
+        """
+        Generates one response, passing each piece of text to ``on_chunk`` as it arrives.
+
+        Providers without streaming support deliver the whole response as one chunk.
+        Other keyword arguments (e.g. ``context_cache``) are passed on to ``generate``.
+
+        Returns:
+            The complete normalized response.
+        """
+        generation = self.generate(model_name, prompt, system_prompt, generation_config, **kwargs)
+        if on_chunk:
+            on_chunk(generation.text)
+        return generation
+
+    async def astream(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                      generation_config: Optional[dict] = None,
+                      on_chunk: Optional[Callable[[str], None]] = None, **kwargs) -> Generation:
+        """Async counterpart of ``stream``; runs it in a worker thread unless overridden."""
+        return await asyncio.to_thread(self.stream, model_name, prompt, system_prompt, generation_config, on_chunk,
+                                       **kwargs)
+
+    def generate_batch(self, model_name: str, prompts: List[str], system_prompt: Optional[str] = None,
+                       generation_config: Optional[dict] = None,
+                       max_concurrency: int = DEFAULT_BATCH_CONCURRENCY) -> List[Generation]:
+        """
+        Generates a response for each prompt with bounded concurrency.
+
+        A failed call does not abort the batch; its ``Generation`` has ``error`` set.
+
+        Returns:
+            The responses in ``prompts`` order.
+        """
+        def generate_one(prompt):
+            start_time = time.time()
+            try:
+                return self.generate(model_name, prompt, system_prompt, generation_config)
+            except Exception as e:
+                return Generation(text="", model=model_name, provider=self.display_name,
+                                  latency=time.time() - start_time, error=str(e))
+
+        if not prompts:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(prompts)))) as executor:
+            return list(executor.map(generate_one, prompts))
@@ -0,0 +1,159 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from . import get_provider
+from .base import LLMProvider, Model
+
+DEFAULT_CATALOG_PATH = os.path.join(".cache", "model_catalog.json")
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_PROVIDERS = ("google", "openrouter", "huggingface")
+
+
+class ModelCatalog:
+    """
+    Merged model listing of several providers, cached on disk.
+
+    Listings are fetched from all providers concurrently. A fresh cache is served
+    as is; a stale one is served immediately while a background refresh replaces
+    it (stale-while-revalidate), so only the very first listing waits on the network.
+    Provider instances, and the API clients they hold, are created once and reused.
+
+    Args:
+        providers: Names of the providers to list (see ``get_provider``).
+        path: The JSON file the catalog is cached in.
+        ttl_seconds: How long a listing is considered fresh.
+        provider_factory: Returns the provider instance for a name, e.g. the engine's
+            ``get_provider``, so listing and running models share one client per
+            provider. By default the catalog creates and keeps its own instances.
+    """
+
+    def __init__(self, providers=DEFAULT_PROVIDERS, path: str = DEFAULT_CATALOG_PATH,
+                 ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 provider_factory: Optional[Callable[[str], LLMProvider]] = None):
+        self.provider_names = tuple(p.lower() for p in providers)
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.provider_factory = provider_factory
+        self._providers: Dict[str, LLMProvider] = {}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._catalog = None
+
+    def get_provider(self, provider_name: str) -> LLMProvider:
+        """Returns the reused provider instance for ``provider_name``, creating it once."""
+        provider_name = provider_name.lower()
+        if self.provider_factory is not None:
+            return self.provider_factory(provider_name)
+        with self._lock:
+            provider = self._providers.get(provider_name)
+        if provider is None:
+            provider = get_provider(provider_name)
+            with self._lock:
+                provider = self._providers.setdefault(provider_name, provider)
+        return provider
+
+    def _list_provider(self, provider_name):
+        try:
+            models = self.get_provider(provider_name).list_models()
+        except Exception as e:
+            # A missing API key just means the provider isn't configured
+            print(f"Could not list models from '{provider_name}': {e}")
+            return None
+        return [{"name": m.name, "provider": m.provider} for m in models]
+
+    def _load(self):
+        if self._catalog is None and os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self._catalog = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._catalog = None
+        return self._catalog
+
+    def _save(self, catalog):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self):
+        """
+        Lists every provider concurrently and stores the merged catalog.
+
+        Providers that fail keep the models of their last successful listing.
+
+        Returns:
+            dict: The new catalog.
+        """
+        with self._refresh_lock:
+            with ThreadPoolExecutor(max_workers=len(self.provider_names) or 1,
+                                    thread_name_prefix="model-catalog") as executor:
+                listings = dict(zip(self.provider_names, executor.map(self._list_provider, self.provider_names)))
+            previous = (self._load() or {}).get("models", {})
+            models = {name: listing if listing is not None else previous.get(name, [])
+                      for name, listing in listings.items()}
+            catalog = {"fetched_at": time.time(), "models": models}
+            try:
+                self._save(catalog)
+            except OSError as e:
+                print(f"Could not write model catalog to {self.path}: {e}")
+            self._catalog = catalog
+            return catalog
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self.refresh, name="model-catalog-refresh", daemon=True)
+            self._refresh_thread.start()
+
+    def is_stale(self) -> bool:
+        catalog = self._load()
+        return catalog is None or time.time() - catalog.get("fetched_at", 0) > self.ttl_seconds
+
+    def list_models(self, provider: Optional[str] = None) -> List[Model]:
+        """
+        Lists the models of all providers, or of one provider.
+
+        Only blocks when there is no cached catalog at all.
+        """
+        catalog = self._load()
+        if catalog is None:
+            catalog = self.refresh()
+        elif self.is_stale():
+            self._refresh_in_background()
+        names = [provider.lower()] if provider else self.provider_names
+        return [Model(name=m["name"], provider=m["provider"])
+                for name in names for m in catalog["models"].get(name, [])]
+
+    def wait_for_refresh(self, timeout: Optional[float] = None):
+        """Waits for a running background refresh to finish."""
+        thread = self._refresh_thread
+        if thread is not None:
+            thread.join(timeout)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_model_catalog(provider_factory: Optional[Callable[[str], LLMProvider]] = None) -> ModelCatalog:
+    """
+    Returns the process-wide model catalog.
+
+    Args:
+        provider_factory: Where the catalog gets its provider instances from (see
+            :class:`ModelCatalog`); replaces the one it had when given.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = ModelCatalog(provider_factory=provider_factory)
+        elif provider_factory is not None:
+            _catalog.provider_factory = provider_factory
+        return _catalog
@@ -1,13 +1,25 @@
+import datetime
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 import google.generativeai as genai
-from typing import List
-from .base import LLMProvider, Model
+from google.generativeai import caching
+from typing import List, Optional
+from .base import ContextCache, Generation, LLMProvider, Model, normalize_finish_reason, normalize_usage
+
+# Model clients kept per provider; every distinct system prompt gets its own
+MAX_CACHED_MODELS = 32
 
 class GoogleProvider(LLMProvider):
     """Concrete implementation for the Google Generative AI provider."""
 
-    def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
+    display_name = "Google"
+    supports_context_cache = True
+
+    def __init__(self, api_key: Optional[str] = None):
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("'GOOGLE_API_KEY' environment variable not set.")
 
@@ -15,11 +27,100 @@ class GoogleProvider(LLMProvider):
             genai.configure(api_key=api_key)
         except Exception as e:
             raise ConnectionError(f"Failed to configure Google AI client: {e}") from e
+        # One client per (model, system prompt) or (model, context cache), least recently
+        # used first; the SDK keeps its channels on the client and binds the system prompt
+        # at construction
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
 
     def list_models(self) -> List[Model]:
         """Lists all generative models from Google."""
         models = []
         for m in genai.list_models():
             if 'generateContent' in m.supported_generation_methods:
-                models.append(Model(name=m.name, provider="Google"))
-        return models
\ No newline at end of file
+                models.append(Model(name=m.name, provider=self.display_name))
+        return models
+
+    def get_model(self, model_name: str, system_prompt: Optional[str] = None,
+                  context_cache: Optional[ContextCache] = None):
+        """
+        Returns the cached ``GenerativeModel`` for ``model_name`` with ``system_prompt`` as
+        its system instruction, creating it once. With a ``context_cache`` handle, the
+        client reads the system instruction from the cache.
+        """
+        key = self._model_key(model_name, system_prompt, context_cache)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+            else:
+                if context_cache is not None:
+                    # The system instruction is part of the cached content
+                    model = genai.GenerativeModel.from_cached_content(context_cache.resource)
+                elif system_prompt:
+                    model = genai.GenerativeModel(model_name, system_instruction=system_prompt)
+                else:
+                    model = genai.GenerativeModel(model_name)
+                self._models[key] = model
+                if len(self._models) > MAX_CACHED_MODELS:
+                    self._models.popitem(last=False)
+        return model
+
+    @staticmethod
+    def _model_key(model_name: str, system_prompt: Optional[str], context_cache: Optional[ContextCache] = None):
+        if context_cache is not None:
+            return model_name, "context_cache", context_cache.name
+        # A hash keeps long prompts out of the key
+        digest = hashlib.sha256(system_prompt.encode("utf-8")).hexdigest() if system_prompt else None
+        return model_name, "system_prompt", digest
+
+    def create_context_cache(self, model_name: str, system_prompt: str, ttl: float) -> ContextCache:
+        """
+        Creates a Gemini cached content holding ``system_prompt`` for ``ttl`` seconds.
+
+        Gemini only caches prompts above a model-specific minimum size (1,024 tokens
+        and up); below it this raises the API's error.
+        """
+        cached = caching.CachedContent.create(model=model_name, system_instruction=system_prompt,
+                                              ttl=datetime.timedelta(seconds=ttl))
+        usage = getattr(cached, "usage_metadata", None)
+        token_count = getattr(usage, "total_token_count", None)
+        return ContextCache(name=cached.name, model=model_name, provider=self.display_name,
+                            token_count=token_count if isinstance(token_count, int) else None,
+                            expire_time=time.time() + ttl, resource=cached)
+
+    def delete_context_cache(self, context_cache: ContextCache) -> None:
+        """Deletes a cached content before it expires."""
+        context_cache.resource.delete()
+        with self._lock:
+            self._models.pop(self._model_key(context_cache.model, None, context_cache), None)
+
+    def _generation(self, response, model_name: str, latency: float) -> Generation:
+        usage = getattr(response, "usage_metadata", None)
+        candidates = getattr(response, "candidates", None)
+        return Generation(
+            text=response.text,
+            model=model_name,
+            provider=self.display_name,
+            latency=latency,
+            usage=normalize_usage(usage.prompt_token_count, usage.candidates_token_count, usage.total_token_count,
+                                  getattr(usage, "cached_content_token_count", None)) if usage else None,
+            finish_reason=normalize_finish_reason(candidates[0].finish_reason) if candidates else None,
+        )
+
+    def generate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                 generation_config: Optional[dict] = None, context_cache: Optional[ContextCache] = None) -> Generation:
+        """Generates one response with Gemini, reading the system prompt from ``context_cache`` if given."""
+        model = self.get_model(model_name, system_prompt, context_cache)
+        start_time = time.time()
+        response = model.generate_content(prompt, generation_config=generation_config)
+        return self._generation(response, model_name, time.time() - start_time)
+
+    async def agenerate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                        generation_config: Optional[dict] = None,
+                        context_cache: Optional[ContextCache] = None) -> Generation:
+        """Generates one response with Gemini's native async API."""
+        model = self.get_model(model_name, system_prompt, context_cache)
+        start_time = time.time()
+        response = await model.generate_content_async(prompt, generation_config=generation_config)
+        return self._generation(response, model_name, time.time() - start_time)
@@ -1,20 +1,34 @@
 import os
-from huggingface_hub import HfApi
-from typing import List
-from .base import LLMProvider, Model
+import time
+from huggingface_hub import HfApi, InferenceClient
+from typing import List, Optional
+from .base import (
+    Generation, LLMProvider, Model, chat_completion_kwargs, chat_messages, generation_from_chat_completion
+)
 
 class HuggingFaceProvider(LLMProvider):
     """Concrete implementation for the Hugging Face Hub provider."""
 
+    display_name = "HuggingFace"
+
     def __init__(self):
         # The token is optional for listing public models but good practice
         token = os.getenv("HUGGINGFACE_API_KEY")
         self.client = HfApi(token=token)
+        self.inference_client = InferenceClient(token=token)
 
     def list_models(self) -> List[Model]:
         """Lists text-generation models from Hugging Face Hub."""
         models = []
         # Filter for popular text generation models
         for m in self.client.list_models(filter="text-generation", sort="likes", direction=-1, limit=50):
-            models.append(Model(name=m.id, provider="HuggingFace"))
-        return models
\ No newline at end of file
+            models.append(Model(name=m.id, provider=self.display_name))
+        return models
+
+    def generate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                 generation_config: Optional[dict] = None) -> Generation:
+        """Generates one response through the Inference API's chat completion endpoint."""
+        start_time = time.time()
+        response = self.inference_client.chat_completion(chat_messages(prompt, system_prompt), model=model_name,
+                                                         **chat_completion_kwargs(generation_config))
+        return generation_from_chat_completion(response, model_name, self.display_name, time.time() - start_time)
@@ -0,0 +1,220 @@
+import asyncio
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from typing import Callable, List, Optional
+from .base import ContextCache, Generation, LLMProvider, Model, normalize_usage
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "lognormal")
+_OPTIONS = ("latency", "latency_distribution", "latency_spread", "rate_limit_rate", "error_rate", "num_items",
+            "variability", "chatter", "chunk_size", "first_token_fraction", "prompt_latency", "seed")
+
+class MockProviderError(Exception):
+    """A simulated API error; ``status_code`` is read by the engine's scheduler like a real one."""
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class MockProvider(LLMProvider):
+    """
+    Deterministic, offline stand-in for a real provider, for tests and benchmarks.
+
+    Responses are recipe-style JSON (``{"ingredient_composition": [{"name": ...}]}``)
+    so the consistency evaluator has something to score. Latency, failures, output
+    variability and streaming are simulated from a seeded random generator: the same
+    seed and options give the same sequence of responses. With concurrent calls, which
+    run gets which response depends on scheduling.
+
+    Context caching is simulated too: :meth:`create_context_cache` returns a handle,
+    and calls made with it report the system prompt as cached tokens and skip its
+    prefill time (``prompt_latency``), as a provider reading a cached prefix would.
+
+    Args:
+        latency: Mean response latency in seconds.
+        latency_distribution: ``"constant"``, ``"uniform"`` (mean ± ``latency_spread``)
+            or ``"lognormal"`` (``latency_spread`` is the log-space sigma).
+        latency_spread: Spread of the latency distribution.
+        rate_limit_rate: Probability that a call fails with a 429.
+        error_rate: Probability that a call fails with a (retryable) 503.
+        num_items: Ingredients per response; raise it to simulate large outputs.
+        variability: Probability that each ingredient differs from the reference answer.
+        chatter: Probability that the JSON comes wrapped in a fenced block and prose.
+        chunk_size: Characters per chunk when streaming.
+        first_token_fraction: Share of the latency spent before the first chunk.
+        prompt_latency: Seconds per 1,000 uncached prompt tokens, spent before the
+            first chunk on top of ``latency``.
+        seed: Seed of the random generator.
+    """
+
+    display_name = "Mock"
+    supports_context_cache = True
+
+    def __init__(self, latency: float = 0.05, latency_distribution: str = "lognormal", latency_spread: float = 0.25,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, num_items: int = 8,
+                 variability: float = 0.1, chatter: float = 0.0, chunk_size: int = 16,
+                 first_token_fraction: float = 0.3, prompt_latency: float = 0.0, seed: int = 0):
+        self._lock = threading.Lock()
+        self._context_caches = {}
+        self._cache_ids = itertools.count(1)
+        self.configure(latency=latency, latency_distribution=latency_distribution, latency_spread=latency_spread,
+                       rate_limit_rate=rate_limit_rate, error_rate=error_rate, num_items=num_items,
+                       variability=variability, chatter=chatter, chunk_size=chunk_size,
+                       first_token_fraction=first_token_fraction, prompt_latency=prompt_latency, seed=seed)
+
+    def configure(self, **options):
+        """Changes any of the constructor options; changing ``seed`` restarts the sequence."""
+        unknown = set(options) - set(_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown mock provider options: {', '.join(sorted(unknown))}.")
+        if options.get("latency_distribution", LATENCY_DISTRIBUTIONS[0]) not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: '{options['latency_distribution']}'. "
+                             f"Supported distributions are {', '.join(LATENCY_DISTRIBUTIONS)}.")
+        with self._lock:
+            for name, value in options.items():
+                setattr(self, name, value)
+            if "seed" in options:
+                self._rng = random.Random(options["seed"])
+                self.calls = 0
+
+    def list_models(self) -> List[Model]:
+        """Lists the simulated models; any model name is accepted by ``generate``."""
+        return [Model(name=name, provider=self.display_name) for name in ("mock-fast", "mock-slow")]
+
+    def create_context_cache(self, model_name: str, system_prompt: str, ttl: float) -> ContextCache:
+        """Simulates caching ``system_prompt`` for ``model_name`` for ``ttl`` seconds."""
+        context_cache = ContextCache(name=f"cachedContents/mock-{next(self._cache_ids)}", model=model_name,
+                                     provider=self.display_name, token_count=len(system_prompt) // 4,
+                                     expire_time=time.time() + ttl)
+        with self._lock:
+            self._context_caches[context_cache.name] = context_cache
+        return context_cache
+
+    def delete_context_cache(self, context_cache: ContextCache) -> None:
+        """Deletes a simulated cache."""
+        with self._lock:
+            self._context_caches.pop(context_cache.name, None)
+
+    def _cached_tokens(self, model_name, context_cache):
+        # An unknown, expired or other model's cache fails like a real one would
+        with self._lock:
+            cached = self._context_caches.get(context_cache.name)
+        if cached is None or cached.model != model_name or cached.expires_in() <= 0:
+            raise MockProviderError(f"404 Cached content {context_cache.name} not found (simulated).", 404)
+        return cached.token_count
+
+    def _next_call(self):
+        # Each call gets its own generator, drawn in call order from the seeded one
+        with self._lock:
+            self.calls += 1
+            return random.Random(self._rng.getrandbits(64))
+
+    def _latency(self, rng):
+        if self.latency_distribution == "constant":
+            return self.latency
+        if self.latency_distribution == "uniform":
+            return max(0.0, rng.uniform(self.latency - self.latency_spread, self.latency + self.latency_spread))
+        # Lognormal with the requested mean
+        sigma = self.latency_spread
+        return rng.lognormvariate(math.log(max(self.latency, 1e-9)) - sigma ** 2 / 2, sigma)
+
+    def _text(self, rng):
+        items = []
+        for i in range(self.num_items):
+            name = f"ingredient {i}"
+            if rng.random() < self.variability:
+                name = f"{name} variant {rng.randrange(3)}"
+            items.append({"name": name, "quantity": rng.randrange(1, 500)})
+        text = json.dumps({"ingredient_composition": items})
+        if rng.random() < self.chatter:
+            text = f"Here is the extracted recipe:\n```json\n{text}\n```\nLet me know if you need anything else."
+        return text
+
+    def _plan(self, model_name, prompt, system_prompt, context_cache=None):
+        """
+        Draws everything about one call up front: its prefill time (before the first
+        token), its generation latency, its failure and its output.
+        """
+        if context_cache is not None:
+            cached_tokens = self._cached_tokens(model_name, context_cache)
+            prompt_tokens = cached_tokens + len(prompt) // 4
+        else:
+            cached_tokens = None
+            prompt_tokens = len(f"{system_prompt or ''}{prompt}") // 4
+        prefill = self.prompt_latency * (prompt_tokens - (cached_tokens or 0)) / 1000
+        rng = self._next_call()
+        latency = self._latency(rng)
+        failure = rng.random()
+        error = None
+        if failure < self.rate_limit_rate:
+            error = MockProviderError("429 Resource has been exhausted (simulated).", 429)
+        elif failure < self.rate_limit_rate + self.error_rate:
+            error = MockProviderError("503 The service is currently unavailable (simulated).", 503)
+        text = self._text(rng)
+        usage = normalize_usage(prompt_tokens, len(text) // 4, cached_tokens=cached_tokens)
+        return prefill, latency, error, text, usage
+
+    def _chunks(self, text):
+        size = max(1, int(self.chunk_size))
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def generate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                 generation_config: Optional[dict] = None, context_cache: Optional[ContextCache] = None) -> Generation:
+        """Sleeps for the simulated latency and returns (or raises) the simulated response."""
+        prefill, latency, error, text, usage = self._plan(model_name, prompt, system_prompt, context_cache)
+        time.sleep(prefill + latency)
+        if error is not None:
+            raise error
+        return Generation(text=text, model=model_name, provider=self.display_name, latency=prefill + latency,
+                          usage=usage, finish_reason="STOP")
+
+    async def agenerate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                        generation_config: Optional[dict] = None,
+                        context_cache: Optional[ContextCache] = None) -> Generation:
+        """Async counterpart of ``generate``; waits without holding a thread."""
+        prefill, latency, error, text, usage = self._plan(model_name, prompt, system_prompt, context_cache)
+        await asyncio.sleep(prefill + latency)
+        if error is not None:
+            raise error
+        return Generation(text=text, model=model_name, provider=self.display_name, latency=prefill + latency,
+                          usage=usage, finish_reason="STOP")
+
+    def stream(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+               generation_config: Optional[dict] = None,
+               on_chunk: Optional[Callable[[str], None]] = None,
+               context_cache: Optional[ContextCache] = None) -> Generation:
+        """Delivers the simulated response in ``chunk_size`` pieces spread over its latency."""
+        prefill, latency, error, text, usage = self._plan(model_name, prompt, system_prompt, context_cache)
+        time.sleep(prefill + latency * self.first_token_fraction)
+        if error is not None:
+            raise error
+        chunks = self._chunks(text)
+        gap = latency * (1 - self.first_token_fraction) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(gap)
+            if on_chunk:
+                on_chunk(chunk)
+        return Generation(text=text, model=model_name, provider=self.display_name, latency=prefill + latency,
+                          usage=usage, finish_reason="STOP")
+
+    async def astream(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                      generation_config: Optional[dict] = None,
+                      on_chunk: Optional[Callable[[str], None]] = None,
+                      context_cache: Optional[ContextCache] = None) -> Generation:
+        """Async counterpart of ``stream``."""
+        prefill, latency, error, text, usage = self._plan(model_name, prompt, system_prompt, context_cache)
+        await asyncio.sleep(prefill + latency * self.first_token_fraction)
+        if error is not None:
+            raise error
+        chunks = self._chunks(text)
+        gap = latency * (1 - self.first_token_fraction) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(gap)
+            if on_chunk:
+                on_chunk(chunk)
+        return Generation(text=text, model=model_name, provider=self.display_name, latency=prefill + latency,
+                          usage=usage, finish_reason="STOP")
@@ -1,25 +1,68 @@
+import asyncio
 import os
-from openai import OpenAI
-from typing import List
-from .base import LLMProvider, Model
+import threading
+import time
+import weakref
+from openai import AsyncOpenAI, OpenAI
+from typing import List, Optional
+from .base import (
+    Generation, LLMProvider, Model, chat_completion_kwargs, chat_messages, generation_from_chat_completion
+)
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
 
 class OpenRouterProvider(LLMProvider):
     """Concrete implementation for the OpenRouter provider."""
 
+    display_name = "OpenRouter"
+
     def __init__(self):
         api_key = os.getenv("OPENROUTER_API_KEY")
         if not api_key:
             raise ValueError("'OPENROUTER_API_KEY' environment variable not set.")
 
+        self._api_key = api_key
         self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
+            base_url=OPENROUTER_BASE_URL,
             api_key=api_key,
         )
+        # Its connection pool is bound to the event loop it was created on, so each loop
+        # (e.g. each asyncio.run) gets its own, dropped along with the loop
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """The async client of the running event loop, created on first use there."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = AsyncOpenAI(base_url=OPENROUTER_BASE_URL, api_key=self._api_key)
+                self._async_clients[loop] = client
+        return client
 
     def list_models(self) -> List[Model]:
         """Lists all models available from OpenRouter."""
         models = []
         response = self.client.models.list()
         for m in response.data:
-            models.append(Model(name=m.id, provider="OpenRouter"))
-        return models
\ No newline at end of file
+            models.append(Model(name=m.id, provider=self.display_name))
+        return models
+
+    def generate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                 generation_config: Optional[dict] = None) -> Generation:
+        """Generates one response through OpenRouter's chat completions API."""
+        start_time = time.time()
+        response = self.client.chat.completions.create(model=model_name, messages=chat_messages(prompt, system_prompt),
+                                                       **chat_completion_kwargs(generation_config))
+        return generation_from_chat_completion(response, model_name, self.display_name, time.time() - start_time)
+
+    async def agenerate(self, model_name: str, prompt: str, system_prompt: Optional[str] = None,
+                        generation_config: Optional[dict] = None) -> Generation:
+        """Generates one response with the async client."""
+        start_time = time.time()
+        response = await self.async_client.chat.completions.create(
+            model=model_name, messages=chat_messages(prompt, system_prompt), **chat_completion_kwargs(generation_config)
+        )
+        return generation_from_chat_completion(response, model_name, self.display_name, time.time() - start_time)
@@ -0,0 +1,44 @@
+import importlib
+import threading
+
+
+class LazyImport:
+    """
+    Stands in for a module (or an attribute of one) and imports it on first use.
+
+    MLflow and the provider SDKs each take seconds to import. Binding them through a
+    ``LazyImport`` keeps the module-level name (so ``unittest.mock.patch`` still
+    works) while deferring the import until something is actually called.
+
+    Args:
+        module_name (str): The module to import, e.g. ``"mlflow.tracking"``.
+        attribute (str, optional): An attribute of the module to resolve instead of
+            the module itself, e.g. ``"MlflowClient"``.
+    """
+
+    def __init__(self, module_name, attribute=None):
+        self._module_name = module_name
+        self._attribute = attribute
+        self._target = None
+        self._lock = threading.Lock()
+
+    def _resolve(self):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    target = importlib.import_module(self._module_name)
+                    if self._attribute:
+                        target = getattr(target, self._attribute)
+                    self._target = target
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        name = f"{self._module_name}.{self._attribute}" if self._attribute else self._module_name
+        state = "loaded" if self._target is not None else "not loaded"
+        return f"<LazyImport {name} ({state})>"
@@ -0,0 +1,108 @@
+import math
+from statistics import NormalDist
+from .consistency_evaluator import DEFAULT_SIMILARITY_METHOD, IncrementalConsistencyEvaluator
+
+DEFAULT_CONSISTENCY_PRECISION = 0.05
+DEFAULT_METRIC_PRECISION = 0.10
+DEFAULT_MIN_RUNS = 5
+DEFAULT_CONFIDENCE = 0.95
+
+
+class RunningStat:
+    """Running mean and variance of a stream of values (Welford's algorithm)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self):
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def half_width(self, z):
+        """Half-width of the normal-approximation confidence interval of the mean."""
+        if self.n < 2:
+            return math.inf
+        return z * math.sqrt(self.variance / self.n)
+
+    def relative_half_width(self, z):
+        """Half-width relative to the mean (inf while the mean is zero)."""
+        if self.mean == 0:
+            return math.inf
+        return self.half_width(z) / abs(self.mean)
+
+
+class AdaptiveStopRule:
+    """
+    Sequential stopping rule for adaptive experiments.
+
+    The rule is satisfied once the consistency score is known to within
+    ``consistency_precision`` (absolute) and mean latency and token usage to within
+    ``metric_precision`` (relative), all at the requested confidence.
+
+    Args:
+        consistency_precision (float): Target half-width of the consistency score interval.
+        metric_precision (float): Target half-width of the latency/token intervals as a
+            fraction of their mean.
+        min_runs (int): Never stop before this many runs.
+        confidence (float): Confidence level of the intervals.
+        method (str): Similarity method for the consistency score.
+        normalizer: What the consistency score compares (see
+            :func:`~prompt_visualization.consistency_evaluator.compile_normalizer`).
+    """
+
+    def __init__(self, consistency_precision=DEFAULT_CONSISTENCY_PRECISION, metric_precision=DEFAULT_METRIC_PRECISION,
+                 min_runs=DEFAULT_MIN_RUNS, confidence=DEFAULT_CONFIDENCE, method=DEFAULT_SIMILARITY_METHOD,
+                 normalizer=None):
+        self.consistency_precision = consistency_precision
+        self.metric_precision = metric_precision
+        self.min_runs = min_runs
+        self.z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        self.evaluator = IncrementalConsistencyEvaluator(method=method, normalizer=normalizer)
+        self.latency = RunningStat()
+        self.tokens = RunningStat()
+
+    def add_result(self, result):
+        """Feeds one finished run into the consistency and latency/token estimates."""
+        self.evaluator.add_result(result)
+        if result.get("status") == "Pass":
+            self.latency.add(result["latency"])
+            total_tokens = (result.get("usage") or {}).get("total_token_count")
+            if total_tokens is not None:
+                self.tokens.add(total_tokens)
+
+    @property
+    def n(self):
+        return self.evaluator.n
+
+    def is_satisfied(self):
+        """True once every estimate has reached its target precision."""
+        if self.n < self.min_runs:
+            return False
+        if not self.evaluator.is_converged(tolerance=self.consistency_precision, min_runs=self.min_runs, z=self.z):
+            return False
+        if self.latency.relative_half_width(self.z) > self.metric_precision:
+            return False
+        # Token usage is only checked when the provider reports it
+        return self.tokens.n == 0 or self.tokens.relative_half_width(self.z) <= self.metric_precision
+
+    def summary(self):
+        """Returns the current estimates as a flat dictionary of metrics."""
+        low, high = self.evaluator.confidence_interval(z=self.z)
+        return {
+            "runs": self.n,
+            "consistency_score": self.evaluator.score,
+            "consistency_ci_low": low,
+            "consistency_ci_high": high,
+            "latency_mean": self.latency.mean,
+            "latency_relative_half_width": self.latency.relative_half_width(self.z),
+            "total_tokens_mean": self.tokens.mean,
+            "total_tokens_relative_half_width": self.tokens.relative_half_width(self.z),
+        }
@@ -0,0 +1,69 @@
+import numpy as np
+from .consistency_evaluator import DEFAULT_SIMILARITY_METHOD, score_outputs
+from .pricing import estimate_cost
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+
+def _token_total(results, key):
+    counts = [(r.get("usage") or {}).get(key) for r in results]
+    counts = [c for c in counts if c is not None]
+    return sum(counts) if counts else None
+
+
+def summarize_results(results, model_name=None, method=DEFAULT_SIMILARITY_METHOD, normalizer=None):
+    """
+    Aggregates the result dictionaries of one batch into flat metrics.
+
+    Latency percentiles are over passed runs only; failed runs count towards
+    ``failure_rate``. The consistency score is over all runs, with a failed run
+    scoring as an empty output, as everywhere else. Runs served from the response
+    cache made no API call: their tokens are counted under ``cache_hit_tokens``
+    rather than ``billed_tokens``, and they cost nothing. Cost is None unless
+    ``model_name`` has a known price.
+
+    Args:
+        results (list): Result dictionaries returned by ``run_prompt_experiment``.
+        model_name (str, optional): The model the batch ran on, for the cost estimate.
+        method (str): Similarity method for the consistency score.
+        normalizer: What the consistency score compares (see
+            :func:`~prompt_visualization.consistency_evaluator.compile_normalizer`).
+
+    Returns:
+        dict: Run counts, latency percentiles, token totals, cost and consistency score,
+        plus a ``consistency_<field>`` score per field of a schema normalizer.
+    """
+    passed = [r for r in results if r.get("status") == "Pass"]
+    latencies = [r["latency"] for r in passed]
+    billed = [r for r in passed if not r.get("cache_hit")]
+    cache_hits = [r for r in passed if r.get("cache_hit")]
+    costs = [estimate_cost(model_name, r.get("usage")) for r in billed] if model_name else []
+    costs = [c for c in costs if c is not None]
+    consistency_score, field_scores = None, {}
+    if len(results) > 1:
+        consistency_score, field_scores = score_outputs([r.get("parsed_output") for r in results], method=method,
+                                                        normalizer=normalizer)
+    summary = {
+        "runs": len(results),
+        "passed": len(passed),
+        "failure_rate": (len(results) - len(passed)) / len(results) if results else None,
+        "latency_mean": float(np.mean(latencies)) if latencies else None,
+        "latency_p50": _percentile(latencies, 50),
+        "latency_p95": _percentile(latencies, 95),
+        "latency_p99": _percentile(latencies, 99),
+        "prompt_tokens": _token_total(passed, "prompt_token_count"),
+        # The part of prompt_tokens read from a provider-side context cache
+        "cached_prompt_tokens": _token_total(passed, "cached_content_token_count"),
+        "output_tokens": _token_total(passed, "candidates_token_count"),
+        "total_tokens": _token_total(passed, "total_token_count"),
+        # total_tokens split into the runs that called the API and those replayed from the response cache
+        "billed_tokens": _token_total(billed, "total_token_count"),
+        "cache_hit_tokens": _token_total(cache_hits, "total_token_count"),
+        "cache_hits": len(cache_hits),
+        "cost": sum(costs) if costs else None,
+        "consistency_score": consistency_score,
+    }
+    summary.update({f"consistency_{name}": score for name, score in field_scores.items()})
+    return summary
@@ -0,0 +1,292 @@
+import contextvars
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+import click
+
+from ._lazy import LazyImport
+from .consistency_evaluator import (
+    SIMILARITY_METHODS, IncrementalConsistencyEvaluator, similarity_matrix_from_outputs
+)
+from .batch_metrics import summarize_results
+from .context_cache import AUTO
+from .history_store import configure_results_store
+from .llm_engine import (
+    configure_context_cache, configure_experiment, get_engine, init_tracking, run_prompt_batch, run_prompt_experiment
+)
+from .mlflow_logger import flush_artifacts
+from .response_cache import OFF, configure_response_cache
+from .scheduler import configure_scheduler
+from .tracing import Trace, profiling
+from .utils import extract_json
+
+mlflow = LazyImport("mlflow")
+
+DEFAULT_BENCHMARK_ROOT = os.path.join(".cache", "benchmark")
+DEFAULT_EXPERIMENT_NAME = "LLM_Benchmarks"
+DEFAULT_MODEL = "mock-fast"
+DEFAULT_CONCURRENCY_LEVELS = (1, 4, 16)
+DEFAULT_BATCH_SIZES = (8, 32)
+
+SYSTEM_PROMPT = "Extract the ingredients of the recipe as JSON."
+# A system prompt long enough (~3,500 tokens) to be worth a context cache
+LONG_SYSTEM_PROMPT = SYSTEM_PROMPT + " Follow these rules:\n" + "\n".join(
+    f"{i + 1}. Keep every ingredient name exactly as it is written in the recipe text." for i in range(180))
+RAW_JSON_INPUT = json.dumps({"recipe_text": "Mix flour, sugar and eggs. Bake for 30 minutes."})
+
+
+def configure_local_tracking(root=DEFAULT_BENCHMARK_ROOT, experiment_name=DEFAULT_EXPERIMENT_NAME):
+    """
+    Points MLflow at a SQLite tracking store and local artifact directory under ``root``
+    and archives runs under ``root`` as well, so benchmarks need no server.
+
+    Returns:
+        str: The tracking URI.
+    """
+    root = Path(root).resolve()
+    root.mkdir(parents=True, exist_ok=True)
+    tracking_uri = f"sqlite:///{root / 'mlflow.db'}"
+    init_tracking(tracking_uri, autolog=False)
+    if mlflow.get_experiment_by_name(experiment_name) is None:
+        mlflow.create_experiment(experiment_name, artifact_location=(root / "artifacts").as_uri())
+    configure_experiment(experiment_name)
+    configure_results_store(str(root / "history"))
+    configure_response_cache(OFF)
+    return tracking_uri
+
+
+def configure_mock_provider(model_name=DEFAULT_MODEL, **options):
+    """
+    Configures the engine's mock provider (see :class:`llm_providers.mock.MockProvider`)
+    and gives ``mock:<model_name>`` a scheduler whose retry backoff is scaled to the
+    simulated latency, so simulated 429s don't dominate the timings.
+
+    Returns:
+        str: The model spec to run, ``mock:<model_name>``.
+    """
+    provider = get_engine().get_provider("mock")
+    provider.configure(**options)
+    configure_scheduler(model_name, provider="mock", retry_base_delay=max(provider.latency, 0.001))
+    return f"mock:{model_name}"
+
+
+@contextmanager
+def _instant_mock():
+    """Temporarily turns the mock provider's latency and failures off."""
+    provider = get_engine().get_provider("mock")
+    saved = {name: getattr(provider, name) for name in ("latency", "prompt_latency", "rate_limit_rate", "error_rate")}
+    provider.configure(latency=0.0, prompt_latency=0.0, rate_limit_rate=0.0, error_rate=0.0)
+    try:
+        yield provider
+    finally:
+        provider.configure(**saved)
+
+
+def _median(timings):
+    return statistics.median(timings) if timings else None
+
+
+def bench_experiment_throughput(model_spec, num_runs, concurrency, stream=False):
+    """Runs ``run_prompt_experiment`` ``num_runs`` times over ``concurrency`` threads."""
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, run_prompt_experiment, RAW_JSON_INPUT,
+                                   SYSTEM_PROMPT, f"bench_run_{i + 1}", model_spec, run_index=i, stream=stream)
+                   for i in range(num_runs)]
+        results = [future.result() for future in futures]
+    flush_artifacts()
+    elapsed = time.perf_counter() - start_time
+    return {
+        "elapsed": elapsed,
+        "runs_per_sec": num_runs / elapsed,
+        "passed": sum(r["status"] == "Pass" for r in results),
+    }
+
+
+def bench_batch_latency(model_spec, num_runs, concurrency, stream=False):
+    """
+    Times one ``run_prompt_batch`` end to end, parent run and aggregates included, and
+    reports its time per category (see :meth:`~prompt_visualization.tracing.Trace.breakdown`).
+    """
+    trace = Trace("bench_batch")
+    start_time = time.perf_counter()
+    results = run_prompt_batch(RAW_JSON_INPUT, SYSTEM_PROMPT, f"bench_batch_{int(time.time())}", model_spec,
+                               num_runs, max_concurrency=concurrency, stream=stream, trace=trace)
+    elapsed = time.perf_counter() - start_time
+    return {
+        "elapsed": elapsed,
+        "runs_per_sec": num_runs / elapsed,
+        "passed": sum(r["status"] == "Pass" for r in results),
+        **{f"{category}_sec": seconds for category, seconds in trace.breakdown().items()},
+    }
+
+
+def bench_context_cache(model_spec, num_runs, concurrency):
+    """
+    Runs a batch with a long system prompt without, then with, a provider-side context
+    cache, and reports each one's mean latency and prompt tokens billed at full price.
+    The mock provider's ``prompt_latency`` sets what an uncached prompt costs.
+    """
+    registry = get_engine().context_caches
+    saved = (registry.mode, registry.min_tokens, registry.ttl)
+    timings = {}
+    try:
+        for label, mode in (("uncached", OFF), ("cached", AUTO)):
+            configure_context_cache(mode)
+            results = run_prompt_batch(RAW_JSON_INPUT, LONG_SYSTEM_PROMPT, f"bench_context_cache_{label}", model_spec,
+                                       num_runs, max_concurrency=concurrency)
+            summary = summarize_results(results)
+            timings[f"{label}_latency_ms"] = (summary["latency_mean"] or 0) * 1000
+            timings[f"{label}_prompt_tokens"] = (summary["prompt_tokens"] or 0) - (summary["cached_prompt_tokens"] or 0)
+    finally:
+        configure_context_cache(*saved)
+    return timings
+
+
+def bench_logging_overhead(model_spec, num_runs):
+    """
+    Per-run cost of the engine around a model call (MLflow run, logging, archiving),
+    measured with a zero-latency mock so only the overhead remains.
+    """
+    model_name = model_spec.split(":", 1)[1]
+    with _instant_mock() as provider:
+        start_time = time.perf_counter()
+        for _ in range(num_runs):
+            provider.generate(model_name, RAW_JSON_INPUT, SYSTEM_PROMPT)
+        bare = (time.perf_counter() - start_time) / num_runs
+
+        start_time = time.perf_counter()
+        for i in range(num_runs):
+            run_prompt_experiment(RAW_JSON_INPUT, SYSTEM_PROMPT, f"bench_overhead_{i + 1}", model_spec, run_index=i)
+        flush_artifacts()
+        tracked = (time.perf_counter() - start_time) / num_runs
+    return {"bare_call_ms": bare * 1000, "tracked_run_ms": tracked * 1000, "overhead_ms": (tracked - bare) * 1000}
+
+
+def bench_evaluator(num_outputs, repeats=3):
+    """Times the batch and incremental consistency evaluators on mock outputs."""
+    with _instant_mock() as provider:
+        outputs = [extract_json(provider.generate(DEFAULT_MODEL, RAW_JSON_INPUT, SYSTEM_PROMPT).text)
+                   for _ in range(num_outputs)]
+
+    timings = {}
+    for method in SIMILARITY_METHODS:
+        batch, incremental = [], []
+        for _ in range(repeats):
+            start_time = time.perf_counter()
+            similarity_matrix_from_outputs(outputs, method=method)
+            batch.append(time.perf_counter() - start_time)
+
+            evaluator = IncrementalConsistencyEvaluator(method=method)
+            start_time = time.perf_counter()
+            for output in outputs:
+                evaluator.add_output(output)
+            incremental.append(time.perf_counter() - start_time)
+        timings[f"{method}_batch_ms"] = _median(batch) * 1000
+        timings[f"{method}_incremental_ms"] = _median(incremental) * 1000
+    return timings
+
+
+def run_benchmarks(concurrency_levels=DEFAULT_CONCURRENCY_LEVELS, batch_sizes=DEFAULT_BATCH_SIZES,
+                   model_spec=None, stream=False, repeats=1, on_row=None):
+    """
+    Runs the whole suite against the mock provider and returns one row per measurement.
+
+    Call :func:`configure_local_tracking` and :func:`configure_mock_provider` first.
+    Timings of repeated measurements are reduced to their median.
+
+    Returns:
+        list: Dicts with ``benchmark``, ``batch_size``, ``concurrency`` and the timings.
+    """
+    model_spec = model_spec or f"mock:{DEFAULT_MODEL}"
+    rows = []
+
+    def add(row):
+        rows.append(row)
+        if on_row:
+            on_row(row)
+
+    def median_of(fn, *args, **kwargs):
+        samples = [fn(*args, **kwargs) for _ in range(repeats)]
+        return {key: _median([s[key] for s in samples]) for key in samples[0]}
+
+    for batch_size in batch_sizes:
+        for concurrency in concurrency_levels:
+            add({"benchmark": "experiment_throughput", "batch_size": batch_size, "concurrency": concurrency,
+                 **median_of(bench_experiment_throughput, model_spec, batch_size, concurrency, stream=stream)})
+            add({"benchmark": "batch_latency", "batch_size": batch_size, "concurrency": concurrency,
+                 **median_of(bench_batch_latency, model_spec, batch_size, concurrency, stream=stream)})
+        add({"benchmark": "context_cache", "batch_size": batch_size, "concurrency": max(concurrency_levels),
+             **median_of(bench_context_cache, model_spec, batch_size, max(concurrency_levels))})
+        add({"benchmark": "logging_overhead", "batch_size": batch_size, "concurrency": 1,
+             **median_of(bench_logging_overhead, model_spec, batch_size)})
+        add({"benchmark": "evaluator", "batch_size": batch_size, "concurrency": 1,
+             **bench_evaluator(batch_size, repeats=max(3, repeats))})
+    return rows
+
+
+def _format_row(row):
+    values = ", ".join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                       for key, value in row.items() if key not in ("benchmark", "batch_size", "concurrency"))
+    return f"{row['benchmark']:<22} batch={row['batch_size']:<4} concurrency={row['concurrency']:<3} {values}"
+
+
+@click.command()
+@click.option("--concurrency", "concurrency_levels", multiple=True, type=click.IntRange(min=1),
+              default=DEFAULT_CONCURRENCY_LEVELS, show_default=True, help="Concurrency level. Repeat for several.")
+@click.option("--batch-size", "batch_sizes", multiple=True, type=click.IntRange(min=1),
+              default=DEFAULT_BATCH_SIZES, show_default=True, help="Runs per batch. Repeat for several.")
+@click.option("--repeats", default=1, show_default=True, type=click.IntRange(min=1),
+              help="Repetitions per measurement; the median is reported.")
+@click.option("--latency", default=0.05, show_default=True, type=click.FloatRange(min=0),
+              help="Mean simulated latency (s).")
+@click.option("--latency-distribution", default="lognormal", show_default=True,
+              type=click.Choice(["constant", "uniform", "lognormal"]))
+@click.option("--prompt-latency", default=0.01, show_default=True, type=click.FloatRange(min=0),
+              help="Simulated prefill time (s) per 1,000 uncached prompt tokens.")
+@click.option("--latency-spread", default=0.25, show_default=True, type=click.FloatRange(min=0),
+              help="Spread of the latency distribution.")
+@click.option("--rate-limit-rate", default=0.0, show_default=True, type=click.FloatRange(0, 1),
+              help="Share of calls failing with a 429.")
+@click.option("--error-rate", default=0.0, show_default=True, type=click.FloatRange(0, 1),
+              help="Share of calls failing with a 503.")
+@click.option("--num-items", default=8, show_default=True, type=click.IntRange(min=1),
+              help="Ingredients per simulated output.")
+@click.option("--variability", default=0.1, show_default=True, type=click.FloatRange(0, 1),
+              help="Chance that an ingredient differs between runs.")
+@click.option("--stream/--no-stream", default=False, show_default=True, help="Stream the simulated responses.")
+@click.option("--chunk-size", default=16, show_default=True, type=click.IntRange(min=1),
+              help="Characters per streamed chunk.")
+@click.option("--seed", default=0, show_default=True, type=int, help="Seed of the mock provider.")
+@click.option("--root", default=DEFAULT_BENCHMARK_ROOT, show_default=True,
+              help="Directory of the local MLflow store and run archive.")
+@click.option("--output", "output_path", default=None, help="Also write the rows to this JSON file.")
+@click.option("--profile", "profile_path", default=None,
+              help="Profile the suite with cProfile and write the stats to this file.")
+def main(concurrency_levels, batch_sizes, repeats, latency, latency_distribution, prompt_latency, latency_spread,
+         rate_limit_rate,
+         error_rate, num_items, variability, stream, chunk_size, seed, root, output_path, profile_path):
+    """Benchmarks the engine offline against the mock provider and a local MLflow store."""
+    configure_local_tracking(root)
+    model_spec = configure_mock_provider(
+        latency=latency, latency_distribution=latency_distribution, latency_spread=latency_spread,
+        prompt_latency=prompt_latency, rate_limit_rate=rate_limit_rate, error_rate=error_rate, num_items=num_items,
+        variability=variability, chunk_size=chunk_size, seed=seed)
+    with profiling(profile_path) if profile_path else nullcontext():
+        rows = run_benchmarks(concurrency_levels, batch_sizes, model_spec=model_spec, stream=stream,
+                              repeats=repeats, on_row=lambda row: click.echo(_format_row(row)))
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+        click.echo(f"Results: {output_path}")
+    if profile_path:
+        click.echo(f"Profile: {profile_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+import contextlib
+import contextvars
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import click
+
+from .llm_engine import (
+    DEFAULT_MAX_CONCURRENCY, DEFAULT_TRACKING_URI, acquire_context_cache, configure_context_cache,
+    configure_experiment, configure_genai, init_tracking, parse_model_spec, run_prompt_experiment
+)
+from .consistency_evaluator import compile_normalizer, score_outputs
+from .context_cache import AUTO, CONTEXT_CACHE_MODES
+from .history_store import configure_results_store
+from .mlflow_logger import flush_artifacts
+from .normalizers import parse_field_specs
+from .response_cache import CACHE_MODES, OFF, configure_response_cache
+from .scheduler import configure_scheduler
+from .tracing import Trace, profiling, tracing
+
+DEFAULT_EXPERIMENT_NAME = "LLM_Consistency_Tests"
+
+
+def iter_dataset(path, input_field=None, id_field="id"):
+    """
+    Streams the cases of a JSONL or CSV dataset without loading it into memory.
+
+    Each JSONL line (or CSV row) is one case. The whole record is sent as the raw JSON
+    input unless ``input_field`` names the field holding it.
+
+    Yields:
+        tuple: ``(case_id, raw_json_input)``; ``case_id`` is the record's ``id_field``
+        value or its 1-based line/row number.
+    """
+    is_csv = path.lower().endswith(".csv")
+    with open(path, "r", newline="" if is_csv else None, encoding="utf-8") as f:
+        if is_csv:
+            records = enumerate(csv.DictReader(f), start=1)
+        else:
+            records = ((number, json.loads(line)) for number, line in enumerate(f, start=1) if line.strip())
+        for number, record in records:
+            case_id = str(record.get(id_field, number)) if isinstance(record, dict) else str(number)
+            payload = record.get(input_field) if input_field and isinstance(record, dict) else record
+            yield case_id, payload if isinstance(payload, str) else json.dumps(payload)
+
+
+def iter_tasks(dataset, prompts, models, repeats):
+    """Crosses every dataset case with every prompt, model and repeat."""
+    for case_id, raw_json_input in dataset:
+        for prompt_name, system_prompt in prompts.items():
+            for model_name in models:
+                for repeat in range(repeats):
+                    yield {
+                        "task_id": f"{case_id}:{prompt_name}:{model_name}:{repeat}",
+                        "group_id": f"{case_id}:{prompt_name}:{model_name}",
+                        "case_id": case_id,
+                        "prompt": prompt_name,
+                        "model": model_name,
+                        "repeat": repeat,
+                        "raw_json_input": raw_json_input,
+                        "system_prompt": system_prompt,
+                    }
+
+
+def _read_jsonl(path):
+    """Reads the complete records of a JSONL file, skipping a torn last line after a crash."""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_checkpoint(output_path, summary_path):
+    """
+    Reads what a previous (possibly crashed) sweep already wrote.
+
+    Returns:
+        tuple: The finished task IDs, the per-group results of groups not yet
+        summarized, and the IDs of summarized groups.
+    """
+    summarized = {record["group_id"] for record in _read_jsonl(summary_path)}
+    done, groups = set(), {}
+    for record in _read_jsonl(output_path):
+        done.add(record["task_id"])
+        if record["group_id"] not in summarized:
+            groups.setdefault(record["group_id"], []).append(record)
+    return done, groups, summarized
+
+
+def summarize_group(records, normalizer=None):
+    """Aggregates the repeats of one (case, prompt, model) group."""
+    passed = [r for r in records if r["status"] == "Pass"]
+    first = records[0]
+    consistency_score, field_scores = None, {}
+    if len(records) > 1:
+        consistency_score, field_scores = score_outputs([r.get("parsed_output") for r in records],
+                                                        normalizer=normalizer)
+    summary = {
+        "group_id": first["group_id"],
+        "case_id": first["case_id"],
+        "prompt": first["prompt"],
+        "model": first["model"],
+        "runs": len(records),
+        "passed": len(passed),
+        "consistency_score": consistency_score,
+        "latency_mean": sum(r["latency"] for r in passed) / len(passed) if passed else None,
+    }
+    summary.update({f"consistency_{name}": score for name, score in field_scores.items()})
+    return summary
+
+
+def _run_task(task, run_prefix):
+    try:
+        # All tasks of a prompt and model share one provider-side cache of the system prompt
+        acquire_context_cache(task["model"], task["system_prompt"])
+        result = run_prompt_experiment(task["raw_json_input"], task["system_prompt"],
+                                       f"{run_prefix}_{task['task_id']}", task["model"], run_index=task["repeat"])
+    except Exception as e:
+        # run_prompt_experiment handles model errors itself; this only catches
+        # failures to open the MLflow run.
+        result = {"status": "Fail", "output_text": str(e), "latency": 0}
+    record = {key: task[key] for key in ("task_id", "group_id", "case_id", "prompt", "model", "repeat")}
+    record.update(result)
+    return record
+
+
+def run_sweep(tasks, output_path, summary_path, repeats, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+              run_prefix="sweep", on_record=None, normalizer=None):
+    """
+    Runs a stream of tasks with bounded concurrency, appending each result to
+    ``output_path`` as it finishes and a summary line to ``summary_path`` as soon as
+    all repeats of a group are in.
+
+    Tasks already present in ``output_path`` are skipped, so an interrupted sweep
+    resumes where it stopped when run again with the same arguments. ``normalizer``
+    selects what the group consistency scores compare (see
+    :func:`~prompt_visualization.consistency_evaluator.compile_normalizer`).
+
+    Returns:
+        dict: Counts of ``completed`` and ``skipped`` tasks and ``summarized`` groups.
+    """
+    done, groups, summarized = load_checkpoint(output_path, summary_path)
+    normalizer = compile_normalizer(normalizer)
+    counts = {"completed": 0, "skipped": 0, "summarized": 0}
+
+    with open(output_path, "a", encoding="utf-8") as output_file, \
+            open(summary_path, "a", encoding="utf-8") as summary_file:
+
+        def write(handle, record):
+            handle.write(json.dumps(record, default=str) + "\n")
+            handle.flush()
+
+        def finish(future):
+            record = future.result()
+            write(output_file, record)
+            counts["completed"] += 1
+            group = groups.setdefault(record["group_id"], [])
+            group.append(record)
+            if len(group) >= repeats:
+                write(summary_file, summarize_group(sorted(group, key=lambda r: r["repeat"]), normalizer))
+                summarized.add(record["group_id"])
+                del groups[record["group_id"]]
+                counts["summarized"] += 1
+            if on_record:
+                on_record(record)
+
+        with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="sweep") as executor:
+            pending = set()
+            for task in tasks:
+                if task["task_id"] in done:
+                    counts["skipped"] += 1
+                    continue
+                # Keep only a small window of tasks queued so huge datasets stream through
+                while len(pending) >= max_concurrency * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(future)
+                # Runs inherit the context, so profiling and tracing follow them onto the workers
+                pending.add(executor.submit(contextvars.copy_context().run, _run_task, task, run_prefix))
+            for future in wait(pending).done:
+                finish(future)
+
+        # Groups completed by a previous run that crashed before writing their summary
+        for group_id, records in list(groups.items()):
+            if len(records) >= repeats and group_id not in summarized:
+                write(summary_file, summarize_group(sorted(records, key=lambda r: r["repeat"]), normalizer))
+                counts["summarized"] += 1
+
+    flush_artifacts()
+    return counts
+
+
+def _load_prompts(paths):
+    prompts = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            prompts[name] = f.read()
+    return prompts
+
+
+@click.command()
+@click.option("--dataset", "dataset_path", required=True, type=click.Path(exists=True, dir_okay=False),
+              help="JSONL or CSV file with one input case per line/row.")
+@click.option("--prompt", "prompt_paths", required=True, multiple=True, type=click.Path(exists=True, dir_okay=False),
+              help="System prompt file (txt/md). Repeat for several prompts.")
+@click.option("--model", "models", required=True, multiple=True,
+              help="Model name, or <provider>:<model> for OpenRouter/Hugging Face. Repeat for several models.")
+@click.option("--repeats", default=3, show_default=True, type=click.IntRange(min=1),
+              help="Runs per (case, prompt, model) for the consistency score.")
+@click.option("--input-field", default=None, help="Field holding the raw input; defaults to the whole record.")
+@click.option("--id-field", default="id", show_default=True, help="Field holding the case ID.")
+@click.option("--output", "output_path", default="sweep_results.jsonl", show_default=True,
+              help="Per-run results (JSONL). Also the checkpoint for resuming.")
+@click.option("--summary", "summary_path", default=None,
+              help="Per-group summary (JSONL). Defaults to <output>.summary.jsonl.")
+@click.option("--concurrency", default=DEFAULT_MAX_CONCURRENCY, show_default=True, type=click.IntRange(min=1),
+              help="Maximum number of runs in flight.")
+@click.option("--experiment", default=DEFAULT_EXPERIMENT_NAME, show_default=True, help="MLflow experiment name.")
+@click.option("--tracking-uri", default=None, help="MLflow tracking URI (defaults to the app's server).")
+@click.option("--cache-mode", default=OFF, show_default=True, type=click.Choice(CACHE_MODES),
+              help="Response cache mode.")
+@click.option("--context-cache", "context_cache_mode", default=AUTO, show_default=True,
+              type=click.Choice(CONTEXT_CACHE_MODES),
+              help="Cache long system prompts on the provider's side, where supported.")
+@click.option("--history", "history_path", default=None,
+              help="Also archive every run (output and system prompt included) as Parquet under this directory, "
+                   "for the app's Experiment History. Off by default.")
+@click.option("--field", "fields", multiple=True,
+              help="Field to score consistency on, as <name>=<selector> (e.g. items=$.items[*].name). "
+                   "Repeat for several fields; defaults to the recipe ingredient names.")
+@click.option("--rpm", default=None, type=int, help="Provider requests-per-minute quota.")
+@click.option("--tpm", default=None, type=int, help="Provider tokens-per-minute quota.")
+@click.option("--profile", "profile_path", default=None,
+              help="Profile the sweep with cProfile and write the stats to this file.")
+@click.option("--trace", "trace_path", default=None,
+              help="Time every stage of every run and write a Chrome trace (JSON) to this file.")
+def main(dataset_path, prompt_paths, models, repeats, input_field, id_field, output_path, summary_path, concurrency,
+         experiment, tracking_uri, cache_mode, context_cache_mode, history_path, fields, rpm, tpm, profile_path,
+         trace_path):
+    """Runs a headless prompt consistency sweep over a dataset of inputs."""
+    api_key = os.getenv("GOOGLE_API_KEY")
+    # Only Gemini models need it; other providers read their own keys
+    if not api_key and any(parse_model_spec(model_spec)[0] == "google" for model_spec in models):
+        raise click.UsageError("'GOOGLE_API_KEY' environment variable not set (required for Gemini models).")
+    try:
+        normalizer = compile_normalizer(parse_field_specs(fields) or None)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--field") from e
+    if api_key:
+        configure_genai(api_key)
+    init_tracking(tracking_uri or DEFAULT_TRACKING_URI)
+    configure_experiment(experiment)
+    configure_response_cache(cache_mode)
+    configure_context_cache(context_cache_mode)
+    if history_path:
+        configure_results_store(history_path)
+    if rpm or tpm:
+        for model_spec in models:
+            provider, model_name = parse_model_spec(model_spec)
+            configure_scheduler(model_name, provider=provider, requests_per_minute=rpm, tokens_per_minute=tpm)
+
+    prompts = _load_prompts(prompt_paths)
+    summary_path = summary_path or f"{os.path.splitext(output_path)[0]}.summary.jsonl"
+    tasks = iter_tasks(iter_dataset(dataset_path, input_field=input_field, id_field=id_field), prompts, models, repeats)
+
+    start_time = time.time()
+
+    def report(record):
+        click.echo(f"[{record['status']}] {record['task_id']} ({record['latency']:.2f}s)")
+
+    trace = Trace(f"sweep_{int(start_time)}") if trace_path else None
+    with profiling(profile_path) if profile_path else contextlib.nullcontext(), tracing(trace, "sweep"):
+        counts = run_sweep(tasks, output_path, summary_path, repeats, max_concurrency=concurrency,
+                           run_prefix=f"sweep_{int(start_time)}", on_record=report, normalizer=normalizer)
+    click.echo(f"Completed {counts['completed']} runs ({counts['skipped']} already done) and "
+               f"{counts['summarized']} groups in {time.time() - start_time:.1f}s.")
+    click.echo(f"Results: {output_path}\nSummary: {summary_path}")
+    if trace is not None:
+        with open(trace_path, "w", encoding="utf-8") as f:
+            json.dump(trace.to_chrome_trace(), f)
+        breakdown = ", ".join(f"{category} {seconds:.1f}s" for category, seconds in trace.breakdown().items())
+        click.echo(f"Time by category: {breakdown}\nTrace: {trace_path}")
+    if profile_path:
+        click.echo(f"Profile: {profile_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,28 @@
-import mlflow
 import json
-import difflib
-from mlflow.tracking import MlflowClient
+import os
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from ._lazy import LazyImport
+from .embeddings import get_embedder
+from .normalizers import SchemaNormalizer
+
+MlflowClient = LazyImport("mlflow.tracking", "MlflowClient")
+
+# Where downloaded run artifacts are kept; artifacts of finished runs never change
+DEFAULT_ARTIFACT_CACHE_DIR = os.path.join(".cache", "artifacts")
+DEFAULT_DOWNLOAD_WORKERS = 8
+
+# Pairwise similarity measures over the sets of normalized items of two runs
+JACCARD = "jaccard"
+DICE = "dice"
+MINHASH = "minhash"  # approximate Jaccard for very large batches/vocabularies
+SEMANTIC = "semantic"  # soft Dice over item embeddings; paraphrased items still match
+SIMILARITY_METHODS = (JACCARD, DICE, MINHASH, SEMANTIC)
+DEFAULT_SIMILARITY_METHOD = JACCARD
+DEFAULT_NUM_PERMUTATIONS = 128
+# Item pairs less cosine-similar than this don't match at all under "semantic"
+DEFAULT_SEMANTIC_THRESHOLD = 0.5
+_MERSENNE_PRIME = (1 << 31) - 1
 
 def normalize_ingredients(data):
     """
@@ -9,7 +30,7 @@ def normalize_ingredients(data):
     Returns a sorted list of strings.
     """
     ingredients = []
-    
+
     def extract(item):
         if isinstance(item, dict):
             # Check for 'name' key which usually holds the ingredient name
@@ -29,57 +50,520 @@ def normalize_ingredients(data):
     # Return unique, sorted, lowercase strings for consistent comparison
     return sorted(list(set([i.lower().strip() for i in ingredients])))
 
-def calculate_consistency_metric(experiment_id, run_ids, artifact_path="output.json"):
+def normalize_output(content):
     """
-    Calculates the consistency metric for a batch of runs.
-    
+    Normalizes one parsed model output for scoring.
+
     Args:
-        experiment_id (str): The ID of the experiment.
-        run_ids (list): List of run IDs to evaluate.
-        artifact_path (str): The path to the JSON output artifact.
-        
+        content: The parsed JSON output of a run, or None if it could not be parsed.
+
+    Returns:
+        list: The normalized ingredient names (empty for a missing output).
+    """
+    if content is None:
+        return []
+    # Extract ingredient_composition
+    # We assume the root is a dict containing this key, or the list itself
+    if isinstance(content, dict):
+        ingredients_data = content.get("ingredient_composition", [])
+    else:
+        ingredients_data = content # Fallback if the root is the list
+    return normalize_ingredients(ingredients_data)
+
+def compile_normalizer(normalizer=None):
+    """
+    Resolves the ``normalizer`` argument of the scoring functions into a callable.
+
+    Args:
+        normalizer: None for the recipe default (:func:`normalize_output`), a
+            :class:`~prompt_visualization.normalizers.SchemaNormalizer` or any callable
+            mapping a parsed output to a list of items, or a fields dict (or a single
+            selector string) to build a ``SchemaNormalizer`` from.
+
+    Returns:
+        callable: The normalizer, compiled once so it can be applied to a whole batch.
+    """
+    if normalizer is None:
+        return normalize_output
+    if isinstance(normalizer, str):
+        return SchemaNormalizer({normalizer: normalizer})
+    if isinstance(normalizer, dict):
+        return SchemaNormalizer(normalizer)
+    return normalizer
+
+class ItemVocabulary:
+    """Interns normalized item strings as dense integer IDs."""
+
+    def __init__(self):
+        self.ids = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def intern(self, items):
+        """Returns the IDs of ``items`` as an int array, assigning new IDs as needed."""
+        ids = self.ids
+        return np.fromiter((ids.setdefault(item, len(ids)) for item in items), dtype=np.int64)
+
+def build_incidence_matrix(normalized_lists, vocabulary=None):
+    """
+    Encodes each run's items as a row of a binary run x item matrix.
+
+    Returns:
+        tuple: The float32 incidence matrix and the ItemVocabulary used.
+    """
+    vocabulary = vocabulary or ItemVocabulary()
+    id_lists = [vocabulary.intern(items) for items in normalized_lists]
+    matrix = np.zeros((len(id_lists), len(vocabulary)), dtype=np.float32)
+    for row, ids in enumerate(id_lists):
+        matrix[row, ids] = 1.0
+    return matrix, vocabulary
+
+def _minhash_params(num_perm=DEFAULT_NUM_PERMUTATIONS, seed=0):
+    """Returns the (a, b) coefficients of ``num_perm`` universal hash functions."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+    b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+    return a, b
+
+def _minhash_signature(ids, a, b):
+    """Returns the MinHash signature of a set of item IDs."""
+    # Empty sets get a sentinel signature: equal to each other, different from any real set
+    if not len(ids):
+        return np.full(len(a), _MERSENNE_PRIME, dtype=np.int64)
+    return ((a[:, None] * ids[None, :] + b[:, None]) % _MERSENNE_PRIME).min(axis=1)
+
+def _minhash_signatures(normalized_lists, num_perm=DEFAULT_NUM_PERMUTATIONS, seed=0):
+    """Returns a (runs x num_perm) MinHash signature matrix of the item sets."""
+    vocabulary = ItemVocabulary()
+    a, b = _minhash_params(num_perm, seed)
+    signatures = np.empty((len(normalized_lists), num_perm), dtype=np.int64)
+    for row, items in enumerate(normalized_lists):
+        signatures[row] = _minhash_signature(vocabulary.intern(items), a, b)
+    return signatures
+
+def _item_similarity(vectors, other_vectors, threshold):
+    """Cosine similarity of unit item vectors, with pairs below ``threshold`` zeroed."""
+    cosine = vectors.astype(np.float64) @ other_vectors.astype(np.float64).T
+    return np.where(cosine >= threshold, np.minimum(cosine, 1.0), 0.0)
+
+def _soft_dice(precision, recall):
+    """The harmonic mean of how well each run's items are matched in the other."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+
+def _semantic_similarity_matrix(normalized_lists, embedder=None, threshold=DEFAULT_SEMANTIC_THRESHOLD):
+    """
+    Soft Dice similarity of every pair of runs: each item counts as matched by its
+    most similar item in the other run, so "all-purpose flour" and "flour, all
+    purpose" match (nearly) fully instead of not at all.
+
+    Each distinct item is embedded once and compared with every other through a single
+    (items x items) cosine matrix; the best match of every item in every run is then
+    taken per run segment of its columns, and the per-run means follow from one
+    product with the incidence matrix.
+    """
+    embedder = embedder or get_embedder()
+    incidence, vocabulary = build_incidence_matrix(normalized_lists)
+    n = len(normalized_lists)
+    sizes = incidence.sum(axis=1).astype(np.float64)
+    similarity = np.zeros((n, n))
+    full = np.flatnonzero(sizes)
+    if len(full):
+        # ItemVocabulary assigns IDs in insertion order
+        vectors = embedder.embed(list(vocabulary.ids))
+        item_similarity = _item_similarity(vectors, vectors, threshold)
+        columns = [np.flatnonzero(incidence[row]) for row in full]
+        starts = np.cumsum([0] + [len(c) for c in columns[:-1]])
+        # best[u, s]: how well item u is matched in run full[s]
+        best = np.maximum.reduceat(item_similarity[:, np.concatenate(columns)], starts, axis=1)
+        # precision[r, s]: mean over the items of run full[r] of their best match in run full[s]
+        precision = (incidence[full].astype(np.float64) @ best) / sizes[full][:, None]
+        similarity[np.ix_(full, full)] = _soft_dice(precision, precision.T)
+    empty = sizes == 0
+    similarity[np.ix_(empty, empty)] = 1.0
+    np.fill_diagonal(similarity, 1.0)
+    return similarity
+
+def pairwise_similarity_matrix(normalized_lists, method=DEFAULT_SIMILARITY_METHOD,
+                               num_perm=DEFAULT_NUM_PERMUTATIONS, embedder=None):
+    """
+    Computes the similarity of every pair of runs at once.
+
+    Args:
+        normalized_lists (list): The normalized items of each run.
+        method (str): ``"jaccard"``, ``"dice"``, ``"minhash"`` (approximate Jaccard) or
+            ``"semantic"`` (soft Dice over item embeddings).
+        num_perm (int): Number of hash permutations for ``"minhash"``.
+        embedder (Embedder, optional): Embeds the items for ``"semantic"``; defaults to
+            the process-wide one (see :func:`~prompt_visualization.embeddings.configure_embeddings`).
+
+    Returns:
+        numpy.ndarray: A symmetric (runs x runs) matrix of scores in [0, 1]. Two empty
+        outputs count as identical.
+    """
+    if method not in SIMILARITY_METHODS:
+        raise ValueError(f"Unknown similarity method: '{method}'. "
+                         f"Supported methods are {', '.join(SIMILARITY_METHODS)}.")
+    n = len(normalized_lists)
+    if n == 0:
+        return np.zeros((0, 0))
+
+    if method == MINHASH:
+        signatures = _minhash_signatures(normalized_lists, num_perm=num_perm)
+        similarity = np.empty((n, n))
+        for row in range(n):
+            similarity[row] = (signatures == signatures[row]).mean(axis=1)
+        return similarity
+    if method == SEMANTIC:
+        return _semantic_similarity_matrix(normalized_lists, embedder=embedder)
+
+    incidence, _ = build_incidence_matrix(normalized_lists)
+    intersections = (incidence @ incidence.T).astype(np.float64)
+    sizes = np.diag(intersections)
+    if method == JACCARD:
+        denominators = sizes[:, None] + sizes[None, :] - intersections
+        numerators = intersections
+    else:
+        denominators = sizes[:, None] + sizes[None, :]
+        numerators = 2 * intersections
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = np.where(denominators > 0, numerators / denominators, 1.0)
+    return similarity
+
+def mean_pairwise_similarity(similarity):
+    """Returns the mean of the off-diagonal (distinct pair) entries of a similarity matrix."""
+    n = similarity.shape[0]
+    if n < 2:
+        return 0.0
+    return float(similarity[np.triu_indices(n, k=1)].mean())
+
+def _normalize_one(normalizer, content, index):
+    try:
+        if isinstance(normalizer, SchemaNormalizer):
+            return normalizer.normalize_fields(content)
+        return normalizer(content)
+    except Exception as e:
+        print(f"Error processing output {index}: {e}")
+        # A failure to normalize counts as an empty output,
+        # which will naturally lower the consistency score against valid runs.
+        return normalizer.normalize_fields(None) if isinstance(normalizer, SchemaNormalizer) else []
+
+def _normalize_outputs(outputs, normalizer=None):
+    normalizer = compile_normalizer(normalizer)
+    normalized = [_normalize_one(normalizer, content, i) for i, content in enumerate(outputs)]
+    if isinstance(normalizer, SchemaNormalizer):
+        return [normalizer.combine(fields) for fields in normalized]
+    return normalized
+
+def similarity_matrix_from_outputs(outputs, method=DEFAULT_SIMILARITY_METHOD, normalizer=None):
+    """
+    Returns the full pairwise similarity matrix for parsed outputs.
+
+    Args:
+        outputs (list): The parsed JSON output of each run (None if unparsed).
+        method (str): One of ``SIMILARITY_METHODS``.
+        normalizer: What to compare, see :func:`compile_normalizer`.
+
+    Returns:
+        numpy.ndarray: The (runs x runs) similarity matrix.
+    """
+    return pairwise_similarity_matrix(_normalize_outputs(outputs, normalizer), method=method)
+
+def calculate_consistency_from_outputs(outputs, method=DEFAULT_SIMILARITY_METHOD, normalizer=None):
+    """
+    Calculates the consistency metric for parsed outputs that are already in memory.
+
+    Args:
+        outputs (list): The parsed JSON output of each run. ``None`` marks a run whose
+            output could not be parsed; it scores as an empty output.
+        method (str): One of ``SIMILARITY_METHODS``.
+        normalizer: What to compare, see :func:`compile_normalizer`.
+
     Returns:
         float: The average consistency score (0.0 to 1.0).
     """
+    return mean_pairwise_similarity(similarity_matrix_from_outputs(outputs, method=method, normalizer=normalizer))
+
+def calculate_consistency_from_results(results, method=DEFAULT_SIMILARITY_METHOD, normalizer=None):
+    """
+    Calculates the consistency metric straight from the result dictionaries returned
+    by ``run_prompt_experiment``, without going back to MLflow.
+
+    Args:
+        results (list): Result dictionaries carrying a ``parsed_output`` entry.
+        method (str): One of ``SIMILARITY_METHODS``.
+        normalizer: What to compare, see :func:`compile_normalizer`.
+
+    Returns:
+        float: The average consistency score (0.0 to 1.0).
+    """
+    return calculate_consistency_from_outputs([r.get("parsed_output") for r in results], method=method,
+                                              normalizer=normalizer)
+
+def score_outputs(outputs, method=DEFAULT_SIMILARITY_METHOD, normalizer=None):
+    """
+    Scores a batch overall and, for a schema normalizer, field by field, normalizing
+    each output only once.
+
+    Returns:
+        tuple: The overall consistency score and a dict of per-field scores (empty
+        unless ``normalizer`` is a ``SchemaNormalizer`` or a fields dict).
+    """
+    normalizer = compile_normalizer(normalizer)
+    normalized = [_normalize_one(normalizer, content, i) for i, content in enumerate(outputs)]
+    if not isinstance(normalizer, SchemaNormalizer):
+        return mean_pairwise_similarity(pairwise_similarity_matrix(normalized, method=method)), {}
+    field_scores = {
+        name: mean_pairwise_similarity(pairwise_similarity_matrix([fields[name] for fields in normalized],
+                                                                  method=method))
+        for name in normalizer.fields
+    }
+    overall = mean_pairwise_similarity(
+        pairwise_similarity_matrix([normalizer.combine(fields) for fields in normalized], method=method))
+    return overall, field_scores
+
+def field_consistency_from_outputs(outputs, normalizer, method=DEFAULT_SIMILARITY_METHOD):
+    """
+    Returns the consistency score of each field of a schema normalizer separately.
+
+    Args:
+        outputs (list): The parsed JSON output of each run (None if unparsed).
+        normalizer: A ``SchemaNormalizer`` or a fields dict.
+        method (str): One of ``SIMILARITY_METHODS``.
+
+    Returns:
+        dict: Field name -> average consistency score (0.0 to 1.0).
+    """
+    return score_outputs(outputs, method=method, normalizer=normalizer)[1]
+
+class IncrementalConsistencyEvaluator:
+    """
+    Maintains the pairwise similarity matrix and consistency score of a batch while its
+    runs complete.
+
+    Each added output is compared only against the outputs already seen, in O(n) work
+    through an inverted index of item IDs, so the score can be shown (and the batch
+    stopped) before the last run finishes. Under ``"semantic"`` only items not seen in
+    an earlier run are embedded.
+
+    Args:
+        method (str): One of ``SIMILARITY_METHODS``.
+        num_perm (int): Number of hash permutations for ``"minhash"``.
+        normalizer: What to compare, see :func:`compile_normalizer`.
+        embedder (Embedder, optional): Embeds the items for ``"semantic"``; defaults to
+            the process-wide one.
+    """
+
+    def __init__(self, method=DEFAULT_SIMILARITY_METHOD, num_perm=DEFAULT_NUM_PERMUTATIONS, normalizer=None,
+                 embedder=None):
+        if method not in SIMILARITY_METHODS:
+            raise ValueError(f"Unknown similarity method: '{method}'. "
+                             f"Supported methods are {', '.join(SIMILARITY_METHODS)}.")
+        self.method = method
+        self.normalizer = compile_normalizer(normalizer)
+        self.vocabulary = ItemVocabulary()
+        self.n = 0
+        self._similarity = np.zeros((8, 8))
+        self._sizes = []
+        self._postings = {}  # item ID -> list of runs containing it
+        self._row_sums = np.zeros(8)
+        self._pair_sum = 0.0
+        if method == MINHASH:
+            self._minhash = _minhash_params(num_perm)
+            self._signatures = np.zeros((8, num_perm), dtype=np.int64)
+        if method == SEMANTIC:
+            self.embedder = embedder or get_embedder()
+            self._vectors = None  # one row per item ID
+            self._run_items = []  # item IDs of each run
+
+    def _grow(self):
+        capacity = self._similarity.shape[0] * 2
+        similarity = np.zeros((capacity, capacity))
+        similarity[:self.n, :self.n] = self._similarity[:self.n, :self.n]
+        self._similarity = similarity
+        self._row_sums = np.concatenate([self._row_sums, np.zeros(capacity - len(self._row_sums))])
+        if self.method == MINHASH:
+            signatures = np.zeros((capacity, self._signatures.shape[1]), dtype=np.int64)
+            signatures[:self.n] = self._signatures[:self.n]
+            self._signatures = signatures
+
+    def _embed_new_items(self):
+        known = 0 if self._vectors is None else len(self._vectors)
+        if len(self.vocabulary) == known:
+            return
+        new = self.embedder.embed(list(self.vocabulary.ids)[known:])
+        self._vectors = new if self._vectors is None else np.concatenate([self._vectors, new])
+
+    def _semantic_to_previous(self, ids):
+        n = self.n
+        sizes = np.asarray(self._sizes, dtype=np.float64)
+        row = np.zeros(n)
+        if not len(ids):
+            row[sizes == 0] = 1.0
+            return row
+        self._embed_new_items()
+        previous = np.flatnonzero(sizes)
+        if not len(previous):
+            return row
+        columns = [self._run_items[s] for s in previous]
+        starts = np.cumsum([0] + [len(c) for c in columns[:-1]])
+        # Against each distinct item once, then gathered per run
+        scores = _item_similarity(self._vectors[ids], self._vectors,
+                                  DEFAULT_SEMANTIC_THRESHOLD)[:, np.concatenate(columns)]
+        # How well the new run's items are matched in each earlier run, and the reverse
+        precision = np.maximum.reduceat(scores, starts, axis=1).mean(axis=0)
+        recall = np.add.reduceat(scores.max(axis=0), starts) / sizes[previous]
+        row[previous] = _soft_dice(precision, recall)
+        return row
+
+    def _similarities_to_previous(self, ids):
+        n = self.n
+        if self.method == SEMANTIC:
+            return self._semantic_to_previous(ids)
+        if self.method == MINHASH:
+            signature = _minhash_signature(ids, *self._minhash)
+            self._signatures[n] = signature
+            return (self._signatures[:n] == signature).mean(axis=1)
+
+        postings = [self._postings[i] for i in ids.tolist() if i in self._postings]
+        if postings:
+            intersections = np.bincount(np.concatenate(postings), minlength=n)[:n].astype(np.float64)
+        else:
+            intersections = np.zeros(n)
+        sizes = np.asarray(self._sizes, dtype=np.float64)
+        if self.method == JACCARD:
+            numerators, denominators = intersections, sizes + len(ids) - intersections
+        else:
+            numerators, denominators = 2 * intersections, sizes + len(ids)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominators > 0, numerators / denominators, 1.0)
+
+    def add_output(self, content):
+        """
+        Adds one run's parsed output (None if unparsed) and returns the updated score.
+        """
+        items = _normalize_one(self.normalizer, content, self.n)
+        if isinstance(self.normalizer, SchemaNormalizer):
+            items = self.normalizer.combine(items)
+        ids = np.unique(self.vocabulary.intern(items))
+
+        if self.n == self._similarity.shape[0]:
+            self._grow()
+        n = self.n
+        row = self._similarities_to_previous(ids)
+        self._similarity[n, :n] = row
+        self._similarity[:n, n] = row
+        self._similarity[n, n] = 1.0
+        self._row_sums[:n] += row
+        self._row_sums[n] = row.sum()
+        self._pair_sum += row.sum()
+
+        for item_id in ids.tolist():
+            self._postings.setdefault(item_id, []).append(n)
+        if self.method == SEMANTIC:
+            self._run_items.append(ids)
+        self._sizes.append(len(ids))
+        self.n += 1
+        return self.score
+
+    def add_result(self, result):
+        """Adds a result dictionary returned by ``run_prompt_experiment``."""
+        return self.add_output(result.get("parsed_output"))
+
+    @property
+    def score(self):
+        """The mean pairwise similarity of the outputs added so far."""
+        pairs = self.n * (self.n - 1) / 2
+        return self._pair_sum / pairs if pairs else 0.0
+
+    @property
+    def similarity_matrix(self):
+        """A copy of the current (runs x runs) similarity matrix."""
+        return self._similarity[:self.n, :self.n].copy()
+
+    def confidence_interval(self, z=1.96):
+        """
+        Returns a normal-approximation interval for the batch score.
+
+        The score is a U-statistic over pairs, so its variance is estimated from the
+        spread of each run's mean similarity to the others (4 * var / n).
+
+        Returns:
+            tuple: ``(low, high)``, clipped to [0, 1]; (0.0, 1.0) with fewer than 3 runs.
+        """
+        n = self.n
+        if n < 3:
+            return 0.0, 1.0
+        run_means = self._row_sums[:n] / (n - 1)
+        half_width = z * np.sqrt(4 * run_means.var(ddof=1) / n)
+        return max(0.0, self.score - half_width), min(1.0, self.score + half_width)
+
+    def is_converged(self, tolerance=0.05, min_runs=5, z=1.96):
+        """True once at least ``min_runs`` outputs are in and the interval half-width is within ``tolerance``."""
+        if self.n < max(3, min_runs):
+            return False
+        low, high = self.confidence_interval(z=z)
+        return (high - low) / 2 <= tolerance
+
+def _download_artifact(client, run_id, artifact_path, cache_dir):
+    """Returns the local path of a run artifact, downloading it only if not cached."""
+    run_dir = os.path.join(cache_dir, run_id)
+    local_path = os.path.join(run_dir, artifact_path)
+    if not os.path.exists(local_path):
+        os.makedirs(run_dir, exist_ok=True)
+        local_path = client.download_artifacts(run_id, artifact_path, run_dir)
+    return local_path
+
+def load_run_outputs(run_ids, artifact_path="output.json", cache_dir=DEFAULT_ARTIFACT_CACHE_DIR,
+                     max_workers=DEFAULT_DOWNLOAD_WORKERS):
+    """
+    Downloads and parses the JSON output artifact of historical runs in parallel.
+
+    Args:
+        run_ids (list): List of run IDs to load.
+        artifact_path (str): The path to the JSON output artifact.
+        cache_dir (str): Local directory used to cache downloaded artifacts.
+        max_workers (int): The maximum number of concurrent downloads.
+
+    Returns:
+        list: The parsed output of each run in ``run_ids`` order (None if unavailable).
+    """
     client = MlflowClient()
-    normalized_lists = []
 
-    for run_id in run_ids:
+    def load(run_id):
         try:
-            local_path = client.download_artifacts(run_id, artifact_path)
+            local_path = _download_artifact(client, run_id, artifact_path, cache_dir)
             with open(local_path, "r") as f:
-                content = json.load(f)
-            
-            # Extract ingredient_composition
-            # We assume the root is a dict containing this key, or the list itself
-            if isinstance(content, dict):
-                ingredients_data = content.get("ingredient_composition", [])
-            else:
-                ingredients_data = content # Fallback if the root is the list
-            
-            norm_list = normalize_ingredients(ingredients_data)
-            normalized_lists.append(norm_list)
+                return json.load(f)
         except Exception as e:
             print(f"Error processing run {run_id}: {e}")
-            # We append an empty list to represent a failure to parse, 
-            # which will naturally lower the consistency score against valid runs.
-            normalized_lists.append([])
+            return None
 
-    if len(normalized_lists) < 2:
-        return 0.0
+    if not run_ids:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(run_ids)))) as executor:
+        return list(executor.map(load, run_ids))
 
-    scores = []
-    # Compare every pair of runs
-    for i in range(len(normalized_lists)):
-        for j in range(i + 1, len(normalized_lists)):
-            # Convert lists to string representation for SequenceMatcher
-            str1 = "\n".join(normalized_lists[i])
-            str2 = "\n".join(normalized_lists[j])
-            
-            matcher = difflib.SequenceMatcher(None, str1, str2)
-            scores.append(matcher.ratio())
-
-    if not scores:
-        return 0.0
-        
-    return sum(scores) / len(scores)
+def calculate_consistency_metric(experiment_id, run_ids, artifact_path="output.json",
+                                 cache_dir=DEFAULT_ARTIFACT_CACHE_DIR, method=DEFAULT_SIMILARITY_METHOD,
+                                 normalizer=None):
+    """
+    Calculates the consistency metric for a batch of historical runs logged to MLflow.
+
+    For runs whose outputs are still in memory use
+    :func:`calculate_consistency_from_results` instead.
+
+    Args:
+        experiment_id (str): The ID of the experiment.
+        run_ids (list): List of run IDs to evaluate.
+        artifact_path (str): The path to the JSON output artifact.
+        cache_dir (str): Local directory used to cache downloaded artifacts.
+        method (str): One of ``SIMILARITY_METHODS``.
+        normalizer: What to compare, see :func:`compile_normalizer`.
+
+    Returns:
+        float: The average consistency score (0.0 to 1.0).
+    """
+    outputs = load_run_outputs(run_ids, artifact_path=artifact_path, cache_dir=cache_dir)
+    return calculate_consistency_from_outputs(outputs, method=method, normalizer=normalizer)
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+
+# Context cache modes
+OFF = "off"
+AUTO = "auto"  # batches cache long system prompts on providers that support it
+CONTEXT_CACHE_MODES = (OFF, AUTO)
+
+# Gemini's smallest cacheable prompt is 1,024 tokens; shorter prompts aren't worth a cache
+DEFAULT_MIN_TOKENS = 1024
+DEFAULT_TTL = 600
+# A handle this close to expiry isn't handed out; runs would fail once it's gone
+EXPIRY_MARGIN = 30
+
+
+class ContextCacheRegistry:
+    """
+    The provider-side caches of system prompts the engine has created, one per
+    (model, system prompt).
+
+    A batch calls :meth:`acquire` once before its runs start, which creates the cache
+    the first time; its runs then only :meth:`get` the handle, so up to hundreds of
+    repeats share one cache instead of resending the system prompt each time. Failed
+    creations (an unsupported model, a prompt below the provider's minimum) are
+    remembered and not retried, so such runs simply go uncached.
+
+    Args:
+        create (callable): ``create(model_spec, system_prompt, ttl)`` returns a
+            :class:`~llm_providers.base.ContextCache`, or None if the provider has no
+            explicit caching.
+        delete (callable, optional): ``delete(model_spec, handle)`` removes a cache.
+        mode (str): One of ``CONTEXT_CACHE_MODES``.
+        min_tokens (int): Estimated size below which a system prompt isn't cached.
+        ttl (float): Lifetime of a created cache, in seconds.
+    """
+
+    def __init__(self, create, delete=None, mode=AUTO, min_tokens=DEFAULT_MIN_TOKENS, ttl=DEFAULT_TTL):
+        self._create = create
+        self._delete = delete
+        self._handles = {}
+        self._unavailable = set()
+        self._lock = threading.Lock()
+        # Creating a cache is a remote call; one at a time, so concurrent batches share it
+        self._create_lock = threading.Lock()
+        self.configure(mode=mode, min_tokens=min_tokens, ttl=ttl)
+
+    def configure(self, mode=AUTO, min_tokens=DEFAULT_MIN_TOKENS, ttl=DEFAULT_TTL):
+        """Changes the mode, size threshold and TTL; existing handles are kept."""
+        if mode not in CONTEXT_CACHE_MODES:
+            raise ValueError(f"Unknown context cache mode: '{mode}'. "
+                             f"Supported modes are {', '.join(CONTEXT_CACHE_MODES)}.")
+        self.mode = mode
+        self.min_tokens = min_tokens
+        self.ttl = ttl
+
+    @staticmethod
+    def _key(model_spec, system_prompt):
+        return model_spec, hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()
+
+    def _valid(self, key):
+        handle = self._handles.get(key)
+        if handle is not None and handle.expires_in() > EXPIRY_MARGIN:
+            return handle
+        return None
+
+    def get(self, model_spec, system_prompt):
+        """Returns the live cache handle for ``(model_spec, system_prompt)``, or None."""
+        if self.mode == OFF or not system_prompt:
+            return None
+        with self._lock:
+            return self._valid(self._key(model_spec, system_prompt))
+
+    def acquire(self, model_spec, system_prompt, estimated_tokens):
+        """
+        Returns the cache handle for ``(model_spec, system_prompt)``, creating the cache
+        if there is none yet (or it is about to expire).
+
+        Returns:
+            ContextCache: The handle, or None when caching is off, the prompt is shorter
+            than ``min_tokens`` or the provider can't cache it.
+        """
+        if self.mode == OFF or not system_prompt or estimated_tokens < self.min_tokens:
+            return None
+        key = self._key(model_spec, system_prompt)
+        with self._lock:
+            handle = self._valid(key)
+            if handle is not None or key in self._unavailable:
+                return handle
+        with self._create_lock:
+            with self._lock:
+                handle = self._valid(key)
+            if handle is not None:
+                return handle
+            try:
+                handle = self._create(model_spec, system_prompt, self.ttl)
+            except Exception as e:
+                print(f"Error creating context cache for {model_spec}: {e}")
+                handle = None
+            with self._lock:
+                if handle is None:
+                    self._unavailable.add(key)
+                else:
+                    self._handles[key] = handle
+        return handle
+
+    def clear(self, delete=True):
+        """
+        Forgets every handle, deleting the caches on the provider's side first unless
+        ``delete`` is False (e.g. when the API key they belong to was replaced).
+        """
+        with self._lock:
+            handles = list(self._handles.items())
+            self._handles.clear()
+            self._unavailable.clear()
+        if not delete or self._delete is None:
+            return
+        for (model_spec, _), handle in handles:
+            try:
+                self._delete(model_spec, handle)
+            except Exception as e:
+                print(f"Error deleting context cache {handle.name}: {e}")
@@ -0,0 +1,203 @@
+import difflib
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from ._lazy import LazyImport
+
+jsondiff = LazyImport("jsondiff")
+
+CHANGED = "changed"
+ADDED = "added"
+REMOVED = "removed"
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_MEMO_SIZE = 256
+
+
+class DiffMemo:
+    """Small thread-safe LRU for computed diffs, keyed by the run IDs involved."""
+
+    def __init__(self, max_entries=DEFAULT_MEMO_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_memo = DiffMemo()
+
+
+def _format_path(path):
+    return "$" + "".join(f"[{key}]" if isinstance(key, int) else f".{key}" for key in path)
+
+
+def _hunk(kind, path, old=None, new=None):
+    return {"kind": kind, "path": path, "old": old, "new": new}
+
+
+def _entries(changes):
+    # Dict changes map keys to values; list changes are (index, value) pairs
+    if changes is None:
+        return {}
+    return dict(changes.items() if isinstance(changes, dict) else changes)
+
+
+def _flatten_symmetric(diff, path, hunks):
+    """Turns a ``jsondiff`` symmetric diff into flat hunks with JSONPath-like paths."""
+    if isinstance(diff, list):
+        # [old, new] for a replaced value
+        hunks.append(_hunk(CHANGED, _format_path(path), diff[0], diff[1]))
+        return
+    removed = _entries(diff.get(jsondiff.symbols.delete))
+    added = _entries(diff.get(jsondiff.symbols.insert))
+    # A list item deleted and inserted at the same index was replaced
+    for key in [k for k in removed if k in added]:
+        hunks.append(_hunk(CHANGED, _format_path(path + [key]), removed.pop(key), added.pop(key)))
+    for key, value in removed.items():
+        hunks.append(_hunk(REMOVED, _format_path(path + [key]), old=value))
+    for key, value in added.items():
+        hunks.append(_hunk(ADDED, _format_path(path + [key]), new=value))
+    for key, value in diff.items():
+        if key not in (jsondiff.symbols.insert, jsondiff.symbols.delete):
+            _flatten_symmetric(value, path + [key], hunks)
+
+
+def structural_diff(a, b):
+    """
+    Diffs two parsed JSON outputs field by field.
+
+    Returns:
+        list: Hunks ``{"kind", "path", "old", "new"}`` where ``kind`` is one of
+        ``changed``, ``added`` or ``removed`` and ``path`` looks like ``$.items[2].name``.
+    """
+    if a == b:
+        return []
+    if not isinstance(a, (dict, list)) or not isinstance(b, (dict, list)) or type(a) is not type(b):
+        return [_hunk(CHANGED, "$", a, b)]
+    hunks = []
+    _flatten_symmetric(jsondiff.diff(a, b, syntax="symmetric"), [], hunks)
+    return hunks
+
+
+def text_diff(a, b):
+    """
+    Line diff of two raw outputs, for runs whose output isn't JSON. Hunks use the same
+    shape as :func:`structural_diff`, with line ranges as paths.
+    """
+    a_lines, b_lines = (a or "").splitlines(), (b or "").splitlines()
+    hunks = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a_lines, b_lines, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        kind = {"replace": CHANGED, "insert": ADDED, "delete": REMOVED}[tag]
+        path = f"lines {i1 + 1}-{i2}" if kind != ADDED else f"after line {i1}"
+        hunks.append(_hunk(kind, path, "\n".join(a_lines[i1:i2]) or None, "\n".join(b_lines[j1:j2]) or None))
+    return hunks
+
+
+def diff_runs(run_a, run_b, memo=None):
+    """
+    Diffs the outputs of two result dictionaries, structurally when both parsed as
+    JSON and line by line otherwise. Diffs are memoized per ``(run_a, run_b)`` run ID
+    pair, so UI reruns don't recompute them.
+    """
+    memo = _memo if memo is None else memo
+
+    def compute():
+        if run_a.get("parsed_output") is not None and run_b.get("parsed_output") is not None:
+            return structural_diff(run_a["parsed_output"], run_b["parsed_output"])
+        return text_diff(run_a.get("output_text"), run_b.get("output_text"))
+
+    key = (run_a.get("run_id"), run_b.get("run_id"))
+    if None in key:
+        return compute()
+    return memo.get_or_compute(("pair",) + key, compute)
+
+
+def paginate(hunks, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Returns one page of hunks.
+
+    Returns:
+        tuple: The hunks of ``page`` (1-based, clamped to the valid range) and the
+        number of pages.
+    """
+    num_pages = max(1, math.ceil(len(hunks) / page_size))
+    page = min(max(1, page), num_pages)
+    return hunks[(page - 1) * page_size:page * page_size], num_pages
+
+
+def _leaves(value, path, leaves):
+    if isinstance(value, dict) and value:
+        for key, child in value.items():
+            _leaves(child, path + [key], leaves)
+    elif isinstance(value, list) and value:
+        for index, child in enumerate(value):
+            _leaves(child, path + [index], leaves)
+    else:
+        leaves[_format_path(path)] = json.dumps(value, sort_keys=True)
+
+
+def field_variance(outputs):
+    """
+    N-way variance view: for every leaf field seen in any parsed output, how many runs
+    have it, how many distinct values it takes and how often the most common one occurs.
+
+    Outputs that are not JSON are skipped. The work is one pass over all outputs
+    instead of a diff per pair.
+
+    Returns:
+        list: One dict per field (``path``, ``present``, ``distinct``, ``agreement``,
+        ``most_common``), the most variable fields first.
+    """
+    parsed = [output for output in outputs if output is not None]
+    values = {}
+    for output in parsed:
+        leaves = {}
+        _leaves(output, [], leaves)
+        for path, value in leaves.items():
+            values.setdefault(path, Counter())[value] += 1
+
+    fields = []
+    for path, counts in values.items():
+        most_common, most_common_count = counts.most_common(1)[0]
+        fields.append({
+            "path": path,
+            "present": sum(counts.values()),
+            "distinct": len(counts),
+            # Runs lacking the field count as disagreeing
+            "agreement": most_common_count / len(parsed),
+            "most_common": json.loads(most_common),
+        })
+    fields.sort(key=lambda f: (f["agreement"], -f["distinct"], f["path"]))
+    return fields
+
+
+def field_variance_for_runs(results, memo=None):
+    """:func:`field_variance` over the parsed outputs of a batch, memoized per set of run IDs."""
+    memo = _memo if memo is None else memo
+    run_ids = tuple(r.get("run_id") for r in results)
+    compute = lambda: field_variance([r.get("parsed_output") for r in results])
+    if None in run_ids:
+        return compute()
+    return memo.get_or_compute(("variance",) + run_ids, compute)
@@ -0,0 +1,231 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import zlib
+import numpy as np
+from ._lazy import LazyImport
+
+genai = LazyImport("google.generativeai")
+
+# Embedding backends
+HASHING = "hashing"  # local and deterministic; no model, no network
+GEMINI = "gemini"
+EMBEDDING_BACKENDS = (HASHING, GEMINI)
+
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(".cache", "embeddings.sqlite")
+DEFAULT_DIMENSIONS = 512
+DEFAULT_GEMINI_EMBEDDING_MODEL = "models/text-embedding-004"
+# The most texts the Gemini API embeds in one request
+GEMINI_BATCH_SIZE = 100
+# SQLite's default limit on host parameters is 999
+_LOOKUP_CHUNK = 500
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+class HashingEmbedder:
+    """
+    Embeds text locally with the hashing trick over the character trigrams of its words.
+
+    Words are bagged, so word order and punctuation don't matter ("flour, all purpose"
+    and "all-purpose flour" embed identically), and trigrams keep inflections close
+    ("egg"/"eggs"). It needs no model download and gives the same vectors on every
+    machine, which makes it the default backend and the one tests use.
+
+    Args:
+        dimensions (int): Length of the vectors.
+    """
+
+    def __init__(self, dimensions=DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"{HASHING}-{dimensions}"
+
+    def __call__(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in _WORD.findall(text.lower()):
+                padded = f"#{word}#"
+                for i in range(len(padded) - 2):
+                    # The hash picks the dimension and, with its top bit, the sign
+                    h = zlib.crc32(padded[i:i + 3].encode("utf-8"))
+                    vectors[row, h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        return vectors
+
+
+class GeminiEmbedder:
+    """
+    Embeds text with a Gemini embedding model (``genai`` must be configured).
+
+    Texts are sent ``batch_size`` at a time, the most one request takes.
+
+    Args:
+        model (str): The embedding model.
+        batch_size (int): Texts per request.
+    """
+
+    def __init__(self, model=DEFAULT_GEMINI_EMBEDDING_MODEL, batch_size=GEMINI_BATCH_SIZE):
+        self.model = model
+        self.batch_size = batch_size
+        self.name = f"{GEMINI}:{model}"
+
+    def __call__(self, texts):
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            result = genai.embed_content(model=self.model, content=texts[start:start + self.batch_size],
+                                         task_type="semantic_similarity")
+            vectors.extend(result["embedding"])
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def resolve_backend(backend=None):
+    """
+    Resolves the ``backend`` argument of :class:`Embedder` into a callable.
+
+    Args:
+        backend: None or ``"hashing"`` for :class:`HashingEmbedder`, ``"gemini"`` for
+            :class:`GeminiEmbedder`, or any callable mapping a list of strings to a
+            (texts x dimensions) array. Give custom callables a ``name`` attribute so
+            their cached vectors aren't mixed up with another backend's.
+    """
+    if backend is None or backend == HASHING:
+        return HashingEmbedder()
+    if backend == GEMINI:
+        return GeminiEmbedder()
+    if isinstance(backend, str):
+        raise ValueError(f"Unknown embedding backend: '{backend}'. "
+                         f"Supported backends are {', '.join(EMBEDDING_BACKENDS)}.")
+    return backend
+
+
+def _l2_normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1.0)
+
+
+class EmbeddingCache:
+    """
+    An on-disk cache of embedding vectors backed by SQLite, keyed on a hash of the
+    backend name and the text.
+
+    Args:
+        path (str): Location of the SQLite database file.
+    """
+
+    def __init__(self, path=DEFAULT_EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(backend_name, text):
+        """Returns the content hash identifying one text embedded by one backend."""
+        return hashlib.sha256(f"{backend_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Returns ``{key: vector}`` for the keys that are cached."""
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_CHUNK):
+                chunk = keys[start:start + _LOOKUP_CHUNK]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(chunk))})", chunk)
+                found.update((key, np.frombuffer(blob, dtype=np.float32)) for key, blob in rows)
+        return found
+
+    def put_many(self, vectors):
+        """Stores ``{key: vector}``."""
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                                   [(key, np.asarray(v, dtype=np.float32).tobytes()) for key, v in vectors.items()])
+            self._conn.commit()
+
+    def stats(self):
+        """Returns the number of cached vectors."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class Embedder:
+    """
+    Turns strings into unit-length vectors, embedding each distinct string once.
+
+    Repeated strings within a call are embedded once, and with a ``cache`` only the
+    strings never seen before reach the backend at all, so re-scoring a batch (or a
+    batch that repeats earlier items) costs no further backend calls.
+
+    Args:
+        backend: See :func:`resolve_backend`.
+        cache (EmbeddingCache, optional): Where vectors are kept between calls and sessions.
+    """
+
+    def __init__(self, backend=None, cache=None):
+        self.backend = resolve_backend(backend)
+        self.name = getattr(self.backend, "name", None) or getattr(self.backend, "__qualname__", repr(self.backend))
+        self.cache = cache
+
+    def embed(self, texts):
+        """
+        Returns the (texts x dimensions) float32 matrix of the L2-normalized embeddings
+        of ``texts``, so a matrix product of two such results gives cosine similarities.
+        """
+        unique = list(dict.fromkeys(texts))
+        if not unique:
+            return np.zeros((0, 0), dtype=np.float32)
+        vectors = {}
+        if self.cache is not None:
+            keys = {text: EmbeddingCache.make_key(self.name, text) for text in unique}
+            cached = self.cache.get_many(list(keys.values()))
+            vectors = {text: cached[key] for text, key in keys.items() if key in cached}
+        missing = [text for text in unique if text not in vectors]
+        if missing:
+            computed = _l2_normalize(np.asarray(self.backend(missing), dtype=np.float32))
+            vectors.update(zip(missing, computed))
+            if self.cache is not None:
+                self.cache.put_many({keys[text]: vectors[text] for text in missing})
+        return np.stack([vectors[text] for text in texts])
+
+
+_embedder = Embedder()
+_embedder_lock = threading.Lock()
+
+
+def configure_embeddings(backend=HASHING, cache_path=DEFAULT_EMBEDDING_CACHE_PATH):
+    """
+    Sets the process-wide embedder used by semantic consistency scoring.
+
+    Args:
+        backend: See :func:`resolve_backend`.
+        cache_path (str, optional): Location of the on-disk embedding cache; None
+            keeps vectors only for the duration of each call.
+
+    Returns:
+        Embedder: The active embedder.
+    """
+    global _embedder
+    backend = resolve_backend(backend)
+    with _embedder_lock:
+        if _embedder.cache is not None:
+            _embedder.cache.close()
+        _embedder = Embedder(backend, cache=EmbeddingCache(cache_path) if cache_path else None)
+        return _embedder
+
+
+def get_embedder():
+    """
+    Returns the active embedder. Until :func:`configure_embeddings` is called this is
+    the local hashing backend without a disk cache (hashing is cheaper than a lookup).
+    """
+    return _embedder
@@ -0,0 +1,250 @@
+import atexit
+import hashlib
+import os
+import threading
+import time
+import uuid
+from ._lazy import LazyImport
+
+pa = LazyImport("pyarrow")
+pq = LazyImport("pyarrow.parquet")
+ds = LazyImport("pyarrow.dataset")
+
+DEFAULT_HISTORY_PATH = os.path.join(".cache", "history")
+DEFAULT_FLUSH_ROWS = 256
+# Part files a partition may collect before a flush merges them
+DEFAULT_COMPACT_PARTS = 16
+
+# Partition keys, in directory order: <root>/experiment=<id>/prompt_hash=<hash>/part-*.parquet
+PARTITION_COLUMNS = ("experiment", "prompt_hash")
+
+_COLUMNS = (
+    ("run_id", "string"),
+    ("parent_run_id", "string"),
+    ("run_name", "string"),
+    ("model_name", "string"),
+    ("run_index", "int64"),
+    ("status", "string"),
+    ("cache_hit", "bool_"),
+    ("latency", "float64"),
+    ("prompt_token_count", "int64"),
+    ("candidates_token_count", "int64"),
+    ("total_token_count", "int64"),
+    ("finish_reason", "string"),
+    ("output_text", "string"),
+    ("system_prompt", "string"),
+    ("timestamp", "float64"),
+)
+
+
+def prompt_hash(system_prompt):
+    """Short, stable ID of a system prompt, used as a partition key."""
+    return hashlib.sha256(system_prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def _schema():
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in _COLUMNS])
+
+
+def _partitioning():
+    # Explicit string types; hive inference would turn experiment "0" into an int
+    return ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor="hive")
+
+
+class ResultsStore:
+    """
+    Local, columnar archive of every run, for browsing history without the tracking server.
+
+    Rows are buffered in memory and written as Parquet files partitioned by experiment
+    and prompt hash, so a query for one prompt only opens that prompt's files. Each
+    flush adds new part files, and a partition is merged into one file once it holds
+    ``compact_parts`` of them, so its file count stays bounded.
+
+    Args:
+        root (str): Directory holding the dataset.
+        flush_rows (int): Buffered rows that trigger a write.
+        compact_parts (int): Part files that trigger the compaction of a partition;
+            None leaves compaction to :meth:`compact`.
+    """
+
+    def __init__(self, root=DEFAULT_HISTORY_PATH, flush_rows=DEFAULT_FLUSH_ROWS, compact_parts=DEFAULT_COMPACT_PARTS):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.compact_parts = compact_parts
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def append(self, row):
+        """
+        Buffers one run. ``row`` holds the partition keys and any of the store's columns;
+        missing columns are stored as nulls.
+        """
+        row = dict(row)
+        row.setdefault("timestamp", time.time())
+        with self._lock:
+            self._buffer.append(row)
+            full = len(self._buffer) >= self.flush_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered rows, one Parquet file per partition, compacting full partitions."""
+        with self._lock:
+            rows, self._buffer = self._buffer, []
+        if not rows:
+            return
+        partitions = {}
+        for row in rows:
+            key = tuple(str(row.get(name) or "unknown") for name in PARTITION_COLUMNS)
+            partitions.setdefault(key, []).append(row)
+        schema = _schema()
+        with self._write_lock:
+            for key, partition_rows in partitions.items():
+                try:
+                    table = pa.Table.from_pylist(
+                        [{name: row.get(name) for name in schema.names} for row in partition_rows], schema=schema)
+                    self._write_part(key, table)
+                    if self.compact_parts and len(self._parts(self._partition_dir(key))) >= self.compact_parts:
+                        self._compact_partition(self._partition_dir(key), key)
+                except Exception as e:
+                    # The archive is best-effort; a bad batch must not break the runs
+                    print(f"Error writing {len(partition_rows)} runs to the results store: {e}")
+
+    def _partition_dir(self, key):
+        return os.path.join(self.root, *(f"{name}={value}" for name, value in zip(PARTITION_COLUMNS, key)))
+
+    @staticmethod
+    def _parts(directory):
+        return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".parquet"))
+
+    def _compact_partition(self, directory, key):
+        paths = self._parts(directory)
+        if len(paths) < 2:
+            return
+        table = pa.concat_tables([pq.read_table(p, schema=_schema()) for p in paths])
+        self._write_part(key, table)
+        for path in paths:
+            os.remove(path)
+
+    def _write_part(self, key, table):
+        directory = self._partition_dir(key)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"part-{int(time.time() * 1000)}-{uuid.uuid4().hex[:8]}.parquet")
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path)
+        # Readers never see a half-written part
+        os.replace(tmp_path, path)
+
+    def _dataset(self):
+        if not os.path.isdir(self.root):
+            return None
+        return ds.dataset(self.root, format="parquet", partitioning=_partitioning(),
+                          exclude_invalid_files=True)
+
+    def query(self, experiment=None, prompt_hash=None, model_names=None, since=None, columns=None):
+        """
+        Loads past runs as a DataFrame, newest first.
+
+        Filters on the partition keys skip whole directories; the others are pushed
+        down to the Parquet reader.
+
+        Args:
+            experiment (str, optional): Only runs of this MLflow experiment ID.
+            prompt_hash (str, optional): Only runs of this prompt (see :func:`prompt_hash`).
+            model_names (list, optional): Only runs of these models.
+            since (float, optional): Only runs started after this Unix time.
+            columns (list, optional): The columns to load; all by default.
+
+        Returns:
+            pandas.DataFrame: The matching runs (empty if there are none).
+        """
+        self.flush()
+        dataset = self._dataset()
+        if dataset is None:
+            return pa.Table.from_pylist([], schema=_schema()).to_pandas()
+        expression = None
+        for name, value in (("experiment", experiment), ("prompt_hash", prompt_hash)):
+            if value is not None:
+                expression = _and(expression, ds.field(name) == str(value))
+        if model_names:
+            expression = _and(expression, ds.field("model_name").isin(list(model_names)))
+        if since is not None:
+            expression = _and(expression, ds.field("timestamp") >= since)
+        frame = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        if "timestamp" in frame.columns:
+            frame = frame.sort_values("timestamp", ascending=False, ignore_index=True)
+        return frame
+
+    def compact(self):
+        """Rewrites every partition holding more than one part file as a single file."""
+        self.flush()
+        if not os.path.isdir(self.root):
+            return
+        with self._write_lock:
+            for directory, _, files in os.walk(self.root):
+                if sum(f.endswith(".parquet") for f in files) < 2:
+                    continue
+                key = tuple(os.path.basename(d).split("=", 1)[1]
+                            for d in os.path.relpath(directory, self.root).split(os.sep))
+                self._compact_partition(directory, key)
+
+
+def _and(expression, condition):
+    return condition if expression is None else expression & condition
+
+
+def summarize_history(frame, by=("prompt_hash", "model_name")):
+    """
+    Aggregates past runs per group: run count, pass rate, latency percentiles and mean
+    token usage.
+
+    Returns:
+        pandas.DataFrame: One row per group, most recent group first.
+    """
+    if frame.empty:
+        return frame
+    grouped = frame.assign(passed=frame["status"] == "Pass").groupby(list(by), dropna=False)
+    summary = grouped.agg(
+        runs=("run_id", "size"),
+        pass_rate=("passed", "mean"),
+        latency_p50=("latency", "median"),
+        latency_p95=("latency", lambda s: s.quantile(0.95)),
+        total_tokens_mean=("total_token_count", "mean"),
+        last_run=("timestamp", "max"),
+    )
+    return summary.sort_values("last_run", ascending=False).reset_index()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def configure_results_store(root=DEFAULT_HISTORY_PATH, enabled=True, flush_rows=DEFAULT_FLUSH_ROWS,
+                            compact_parts=DEFAULT_COMPACT_PARTS):
+    """
+    Turns on archiving into a process-wide results store under ``root`` (replacing any
+    earlier one); ``enabled=False`` turns it off again. Archiving is off until this is
+    called, since the store keeps every run's output text and system prompt on disk.
+    """
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.flush()
+        _store = ResultsStore(root, flush_rows=flush_rows, compact_parts=compact_parts) if enabled else None
+        return _store
+
+
+def get_results_store():
+    """Returns the process-wide results store, or None when archiving is off."""
+    return _store
+
+
+def flush_results_store():
+    """Writes any buffered rows of the process-wide store. Call when a batch completes."""
+    store = _store
+    if store is not None:
+        store.flush()
+
+
+atexit.register(flush_results_store)
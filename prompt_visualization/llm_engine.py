@@ -1,18 +1,758 @@
-import mlflow
-import google.generativeai as genai
 import os
 import time
-import json
+import asyncio
+import contextvars
+import functools
+import queue
+import threading
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .scheduler import CallStats, get_scheduler
+from .response_cache import REPLAY, CacheMissError, ResponseCache, get_response_cache
+from .mlflow_logger import RunLogger, flush_artifacts, upload_group
+from .batch_metrics import summarize_results
+from .consistency_evaluator import compile_normalizer
+from .context_cache import AUTO, DEFAULT_MIN_TOKENS, DEFAULT_TTL, ContextCacheRegistry
+from .history_store import flush_results_store, get_results_store, prompt_hash
+from .tracing import EVALUATOR, MODEL, TRACKING, Trace, current_trace, profiled, span, tracing
+from .utils import JSONStreamExtractor, extract_json
+from ._lazy import LazyImport
+from llm_providers import get_provider as create_provider
+
+# Both SDKs are slow to import; they load on first use
+mlflow = LazyImport("mlflow")
+genai = LazyImport("google.generativeai")
+
+# Default number of runs allowed in flight at once for a batch
+DEFAULT_MAX_CONCURRENCY = 8
+
+DEFAULT_TRACKING_URI = "http://localhost:5010"
+# MLflow's "Default" experiment
+DEFAULT_EXPERIMENT_ID = "0"
+
+_tracking_initialized = False
+_tracking_lock = threading.Lock()
+_experiment_id = None
+
+
+def init_tracking(tracking_uri=DEFAULT_TRACKING_URI, autolog=True):
+    """
+    Points MLflow at the tracking server and enables Gemini autologging.
+
+    Call once at startup (the app and the CLI do) before running experiments. Later
+    calls only change the tracking URI; autologging is enabled at most once.
+
+    Args:
+        tracking_uri (str): The MLflow tracking server URI.
+        autolog (bool): Whether to enable ``mlflow.gemini.autolog()``.
+    """
+    global _tracking_initialized
+    with _tracking_lock:
+        mlflow.set_tracking_uri(tracking_uri)
+        if autolog and not _tracking_initialized:
+            mlflow.gemini.autolog()
+            _tracking_initialized = True
+
+
+def configure_experiment(experiment_name):
+    """
+    Sets the MLflow experiment runs are logged to, creating it if needed.
+
+    Batches create their parent run through the client, which needs the experiment
+    ID up front, so use this rather than ``mlflow.set_experiment`` (or pass
+    ``experiment_id`` to the run functions).
+
+    Returns:
+        str: The experiment ID.
+    """
+    global _experiment_id
+    experiment_id = mlflow.set_experiment(experiment_name).experiment_id
+    with _tracking_lock:
+        _experiment_id = experiment_id
+    return experiment_id
+
+
+def _resolve_experiment_id(experiment_id=None):
+    """Returns ``experiment_id``, else the one set by :func:`configure_experiment`, else MLflow's Default."""
+    if experiment_id is not None:
+        return experiment_id
+    return _experiment_id if _experiment_id is not None else DEFAULT_EXPERIMENT_ID
+
+
+class LLMEngine:
+    """
+    Holds one long-lived ``llm_providers`` instance per provider, and the provider-side
+    context caches of system prompts (see :attr:`context_caches`).
+
+    Providers keep their SDK clients (and the gRPC/HTTP channels on them), so reusing
+    the provider across runs (and across threads or coroutines) reuses the same
+    connections instead of building a new client for every request.
+    """
+
+    SUPPORTED_PROVIDERS = ("google", "openrouter", "huggingface", "mock")
+
+    def __init__(self):
+        self._providers = {}
+        self._provider_options = {}
+        self._lock = threading.Lock()
+        self.context_caches = ContextCacheRegistry(self.create_context_cache, self.delete_context_cache)
+
+    def get_model(self, model_name, provider="google", system_prompt=None, context_cache=None):
+        """
+        Returns the Gemini model client for ``model_name`` with ``system_prompt`` as its
+        system instruction, held by the Google provider (see
+        :meth:`llm_providers.google.GoogleProvider.get_model`).
+        """
+        provider = provider.lower()
+        if provider != "google":
+            raise ValueError(f"Unknown provider: '{provider}'. Model clients are only held for 'google'; "
+                             "other providers go through get_provider.")
+        return self.get_provider(provider).get_model(model_name, system_prompt=system_prompt,
+                                                     context_cache=context_cache)
+
+    def create_context_cache(self, model_spec, system_prompt, ttl):
+        """
+        Caches ``system_prompt`` for ``model_spec`` on the provider's side (see
+        :meth:`llm_providers.base.LLMProvider.create_context_cache`).
+
+        Returns:
+            ContextCache: The handle, or None if the provider has no explicit caching.
+        """
+        provider, model_name = parse_model_spec(model_spec)
+        client = self.get_provider(provider)
+        if not client.supports_context_cache:
+            return None
+        return client.create_context_cache(model_name, system_prompt, ttl)
+
+    def delete_context_cache(self, model_spec, context_cache):
+        """Deletes a cache made by :meth:`create_context_cache`."""
+        provider, _ = parse_model_spec(model_spec)
+        self.get_provider(provider).delete_context_cache(context_cache)
+
+    def get_provider(self, provider):
+        """Returns the cached ``llm_providers`` instance (and its pooled client) for ``provider``."""
+        provider = provider.lower()
+        if provider not in self.SUPPORTED_PROVIDERS:
+            raise ValueError(f"Unknown provider: '{provider}'. Supported providers are "
+                             f"{', '.join(repr(p) for p in self.SUPPORTED_PROVIDERS)}.")
+        with self._lock:
+            instance = self._providers.get(provider)
+        if instance is None:
+            instance = create_provider(provider, **self._provider_options.get(provider, {}))
+            with self._lock:
+                instance = self._providers.setdefault(provider, instance)
+        return instance
+
+    def configure_provider(self, provider, **options):
+        """Sets the constructor options (e.g. ``api_key``) of ``provider`` and drops its cached instance."""
+        provider = provider.lower()
+        with self._lock:
+            self._provider_options[provider] = options
+            self._providers.pop(provider, None)
+
+    def clear(self):
+        """
+        Drops all cached provider clients and context cache handles (e.g. after the API
+        key changes).
+        """
+        with self._lock:
+            self._providers.clear()
+        self.context_caches.clear(delete=False)
+
+
+_engine = LLMEngine()
+
+
+def parse_model_spec(model_spec):
+    """
+    Splits a model spec into ``(provider, model_name)``.
+
+    Plain names are Gemini models; models of other providers are addressed as
+    ``"<provider>:<model>"``, e.g. ``"openrouter:openai/gpt-4o-mini"``.
+    """
+    provider, separator, model_name = model_spec.partition(":")
+    if separator and provider.lower() in LLMEngine.SUPPORTED_PROVIDERS:
+        return provider.lower(), model_name
+    return "google", model_spec
+
+
+def _scheduler_for(model_spec):
+    provider, model_name = parse_model_spec(model_spec)
+    return get_scheduler(model_name, provider)
+
+
+def get_engine():
+    """Returns the process-wide LLMEngine shared by the run functions."""
+    return _engine
 
-# Set MLflow tracking URI
-mlflow.set_tracking_uri("http://localhost:5010")
-mlflow.gemini.autolog()
 
 def configure_genai(api_key):
     """Configures the generative AI model."""
     genai.configure(api_key=api_key)
+    _engine.clear()
+    _engine.configure_provider("google", api_key=api_key)
+
+
+def configure_context_cache(mode=AUTO, min_tokens=DEFAULT_MIN_TOKENS, ttl=DEFAULT_TTL):
+    """
+    Sets how batches use provider-side context caching of their system prompt.
+
+    Args:
+        mode (str): ``"auto"`` caches system prompts of at least ``min_tokens``
+            (estimated) on providers that support it; ``"off"`` never does.
+        min_tokens (int): Estimated prompt size below which no cache is created.
+        ttl (float): Lifetime of a created cache, in seconds.
+    """
+    _engine.context_caches.configure(mode=mode, min_tokens=min_tokens, ttl=ttl)
 
-def run_prompt_experiment(raw_json_input, system_prompt, run_name, model_name):
+
+def acquire_context_cache(model_spec, system_prompt):
+    """
+    Makes sure ``system_prompt`` is cached for ``model_spec`` if it is worth caching,
+    so the runs that follow send only their input. Batches call this once before
+    starting their runs; it is cheap once the cache exists.
+
+    Returns:
+        ContextCache: The cache handle, or None if the runs go uncached.
+    """
+    with span("context_cache.acquire", MODEL):
+        return _engine.context_caches.acquire(model_spec, system_prompt, _estimate_tokens(system_prompt or ""))
+
+
+def _estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used to pre-charge the token bucket."""
+    return max(1, len(text) // 4)
+
+
+def _context_cache_kwargs(context_cache):
+    # Only providers that made the handle are passed one
+    return {"context_cache": context_cache} if context_cache is not None else {}
+
+
+def _record_usage(scheduler, estimated_tokens, record):
+    """Settles the scheduler's token bucket against the response's reported usage."""
+    usage = record.get("usage") or {}
+    total_tokens = usage.get("total_token_count")
+    if isinstance(total_tokens, int):
+        scheduler.record_usage(estimated_tokens, total_tokens)
+
+
+class _StreamTimer:
+    """Records when each chunk of a streamed response arrives."""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.chunk_times = []
+
+    def tick(self):
+        self.chunk_times.append(time.time())
+
+    def stats(self):
+        """Returns time-to-first-token and inter-chunk latency of the stream."""
+        if not self.chunk_times:
+            return {"chunk_count": 0}
+        gaps = [b - a for a, b in zip(self.chunk_times, self.chunk_times[1:])]
+        return {
+            "chunk_count": len(self.chunk_times),
+            "time_to_first_token": self.chunk_times[0] - self.start_time,
+            "mean_inter_chunk_latency": sum(gaps) / len(gaps) if gaps else 0.0,
+            "max_inter_chunk_latency": max(gaps) if gaps else 0.0,
+        }
+
+
+def _chunk_text(chunk):
+    try:
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        # Chunks without text parts (e.g. the final usage-only chunk)
+        return ""
+
+
+def _generate_streaming(model, message, generate_kwargs, on_chunk=None):
+    """
+    Streams a response chunk by chunk. ``on_chunk`` receives the text received so far
+    after every chunk (a retried call starts over from the beginning). The JSON in the
+    response is located while it streams in.
+
+    Returns:
+        tuple: The fully consumed response, its streaming stats and the
+        :class:`~prompt_visualization.utils.JSONStreamExtractor` fed with it.
+    """
+    timer = _StreamTimer()
+    extractor = JSONStreamExtractor()
+    response = model.generate_content(message, stream=True, **generate_kwargs)
+    for chunk in response:
+        timer.tick()
+        extractor.feed(_chunk_text(chunk))
+        if on_chunk:
+            on_chunk(extractor.text)
+    return response, timer.stats(), extractor
+
+
+async def _agenerate_streaming(model, message, generate_kwargs, on_chunk=None):
+    """Async counterpart of :func:`_generate_streaming`."""
+    timer = _StreamTimer()
+    extractor = JSONStreamExtractor()
+    response = await model.generate_content_async(message, stream=True, **generate_kwargs)
+    async for chunk in response:
+        timer.tick()
+        extractor.feed(_chunk_text(chunk))
+        if on_chunk:
+            on_chunk(extractor.text)
+    return response, timer.stats(), extractor
+
+
+def _response_record(response, latency, streaming=None, extractor=None):
+    """
+    Flattens a model response into the JSON-serializable record that is logged to
+    MLflow and stored in the response cache.
+
+    The output's JSON is parsed here, once (``extractor`` already did it for a
+    streamed response), and travels with the record from then on, so cache hits
+    don't parse it again either.
+    """
+    usage = None
+    if hasattr(response, 'usage_metadata'):
+        usage = {
+            "prompt_token_count": response.usage_metadata.prompt_token_count,
+            "candidates_token_count": response.usage_metadata.candidates_token_count,
+            "total_token_count": response.usage_metadata.total_token_count,
+        }
+        # Part of prompt_token_count when the system instruction came from a context cache
+        cached_tokens = getattr(response.usage_metadata, "cached_content_token_count", None)
+        if isinstance(cached_tokens, int):
+            usage["cached_content_token_count"] = cached_tokens
+
+    finish_reason = "UNKNOWN"
+    if response.candidates and hasattr(response.candidates[0], 'finish_reason'):
+        finish_reason = response.candidates[0].finish_reason.name
+
+    safety_ratings = {}
+    if hasattr(response, 'prompt_feedback') and response.prompt_feedback.safety_ratings:
+        for rating in response.prompt_feedback.safety_ratings:
+            safety_ratings[rating.category.name.lower()] = rating.probability.name
+
+    text = response.text if hasattr(response, 'text') else "Blocked or empty response"
+    return {
+        "text": text,
+        "latency": latency,
+        "usage": usage,
+        "finish_reason": finish_reason,
+        "safety_ratings": safety_ratings,
+        "streaming": streaming,
+        "parsed_output": extractor.finish() if extractor is not None else extract_json(text),
+    }
+
+
+def _generation_record(generation, latency, streaming=None, extractor=None):
+    """Builds the response record of a call made through an ``llm_providers`` provider."""
+    return {
+        "text": generation.text,
+        "latency": latency,
+        "usage": generation.usage,
+        "finish_reason": generation.finish_reason or "UNKNOWN",
+        "safety_ratings": {},
+        "streaming": streaming,
+        "parsed_output": extractor.finish() if extractor is not None else extract_json(generation.text),
+    }
+
+
+def _provider_stream_callback(timer, extractor, on_chunk):
+    """Feeds the pieces of a provider stream to the timer, the JSON extractor and ``on_chunk``."""
+    def on_piece(text):
+        timer.tick()
+        extractor.feed(text)
+        if on_chunk:
+            on_chunk(extractor.text)
+    return on_piece
+
+
+def _stream_provider(client, model_name, raw_json_input, system_prompt, generation_config, on_chunk=None,
+                     context_cache=None):
+    """Streams a response through an ``llm_providers`` provider; see :func:`_generate_streaming`."""
+    timer, extractor = _StreamTimer(), JSONStreamExtractor()
+    generation = client.stream(model_name, raw_json_input, system_prompt, generation_config,
+                               on_chunk=_provider_stream_callback(timer, extractor, on_chunk),
+                               **_context_cache_kwargs(context_cache))
+    return generation, timer.stats(), extractor
+
+
+async def _astream_provider(client, model_name, raw_json_input, system_prompt, generation_config, on_chunk=None,
+                            context_cache=None):
+    """Async counterpart of :func:`_stream_provider`."""
+    timer, extractor = _StreamTimer(), JSONStreamExtractor()
+    generation = await client.astream(model_name, raw_json_input, system_prompt, generation_config,
+                                      on_chunk=_provider_stream_callback(timer, extractor, on_chunk),
+                                      **_context_cache_kwargs(context_cache))
+    return generation, timer.stats(), extractor
+
+
+@contextmanager
+def _model_call_span(stats, stream, context_cache=None):
+    """Times a scheduled model call; throttling waits and retries are part of it."""
+    with span("model_call", MODEL, stream=bool(stream), context_cache=context_cache is not None) as call_span:
+        try:
+            yield
+        finally:
+            if call_span is not None:
+                call_span.attributes.update(retries=stats.retries, throttle_time=stats.throttle_time)
+
+
+class _ModelRequest:
+    """
+    One run's model call: what it sends, how it is scheduled and where its response
+    is cached. The sync and async paths share it and differ only in how they wait.
+    """
+
+    def __init__(self, raw_json_input, system_prompt, model_name, run_index=0, generation_config=None, stream=False,
+                 on_chunk=None):
+        self.raw_json_input = raw_json_input
+        self.system_prompt = system_prompt
+        self.model_name = model_name
+        self.run_index = run_index
+        self.generation_config = generation_config
+        self.stream = stream
+        self.on_chunk = on_chunk
+        self.scheduler = _scheduler_for(model_name)
+        self.estimated_tokens = _estimate_tokens(f"{system_prompt}\n\n{raw_json_input}")
+        self.stats = CallStats()
+        self.cache = get_response_cache()
+        self.cache_key = _cache_key(self.cache, model_name, system_prompt, raw_json_input, generation_config,
+                                    run_index)
+        self.cache_hit = False
+
+    def lookup(self):
+        """
+        Returns the recorded response for the call, or None if it has to go to the model.
+
+        A hit's latency is the time the lookup took; the latency of the call it
+        recorded is kept as ``recorded_latency``.
+        """
+        start_time = time.perf_counter()
+        with span("cache.lookup"):
+            record = _lookup_response(self.cache, self.cache_key)
+        if record is not None:
+            record = {**record, "latency": time.perf_counter() - start_time,
+                      "recorded_latency": record.get("recorded_latency", record["latency"])}
+            self.cache_hit = True
+            if self.on_chunk:
+                self.on_chunk(record["text"])
+        return record
+
+    def settle(self, record):
+        """Settles the token bucket against a fresh response and records it in the cache."""
+        _record_usage(self.scheduler, self.estimated_tokens, record)
+        with span("cache.store"):
+            _store_response(self.cache, self.cache_key, record, self.model_name)
+        return record
+
+
+def _plan_call(request, asynchronous):
+    """
+    Prepares a model call for the scheduler.
+
+    The system prompt goes out as the system instruction (a system message for
+    providers other than Gemini) and the input as the user message, so every run of a
+    prompt shares the same prefix. If a batch has cached that prefix on the provider's
+    side (see :func:`acquire_context_cache`), only the input is sent.
+
+    Gemini models use the shared ``genai`` client (and may stream); other providers
+    go through their pooled ``llm_providers`` client.
+
+    Returns:
+        tuple: The zero-argument call to hand to the scheduler (returning a coroutine
+        when ``asynchronous``), the function turning its result into a response record,
+        and the context cache handle used, if any.
+    """
+    provider, model_name = parse_model_spec(request.model_name)
+    system_prompt, raw_json_input = request.system_prompt, request.raw_json_input
+    generation_config, on_chunk, stats = request.generation_config, request.on_chunk, request.stats
+    context_cache = _engine.context_caches.get(request.model_name, system_prompt)
+
+    if provider != "google":
+        with span("client"):
+            client = _engine.get_provider(provider)
+        if request.stream:
+            stream = _astream_provider if asynchronous else _stream_provider
+            return (lambda: stream(client, model_name, raw_json_input, system_prompt, generation_config, on_chunk,
+                                   context_cache),
+                    lambda streamed: _generation_record(streamed[0], stats.latency, *streamed[1:]),
+                    context_cache)
+
+        def to_record(generation):
+            record = _generation_record(generation, stats.latency)
+            if on_chunk:
+                on_chunk(record["text"])
+            return record
+        generate = client.agenerate if asynchronous else client.generate
+        return (lambda: generate(model_name, raw_json_input, system_prompt, generation_config,
+                                 **_context_cache_kwargs(context_cache)),
+                to_record, context_cache)
+
+    generate_kwargs = {"generation_config": generation_config} if generation_config else {}
+    with span("client"):
+        model = _engine.get_model(model_name, system_prompt=system_prompt, context_cache=context_cache)
+    if request.stream:
+        stream = _agenerate_streaming if asynchronous else _generate_streaming
+        return (lambda: stream(model, raw_json_input, generate_kwargs, on_chunk),
+                lambda streamed: _response_record(streamed[0], stats.latency, *streamed[1:]),
+                context_cache)
+    generate = model.generate_content_async if asynchronous else model.generate_content
+    return (lambda: generate(raw_json_input, **generate_kwargs),
+            lambda response: _response_record(response, stats.latency), context_cache)
+
+
+def _call_model(request):
+    """Calls the model through its scheduler and returns the response record (see :func:`_plan_call`)."""
+    invoke, to_record, context_cache = _plan_call(request, asynchronous=False)
+    # 429s and transient 5xx errors are retried by the scheduler
+    with _model_call_span(request.stats, request.stream, context_cache):
+        result = request.scheduler.call(invoke, request.estimated_tokens, request.stats)
+    with span("parse"):
+        return to_record(result)
+
+
+async def _acall_model(request):
+    """Async counterpart of :func:`_call_model`."""
+    invoke, to_record, context_cache = _plan_call(request, asynchronous=True)
+    with _model_call_span(request.stats, request.stream, context_cache):
+        result = await request.scheduler.acall(invoke, request.estimated_tokens, request.stats)
+    with span("parse"):
+        return to_record(result)
+
+
+def _get_record(request):
+    """Returns the response record of a run: recorded in the response cache, or fresh from the model."""
+    record = request.lookup()
+    if record is None:
+        record = request.settle(_call_model(request))
+    return record
+
+
+async def _aget_record(request):
+    """Async counterpart of :func:`_get_record`."""
+    record = request.lookup()
+    if record is None:
+        record = request.settle(await _acall_model(request))
+    return record
+
+
+def _lookup_response(cache, cache_key):
+    """Returns the recorded response for a call, or None if it has to go to the model."""
+    if cache is None or not cache.reads:
+        return None
+    record = cache.get(cache_key)
+    if record is None and cache.mode == REPLAY:
+        raise CacheMissError("No recorded response for this request (response cache is in replay mode).")
+    return record
+
+
+def _store_response(cache, cache_key, record, model_name):
+    if cache is not None and cache.writes:
+        cache.put(cache_key, record, model_name=model_name)
+
+
+def _run_logger(run_id):
+    """Returns a buffered logger for ``run_id`` (see :mod:`prompt_visualization.mlflow_logger`)."""
+    return RunLogger(mlflow.tracking.MlflowClient(), run_id)
+
+
+def _close_run_logger(run_logger):
+    """Flushes the run's buffered params/metrics; a tracking error must not fail the run."""
+    try:
+        run_logger.flush()
+    except Exception as e:
+        print(f"Error logging to MLflow run {run_logger.run_id}: {e}")
+
+
+def _log_call_stats(run_logger, stats):
+    """Logs retry and throttling metrics of a scheduled call."""
+    run_logger.log_metrics(stats.as_metrics())
+
+
+def _log_inputs(run_logger, model_name, system_prompt):
+    """Logs the run inputs."""
+    run_logger.log_param("model_name", model_name)
+    run_logger.log_text(system_prompt, "system_prompt.txt")
+
+
+def _log_response(run_logger, record, cache_hit=False):
+    """
+    Logs metrics, parameters and the output artifact of a response record.
+
+    Returns:
+        tuple: The text of the response and its parsed JSON (None if it isn't JSON).
+    """
+    output_text = record["text"]
+
+    # --- Log Standard and New Metrics ---
+    run_logger.log_metric("latency", record["latency"])
+    run_logger.log_metric("cache_hit", int(cache_hit))
+    if "recorded_latency" in record:
+        run_logger.log_metric("recorded_latency", record["recorded_latency"])
+
+    # Log token usage from usage_metadata
+    usage = record.get("usage")
+    if usage:
+        for key, value in usage.items():
+            run_logger.log_metric(key, value)
+        # prompt_token_count includes the tokens read from a context cache
+        cached_tokens = usage.get("cached_content_token_count")
+        if cached_tokens is not None and usage.get("prompt_token_count") is not None:
+            run_logger.log_metric("uncached_prompt_token_count", usage["prompt_token_count"] - cached_tokens)
+
+    # Log time-to-first-token and throughput of streamed responses
+    streaming = record.get("streaming")
+    if streaming:
+        run_logger.log_metrics(streaming)
+        output_tokens = (record.get("usage") or {}).get("candidates_token_count")
+        # Stream stats of a cache hit describe the recorded call
+        generation_time = record.get("recorded_latency", record["latency"]) - streaming.get("time_to_first_token", 0)
+        if output_tokens and generation_time > 0:
+            run_logger.log_metric("output_tokens_per_sec", output_tokens / generation_time)
+
+    # Log finish reason from the primary candidate
+    run_logger.log_param("finish_reason", record["finish_reason"])
+
+    # Log safety ratings from prompt_feedback
+    for safety_category, safety_probability in record["safety_ratings"].items():
+        run_logger.log_param(f"safety_{safety_category}", safety_probability)
+
+    # Log the response as a JSON artifact if it holds JSON, as a text file otherwise.
+    # Records cached before they carried their parsed output are parsed here.
+    output_data = record["parsed_output"] if "parsed_output" in record else extract_json(output_text)
+    if output_data is not None:
+        run_logger.log_dict(output_data, "output.json")
+    else:
+        run_logger.log_text(output_text, "output.txt")
+
+    return output_text, output_data
+
+
+def _archive_result(run, run_name, model_name, system_prompt, run_index, result, record=None):
+    """Adds a finished run to the local results store; archiving must not fail the run."""
+    store = get_results_store()
+    if store is None:
+        return
+    usage = result.get("usage") or {}
+    try:
+        store.append({
+            "experiment": run.info.experiment_id,
+            "prompt_hash": prompt_hash(system_prompt),
+            "run_id": result.get("run_id"),
+            "parent_run_id": result.get("parent_run_id"),
+            "run_name": run_name,
+            "model_name": model_name,
+            "run_index": run_index,
+            "status": result["status"],
+            "cache_hit": result.get("cache_hit"),
+            "latency": result["latency"],
+            "prompt_token_count": usage.get("prompt_token_count"),
+            "candidates_token_count": usage.get("candidates_token_count"),
+            "total_token_count": usage.get("total_token_count"),
+            "finish_reason": record["finish_reason"] if record else None,
+            "output_text": result["output_text"],
+            "system_prompt": system_prompt,
+        })
+    except Exception as e:
+        print(f"Error archiving run {result.get('run_id')}: {e}")
+
+
+def _cache_key(cache, model_name, system_prompt, raw_json_input, generation_config, run_index):
+    if cache is None:
+        return None
+    return ResponseCache.make_key(model_name, system_prompt, raw_json_input, generation_config, run_index)
+
+
+def _start_batch_run(batch_name, model_name, num_runs, experiment_id, parent_run_id=None, run_type="batch"):
+    """
+    Creates the parent MLflow run of a batch in ``experiment_id`` and returns its ID.
+
+    The run is created through the client rather than the fluent API, whose active
+    run is per thread, so batches can open and close it from any thread and the
+    individual runs nest under it from their worker threads.
+    """
+    with span("mlflow.start_batch_run", TRACKING):
+        client = mlflow.tracking.MlflowClient()
+        tags = {"run_type": run_type}
+        if parent_run_id:
+            tags["mlflow.parentRunId"] = parent_run_id
+        run_id = client.create_run(experiment_id, run_name=batch_name, tags=tags).info.run_id
+        run_logger = _run_logger(run_id)
+        run_logger.log_param("model_name", model_name)
+        run_logger.log_param("num_runs", num_runs)
+        _close_run_logger(run_logger)
+    return run_id
+
+
+def _end_run(run_id):
+    try:
+        mlflow.tracking.MlflowClient().set_terminated(run_id)
+    except Exception as e:
+        print(f"Error closing MLflow run {run_id}: {e}")
+
+
+def _finish_batch_run(run_id, results, model_name, extra_metrics=None, normalizer=None):
+    """
+    Logs the aggregated metrics of a finished batch on its parent run and closes it,
+    so a batch's stats take one run fetch instead of one per child run.
+
+    Returns:
+        dict: The summary (see :func:`~prompt_visualization.batch_metrics.summarize_results`).
+    """
+    with span("evaluate", EVALUATOR, runs=len(results)):
+        summary = summarize_results(results, model_name=model_name, normalizer=normalizer)
+    with span("mlflow.finish_batch_run", TRACKING):
+        run_logger = _run_logger(run_id)
+        run_logger.log_metrics(summary)
+        run_logger.log_metrics(extra_metrics or {})
+        _close_run_logger(run_logger)
+        _end_run(run_id)
+    return summary
+
+
+def _flush_batch():
+    """Waits until the batch's artifacts are uploaded and its runs archived."""
+    with span("mlflow.flush_artifacts", TRACKING):
+        flush_artifacts()
+    with span("results_store.flush"):
+        flush_results_store()
+
+
+def _grouped_uploads(fn):
+    """
+    Runs a batch entry point in its own artifact upload group, so the batch's flushes
+    wait only for its own uploads and not for those of other sessions sharing the
+    process (see :func:`~prompt_visualization.mlflow_logger.upload_group`).
+    """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run_grouped(*args, **kwargs):
+            with upload_group():
+                return await fn(*args, **kwargs)
+    else:
+        @functools.wraps(fn)
+        def run_grouped(*args, **kwargs):
+            with upload_group():
+                return fn(*args, **kwargs)
+    return run_grouped
+
+
+def _log_trace(run_id, trace):
+    """
+    Logs a finished batch's time per category (``time_model``, ``time_tracking``, ...)
+    and its spans, as a Chrome trace (``trace.json``), on its parent run.
+    """
+    run_logger = _run_logger(run_id)
+    run_logger.log_metrics(trace.as_metrics())
+    run_logger.log_dict(trace.to_chrome_trace(), "trace.json")
+    _close_run_logger(run_logger)
+    flush_artifacts()
+
+
+def run_prompt_experiment(raw_json_input, system_prompt, run_name, model_name, run_index=0,
+                          generation_config=None, stream=False, on_chunk=None, parent_run_id=None,
+                          experiment_id=None):
     """
     Runs a prompt experiment using a generative AI model and logs the results to MLflow.
 
@@ -20,71 +760,517 @@ def run_prompt_experiment(raw_json_input, system_prompt, run_name, model_name):
         raw_json_input (str): The raw JSON input for the prompt.
         system_prompt (str): The system prompt to guide the model's response.
         run_name (str): The name for the MLflow run.
-        model_name (str): The name of the generative model to use.
+        model_name (str): The model to use: a Gemini model name, or
+            ``"<provider>:<model>"`` for other providers (see :func:`parse_model_spec`).
+        run_index (int): Position of the run in its batch. Part of the response cache
+            key, so each repeat of a batch replays its own recorded response.
+        generation_config (dict, optional): Generation config passed to the model.
+        stream (bool): Consume the response chunk by chunk and log time-to-first-token,
+            inter-chunk latency and output tokens/sec (Gemini models, and providers
+            that stream such as ``mock``).
+        on_chunk (callable, optional): With ``stream``, called with the text received
+            so far after every chunk.
+        parent_run_id (str, optional): MLflow run to nest this run under.
+        experiment_id (str, optional): MLflow experiment to log the run to; defaults to
+            the one set by :func:`configure_experiment`.
 
     Returns:
-        dict: A dictionary containing the status, output text, latency, and run_id.
+        dict: A dictionary containing the status, output text, latency, run_id, whether
+        the response was served from the response cache, the parsed JSON output
+        (``parsed_output``, None if the output was not valid JSON), token ``usage`` and
+        the ``parent_run_id`` of its batch. A cache hit's latency is the time of the
+        lookup; the latency of the call it replays is under ``recorded_latency``.
     """
-    message = f"{system_prompt}\n\n{raw_json_input}"
-    
-    with mlflow.start_run(run_name=run_name) as run:
+    # Each stage is timed when a trace is being recorded (see prompt_visualization.tracing)
+    with span("run", lane=run_name, run_index=run_index):
+        return _run_experiment(raw_json_input, system_prompt, run_name, model_name, run_index, generation_config,
+                               stream, on_chunk, parent_run_id, experiment_id)
+
+
+def _run_experiment(raw_json_input, system_prompt, run_name, model_name, run_index, generation_config, stream,
+                    on_chunk, parent_run_id, experiment_id):
+    request = _ModelRequest(raw_json_input, system_prompt, model_name, run_index, generation_config, stream,
+                            on_chunk)
+    return _record_run(run_name, request, parent_run_id, experiment_id, lambda: _get_record(request))
+
+
+def _run_result(parent_run_id, run_id=None, record=None, cache_hit=False, output=None, error=None):
+    """
+    Builds the result dictionary of a run from its response ``record`` and the
+    ``(text, parsed JSON)`` ``output`` logged for it, or from the ``error`` that ended
+    it. Without a ``run_id`` (not even the MLflow run could be opened) a failed result
+    carries only the status, the error and the parent run.
+    """
+    if error is not None:
+        result = {"status": "Fail", "output_text": str(error), "latency": 0}
+        if run_id is not None:
+            result.update({"run_id": run_id, "cache_hit": False, "parsed_output": None, "usage": None})
+    else:
+        output_text, output_data = output
+        result = {
+            "status": "Pass",
+            "output_text": output_text,
+            "latency": record["latency"],
+            "run_id": run_id,
+            "cache_hit": cache_hit,
+            "parsed_output": output_data,
+            "usage": record["usage"],
+        }
+        if "recorded_latency" in record:
+            result["recorded_latency"] = record["recorded_latency"]
+    result["parent_run_id"] = parent_run_id
+    return result
+
+
+def _record_run(run_name, request, parent_run_id, experiment_id, get_record):
+    """
+    Opens the MLflow run of a model call and records the response ``get_record()``
+    returns in it (or the error it raises).
+
+    The sync path gets the response inside the open run. The fluent MLflow API keeps
+    its active run per thread, so the async path awaits the response first and then
+    calls this from a worker thread with the finished call, rather than holding a run
+    open across an ``await``.
+    """
+    record = None
+    with profiled(), span("mlflow.run", TRACKING), \
+            mlflow.start_run(experiment_id=_resolve_experiment_id(experiment_id), run_name=run_name,
+                             parent_run_id=parent_run_id) as run:
         run_id = run.info.run_id
-        output_text = "No output generated."
+        run_logger = _run_logger(run_id)
         try:
-            # Log inputs
-            mlflow.log_param("model_name", model_name)
-            mlflow.log_text(system_prompt, "system_prompt.txt")
-
-            # Execute the model
-            start_time = time.time()
-            model = genai.GenerativeModel(model_name)
-            response = model.generate_content(message)
-            end_time = time.time()
-            latency = end_time - start_time
-            
-            output_text = response.text if hasattr(response, 'text') else "Blocked or empty response"
-
-            # --- Log Standard and New Metrics ---
-            mlflow.log_metric("latency", latency)
-
-            # Log token usage from usage_metadata
-            if hasattr(response, 'usage_metadata'):
-                mlflow.log_metric("prompt_token_count", response.usage_metadata.prompt_token_count)
-                mlflow.log_metric("candidates_token_count", response.usage_metadata.candidates_token_count)
-                mlflow.log_metric("total_token_count", response.usage_metadata.total_token_count)
-
-            # Log finish reason from the primary candidate
-            finish_reason = "UNKNOWN"
-            if response.candidates and hasattr(response.candidates[0], 'finish_reason'):
-                finish_reason = response.candidates[0].finish_reason.name
-            mlflow.log_param("finish_reason", finish_reason)
-
-            # Log safety ratings from prompt_feedback
-            if hasattr(response, 'prompt_feedback') and response.prompt_feedback.safety_ratings:
-                for rating in response.prompt_feedback.safety_ratings:
-                    safety_category = rating.category.name.lower()
-                    safety_probability = rating.probability.name
-                    mlflow.log_param(f"safety_{safety_category}", safety_probability)
-            
-            # Attempt to log the response as both a text file and a JSON artifact
-            try:
-                cleaned_text = output_text.strip().replace("```json", "").replace("```", "")
-                output_data = json.loads(cleaned_text)
-                mlflow.log_dict(output_data, "output.json")
-            except (json.JSONDecodeError, AttributeError):
-                mlflow.log_text(output_text, "output.txt")
-
-            return {
-                "status": "Pass",
-                "output_text": output_text,
-                "latency": latency,
-                "run_id": run_id
-            }
+            with span("mlflow.log_inputs", TRACKING):
+                _log_inputs(run_logger, request.model_name, request.system_prompt)
+            record = get_record()
+            with span("mlflow.log_response", TRACKING):
+                _log_call_stats(run_logger, request.stats)
+                output = _log_response(run_logger, record, request.cache_hit)
+            result = _run_result(parent_run_id, run_id, record, request.cache_hit, output)
         except Exception as e:
-            mlflow.log_param("error", str(e))
-            return {
-                "status": "Fail",
-                "output_text": str(e),
-                "latency": 0,
-                "run_id": run_id
-            }
+            run_logger.log_param("error", str(e))
+            _log_call_stats(run_logger, request.stats)
+            result = _run_result(parent_run_id, run_id, error=e)
+        finally:
+            with span("mlflow.flush", TRACKING):
+                _close_run_logger(run_logger)
+    with span("archive"):
+        _archive_result(run, run_name, request.model_name, request.system_prompt, request.run_index, result, record)
+    return result
+
+
+async def arun_prompt_experiment(raw_json_input, system_prompt, run_name, model_name, run_index=0,
+                                 generation_config=None, stream=False, on_chunk=None, parent_run_id=None,
+                                 experiment_id=None):
+    """
+    Async counterpart of :func:`run_prompt_experiment`.
+
+    The model call goes through the SDK's async generate path on the shared model
+    client, so many runs can be in flight on one event loop without a thread each.
+    MLflow logging is blocking and is handed to the default executor afterwards.
+
+    Args:
+        raw_json_input (str): The raw JSON input for the prompt.
+        system_prompt (str): The system prompt to guide the model's response.
+        run_name (str): The name for the MLflow run.
+        model_name (str): The model to use (see :func:`parse_model_spec`).
+        run_index (int): Position of the run in its batch (part of the cache key).
+        generation_config (dict, optional): Generation config passed to the model.
+        stream (bool): Consume the response chunk by chunk (see :func:`run_prompt_experiment`).
+        on_chunk (callable, optional): With ``stream``, called with the text received
+            so far after every chunk.
+        parent_run_id (str, optional): MLflow run to nest this run under.
+        experiment_id (str, optional): MLflow experiment to log the run to (see
+            :func:`run_prompt_experiment`).
+
+    Returns:
+        dict: A dictionary containing the status, output text, latency, run_id, whether
+        the response was served from the response cache, the parsed JSON output
+        (``parsed_output``, None if the output was not valid JSON) and token ``usage``.
+    """
+    with span("run", lane=run_name, run_index=run_index):
+        return await _arun_experiment(raw_json_input, system_prompt, run_name, model_name, run_index,
+                                      generation_config, stream, on_chunk, parent_run_id, experiment_id)
+
+
+async def _arun_experiment(raw_json_input, system_prompt, run_name, model_name, run_index, generation_config, stream,
+                           on_chunk, parent_run_id, experiment_id):
+    request = _ModelRequest(raw_json_input, system_prompt, model_name, run_index, generation_config, stream,
+                            on_chunk)
+    record, error = None, None
+    try:
+        record = await _aget_record(request)
+    except Exception as e:
+        error = e
+
+    def finished_call():
+        if error is not None:
+            raise error
+        return record
+
+    return await asyncio.to_thread(_record_run, run_name, request, parent_run_id, experiment_id, finished_call)
+
+
+@_grouped_uploads
+async def arun_prompt_batch(raw_json_input, system_prompt, batch_name, model_name, num_runs,
+                            max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None, should_stop=None,
+                            start_index=0, stream=False, on_chunk=None, parent_run_id=None, normalizer=None,
+                            trace=None, experiment_id=None):
+    """
+    Runs a batch of prompt experiments on the event loop with at most
+    ``max_concurrency`` model calls in flight.
+
+    Args:
+        raw_json_input (str): The raw JSON input for the prompt.
+        system_prompt (str): The system prompt to guide the model's response.
+        batch_name (str): Prefix used for the MLflow run names of the batch.
+        model_name (str): The name of the generative model to use.
+        num_runs (int): How many times to run the prompt.
+        max_concurrency (int): The maximum number of runs in flight at once.
+        on_result (callable, optional): Called as ``on_result(completed, index, result)``
+            each time a run finishes.
+        should_stop (callable, optional): Checked after each finished run; once it
+            returns True, runs that have not started yet are skipped.
+        start_index (int): Index of the first run, for batches run in several waves.
+        stream (bool): Stream each response (see :func:`run_prompt_experiment`).
+        on_chunk (callable, optional): With ``stream``, called as ``on_chunk(index, text)``
+            with the text a run has received so far.
+        parent_run_id (str, optional): Existing MLflow run to nest the runs under. By
+            default the batch gets its own parent run with the aggregated metrics.
+        normalizer: What the batch's consistency score compares (see
+            :func:`~prompt_visualization.consistency_evaluator.compile_normalizer`).
+        trace (Trace, optional): Collects the timings of the batch (see :func:`run_prompt_batch`).
+        experiment_id (str, optional): MLflow experiment of the batch's runs (see
+            :func:`run_prompt_batch`).
+
+    Returns:
+        list: The result dictionaries of the runs that were executed, in submission order.
+    """
+    if num_runs <= 0:
+        return []
+    if trace is None:
+        trace = current_trace() or Trace(batch_name)
+    own_parent = parent_run_id is None
+    experiment_id = _resolve_experiment_id(experiment_id)
+    with tracing(trace, "batch", lane=batch_name, num_runs=num_runs):
+        if own_parent:
+            parent_run_id = await asyncio.to_thread(_start_batch_run, batch_name, model_name, num_runs, experiment_id)
+        if num_runs > 1:
+            await asyncio.to_thread(acquire_context_cache, model_name, system_prompt)
+        semaphore = asyncio.Semaphore(max(1, int(max_concurrency)))
+        completed = 0
+        stopped = False
+
+        async def run_one(index):
+            nonlocal completed, stopped
+            async with semaphore:
+                if stopped:
+                    return None
+                chunk_callback = (lambda text: on_chunk(index, text)) if on_chunk else None
+                result = await arun_prompt_experiment(raw_json_input, system_prompt,
+                                                      f"{batch_name}_run_{index + 1}", model_name, run_index=index,
+                                                      stream=stream, on_chunk=chunk_callback,
+                                                      parent_run_id=parent_run_id, experiment_id=experiment_id)
+            completed += 1
+            if on_result:
+                on_result(completed, index, result)
+            if should_stop and not stopped and should_stop():
+                stopped = True
+            return result
+
+        results = await asyncio.gather(*(run_one(i) for i in range(start_index, start_index + num_runs)))
+        results = [r for r in results if r is not None]
+        if own_parent:
+            await asyncio.to_thread(_finish_batch_run, parent_run_id, results, model_name,
+                                    normalizer=compile_normalizer(normalizer))
+        # Make sure every output artifact is on the tracking server before callers read them back
+        await asyncio.to_thread(_flush_batch)
+    if own_parent:
+        await asyncio.to_thread(_log_trace, parent_run_id, trace)
+    return results
+
+
+@_grouped_uploads
+def run_prompt_batch(raw_json_input, system_prompt, batch_name, model_name, num_runs,
+                     max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None, should_stop=None,
+                     start_index=0, stream=False, on_chunk=None, parent_run_id=None, normalizer=None, trace=None,
+                     experiment_id=None):
+    """
+    Runs a batch of prompt experiments concurrently over a bounded worker pool.
+
+    The batch gets a parent MLflow run named ``batch_name`` and each run a nested child
+    run (named ``{batch_name}_run_{i}``). A long system prompt is cached on the
+    provider's side once for the whole batch, where the provider supports it (see
+    :func:`configure_context_cache`). Once the batch is done, its aggregated metrics
+    (latency percentiles, token totals, failure rate, consistency score) are logged on
+    the parent run, along with where its time went: ``time_model``, ``time_tracking``,
+    ``time_evaluator`` and ``time_engine`` seconds and the per-stage spans as
+    ``trace.json`` (see :mod:`prompt_visualization.tracing`).
+
+    Args:
+        raw_json_input (str): The raw JSON input for the prompt.
+        system_prompt (str): The system prompt to guide the model's response.
+        batch_name (str): Prefix used for the MLflow run names of the batch.
+        model_name (str): The name of the generative model to use.
+        num_runs (int): How many times to run the prompt.
+        max_concurrency (int): The maximum number of runs in flight at once.
+        on_result (callable, optional): Called from the calling thread as
+            ``on_result(completed, index, result)`` each time a run finishes.
+        should_stop (callable, optional): Checked after each finished run; once it
+            returns True, runs that have not started yet are cancelled.
+        start_index (int): Index of the first run, for batches run in several waves.
+        stream (bool): Stream each response (see :func:`run_prompt_experiment`).
+        on_chunk (callable, optional): With ``stream``, called from the calling thread as
+            ``on_chunk(index, text)`` with the text a run has received so far.
+        parent_run_id (str, optional): Existing MLflow run to nest the runs under, e.g.
+            for a batch run in several waves. No aggregates are logged on it then.
+        normalizer: What the batch's consistency score compares (see
+            :func:`~prompt_visualization.consistency_evaluator.compile_normalizer`).
+        trace (Trace, optional): Collects the timings of the batch, e.g. to show its
+            waterfall. By default the batch records into the trace it runs under, if
+            any, or a new one.
+        experiment_id (str, optional): MLflow experiment of the parent run and the
+            individual runs; defaults to the one set by :func:`configure_experiment`.
+
+    Returns:
+        list: The result dictionaries of the runs that were executed, in submission order.
+    """
+    if num_runs <= 0:
+        return []
+    if trace is None:
+        trace = current_trace() or Trace(batch_name)
+    own_parent = parent_run_id is None
+    experiment_id = _resolve_experiment_id(experiment_id)
+    with tracing(trace, "batch", lane=batch_name, num_runs=num_runs):
+        if own_parent:
+            parent_run_id = _start_batch_run(batch_name, model_name, num_runs, experiment_id)
+        if num_runs > 1:
+            acquire_context_cache(model_name, system_prompt)
+        results = _run_batch(raw_json_input, system_prompt, batch_name, model_name, num_runs, max_concurrency,
+                             on_result, should_stop, start_index, stream, on_chunk, parent_run_id, experiment_id)
+        if own_parent:
+            _finish_batch_run(parent_run_id, results, model_name, normalizer=compile_normalizer(normalizer))
+        # Make sure every output artifact is on the tracking server before callers read them back
+        _flush_batch()
+    if own_parent:
+        _log_trace(parent_run_id, trace)
+    return results
+
+
+def _run_batch(raw_json_input, system_prompt, batch_name, model_name, num_runs, max_concurrency, on_result,
+               should_stop, start_index, stream, on_chunk, parent_run_id, experiment_id):
+    """Runs the runs of a batch on a worker pool; see :func:`run_prompt_batch`."""
+    results = {}
+    max_workers = max(1, min(int(max_concurrency), num_runs))
+    completed = 0
+    stopped = False
+    # Chunks arrive on worker threads; they are queued and handed to on_chunk here so
+    # callers (e.g. Streamlit) only ever see callbacks on their own thread.
+    chunks = queue.Queue()
+
+    def drain_chunks():
+        while True:
+            try:
+                index, text = chunks.get_nowait()
+            except queue.Empty:
+                return
+            on_chunk(index, text)
+
+    def chunk_callback(index):
+        if not on_chunk:
+            return None
+        return lambda text: chunks.put((index, text))
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prompt-run") as executor:
+        # Each run gets a copy of this context, so its spans nest under the batch
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_prompt_experiment, raw_json_input, system_prompt,
+                            f"{batch_name}_run_{i + 1}", model_name, run_index=i,
+                            stream=stream, on_chunk=chunk_callback(i), parent_run_id=parent_run_id,
+                            experiment_id=experiment_id): i
+            for i in range(start_index, start_index + num_runs)
+        }
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=0.1 if on_chunk else None, return_when=FIRST_COMPLETED)
+            if on_chunk:
+                drain_chunks()
+            for future in sorted(finished, key=futures.get):
+                if future.cancelled():
+                    continue
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    # run_prompt_experiment handles model errors itself; this only
+                    # catches failures to open the MLflow run.
+                    results[index] = _run_result(parent_run_id, error=e)
+                completed += 1
+                if on_result:
+                    on_result(completed, index, results[index])
+                if should_stop and not stopped and should_stop():
+                    stopped = True
+                    for queued in futures:
+                        queued.cancel()
+    return [results[i] for i in sorted(results)]
+
+
+@_grouped_uploads
+def run_adaptive_experiment(raw_json_input, system_prompt, batch_name, model_name, stop_rule, max_runs=100,
+                            max_concurrency=DEFAULT_MAX_CONCURRENCY, wave_size=None, on_result=None,
+                            stream=False, on_chunk=None, trace=None, experiment_id=None):
+    """
+    Runs a prompt in parallel waves until ``stop_rule`` is satisfied or ``max_runs`` is spent.
+
+    All waves nest under one parent MLflow run, which gets the batch aggregates, the
+    stop rule's final estimates and the timings of all waves (see :func:`run_prompt_batch`).
+    The consistency score uses the stop rule's normalizer.
+
+    Args:
+        raw_json_input (str): The raw JSON input for the prompt.
+        system_prompt (str): The system prompt to guide the model's response.
+        batch_name (str): Prefix used for the MLflow run names of the batch.
+        model_name (str): The name of the generative model to use.
+        stop_rule (AdaptiveStopRule): Sequential stopping rule fed with every finished run.
+        max_runs (int): The run budget.
+        max_concurrency (int): The maximum number of runs in flight at once.
+        wave_size (int, optional): Runs launched per wave; defaults to ``max_concurrency``.
+        on_result (callable, optional): Called as ``on_result(completed, index, result)``
+            each time a run finishes, after the stop rule has seen it.
+        stream (bool): Stream each response (see :func:`run_prompt_experiment`).
+        on_chunk (callable, optional): See :func:`run_prompt_batch`.
+        trace (Trace, optional): Collects the timings of all waves.
+        experiment_id (str, optional): MLflow experiment of the runs (see :func:`run_prompt_batch`).
+
+    Returns:
+        list: The result dictionaries of the runs that were executed, in submission order.
+    """
+    wave_size = max(1, int(wave_size or max_concurrency))
+    results = []
+    trace = trace if trace is not None else Trace(batch_name)
+
+    def record(completed, index, result):
+        stop_rule.add_result(result)
+        if on_result:
+            on_result(len(results) + completed, index, result)
+
+    experiment_id = _resolve_experiment_id(experiment_id)
+    with tracing(trace, "adaptive", lane=batch_name, max_runs=max_runs):
+        parent_run_id = _start_batch_run(batch_name, model_name, max_runs, experiment_id)
+        if max_runs > 1:
+            acquire_context_cache(model_name, system_prompt)
+        while len(results) < max_runs and not stop_rule.is_satisfied():
+            # The first wave covers the rule's minimum sample so it can decide at all
+            wave = max(wave_size, stop_rule.min_runs - len(results))
+            wave = min(wave, max_runs - len(results))
+            results.extend(run_prompt_batch(raw_json_input, system_prompt, batch_name, model_name, wave,
+                                            max_concurrency=max_concurrency, on_result=record,
+                                            should_stop=stop_rule.is_satisfied, start_index=len(results),
+                                            stream=stream, on_chunk=on_chunk, parent_run_id=parent_run_id,
+                                            trace=trace, experiment_id=experiment_id))
+        estimates = stop_rule.summary()
+        _finish_batch_run(parent_run_id, results, model_name, extra_metrics={
+            "consistency_ci_low": estimates["consistency_ci_low"],
+            "consistency_ci_high": estimates["consistency_ci_high"],
+            "target_precision_reached": int(stop_rule.is_satisfied()),
+        }, normalizer=stop_rule.evaluator.normalizer)
+    _log_trace(parent_run_id, trace)
+    return results
+
+
+@_grouped_uploads
+def run_model_comparison(raw_json_input, system_prompt, batch_name, models, num_runs,
+                         max_concurrency=DEFAULT_MAX_CONCURRENCY, on_result=None, generation_config=None,
+                         normalizer=None, trace=None, experiment_id=None):
+    """
+    Runs the same prompt batch against several models at once and compares them.
+
+    Runs of all models are interleaved round-robin on one pool, so ``max_concurrency``
+    is a global budget and no model waits for another to finish its batch. MLflow
+    gets one parent run for the comparison and one child run per model (siblings),
+    and each individual run is nested under its model's run. The per-model summary
+    (see :func:`~prompt_visualization.batch_metrics.summarize_results`) is logged on
+    the model run.
+
+    Args:
+        raw_json_input (str): The raw JSON input for the prompt.
+        system_prompt (str): The system prompt to guide the model's response.
+        batch_name (str): Name of the parent MLflow run; prefix of the child runs.
+        models (list): Model specs to compare (see :func:`parse_model_spec`).
+        num_runs (int): Runs per model.
+        max_concurrency (int): The maximum number of runs in flight across all models.
+        on_result (callable, optional): Called as ``on_result(completed, model, index, result)``
+            each time a run finishes.
+        generation_config (dict, optional): Generation config passed to every model.
+        normalizer: What the consistency scores compare (see
+            :func:`~prompt_visualization.consistency_evaluator.compile_normalizer`).
+        trace (Trace, optional): Collects the timings of the comparison; they are also
+            logged on the parent run (see :func:`run_prompt_batch`).
+        experiment_id (str, optional): MLflow experiment of the runs (see :func:`run_prompt_batch`).
+
+    Returns:
+        dict: ``parent_run_id`` and, under ``models``, the ``run_id``, ``results`` (in
+        run order) and ``summary`` of each model.
+    """
+    trace = trace if trace is not None else Trace(batch_name)
+    with tracing(trace, "comparison", lane=batch_name, models=", ".join(models)):
+        comparison = _run_comparison(raw_json_input, system_prompt, batch_name, models, num_runs, max_concurrency,
+                                     on_result, generation_config, normalizer, _resolve_experiment_id(experiment_id))
+    _log_trace(comparison["parent_run_id"], trace)
+    return comparison
+
+
+def _run_comparison(raw_json_input, system_prompt, batch_name, models, num_runs, max_concurrency, on_result,
+                    generation_config, normalizer, experiment_id):
+    results = {model: {} for model in models}
+    completed = 0
+
+    parent_run_id = _start_batch_run(batch_name, ", ".join(models), num_runs, experiment_id, run_type="comparison")
+    model_run_ids = {model: _start_batch_run(f"{batch_name}_{model}", model, num_runs, experiment_id,
+                                             parent_run_id=parent_run_id)
+                     for model in models}
+    if num_runs > 1:
+        for model in models:
+            acquire_context_cache(model, system_prompt)
+
+    max_workers = max(1, min(max_concurrency, num_runs * len(models)))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prompt-compare") as executor:
+        # Round-robin submission keeps every model's runs spread over the whole batch
+        futures = {
+            executor.submit(contextvars.copy_context().run, run_prompt_experiment, raw_json_input, system_prompt,
+                            f"{batch_name}_{model}_run_{i + 1}", model, run_index=i,
+                            generation_config=generation_config, parent_run_id=model_run_ids[model],
+                            experiment_id=experiment_id): (model, i)
+            for i in range(num_runs) for model in models
+        }
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                model, index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # run_prompt_experiment handles model errors itself; this only
+                    # catches failures to open the MLflow run.
+                    result = _run_result(model_run_ids[model], error=e)
+                results[model][index] = result
+                completed += 1
+                if on_result:
+                    on_result(completed, model, index, result)
+
+    comparison = {}
+    normalizer = compile_normalizer(normalizer)
+    for model in models:
+        model_results = [results[model][i] for i in sorted(results[model])]
+        summary = _finish_batch_run(model_run_ids[model], model_results, model, normalizer=normalizer)
+        comparison[model] = {"run_id": model_run_ids[model], "results": model_results, "summary": summary}
+
+    with span("mlflow.finish_batch_run", TRACKING):
+        parent_logger = _run_logger(parent_run_id)
+        parent_logger.log_dict({model: entry["summary"] for model, entry in comparison.items()},
+                               "model_comparison.json")
+        _close_run_logger(parent_logger)
+        _end_run(parent_run_id)
+
+    _flush_batch()
+    return {"parent_run_id": parent_run_id, "models": comparison}
@@ -0,0 +1,246 @@
+import contextvars
+import queue
+import threading
+import time
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
+from ._lazy import LazyImport
+from .tracing import TRACKING, span
+
+Metric = LazyImport("mlflow.entities", "Metric")
+Param = LazyImport("mlflow.entities", "Param")
+RunTag = LazyImport("mlflow.entities", "RunTag")
+
+# Per-request limits of the MLflow log_batch REST API
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_METRICS_PER_BATCH = 1000
+
+DEFAULT_MAX_BACKLOG = 256
+DEFAULT_UPLOAD_WORKERS = 2
+
+_current_group = contextvars.ContextVar("prompt_visualization_upload_group", default=None)
+
+
+class UploadGroup:
+    """The artifact uploads submitted under one :func:`upload_group` block, e.g. one batch."""
+
+    def __init__(self):
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def add(self, future):
+        with self._lock:
+            self._futures.append(future)
+
+    def wait(self):
+        """
+        Blocks until the group's uploads have finished; other groups' uploads are not
+        waited for.
+
+        Returns:
+            list: The exceptions raised by the group's uploads since the last wait.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        wait(futures)
+        return [f.exception() for f in futures if f.exception() is not None]
+
+
+@contextmanager
+def upload_group():
+    """
+    Collects the artifact uploads submitted inside the block, including from worker
+    threads and tasks that copy its context, so :func:`flush_artifacts` there waits
+    only for them rather than for every session's uploads. Nested blocks join the
+    outer group.
+    """
+    group = _current_group.get()
+    if group is not None:
+        yield group
+        return
+    group = UploadGroup()
+    token = _current_group.set(group)
+    try:
+        yield group
+    finally:
+        _current_group.reset(token)
+
+
+class ArtifactUploader:
+    """
+    Uploads artifacts on background threads through a bounded queue.
+
+    ``submit`` blocks once ``max_backlog`` uploads are pending, so a slow tracking
+    server applies back-pressure instead of letting the backlog grow without bound.
+    """
+
+    def __init__(self, max_backlog=DEFAULT_MAX_BACKLOG, num_workers=DEFAULT_UPLOAD_WORKERS):
+        self.num_workers = num_workers
+        self._queue = queue.Queue(maxsize=max_backlog)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._errors = []
+
+    def _start(self):
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.num_workers:
+                thread = threading.Thread(target=self._work, name="mlflow-artifact-upload", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                fn, args, context, future = item
+                future.set_running_or_notify_cancel()
+                try:
+                    # In the submitter's context, so the upload is timed under its run
+                    context.run(self._upload, fn, args)
+                except Exception as e:
+                    print(f"Error uploading artifact {args[-1]}: {e}")
+                    future.set_exception(e)
+                    if context.get(_current_group) is None:
+                        # Grouped uploads report their errors to their group
+                        with self._lock:
+                            self._errors.append(e)
+                else:
+                    future.set_result(None)
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    def _upload(fn, args):
+        with span("mlflow.upload_artifact", TRACKING, artifact=args[-1]):
+            fn(*args)
+
+    def submit(self, fn, *args):
+        """
+        Queues ``fn(*args)`` for upload, blocking while the backlog is full. The upload
+        joins the current :func:`upload_group`, if any.
+
+        Returns:
+            concurrent.futures.Future: Resolved once the upload has finished.
+        """
+        self._start()
+        future = Future()
+        group = _current_group.get()
+        if group is not None:
+            group.add(future)
+        self._queue.put((fn, args, contextvars.copy_context(), future))
+        return future
+
+    @property
+    def pending(self):
+        """The number of uploads waiting in the queue."""
+        return self._queue.qsize()
+
+    def flush(self):
+        """
+        Blocks until every queued upload has finished, whoever submitted it.
+
+        Returns:
+            list: The exceptions raised by uploads outside of an :func:`upload_group`
+            since the last flush.
+        """
+        self._queue.join()
+        with self._lock:
+            errors, self._errors = self._errors, []
+        return errors
+
+    def close(self):
+        """Flushes the queue and stops the worker threads."""
+        errors = self.flush()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join()
+        return errors
+
+
+class RunLogger:
+    """
+    Buffers the params, metrics and tags of one MLflow run and writes them with a
+    single ``log_batch`` call; artifacts go to the background uploader.
+
+    Args:
+        client (MlflowClient): The tracking client to log through.
+        run_id (str): The run to log to.
+        uploader (ArtifactUploader, optional): Defaults to the shared uploader.
+    """
+
+    def __init__(self, client, run_id, uploader=None):
+        self.client = client
+        self.run_id = run_id
+        self.uploader = uploader or get_artifact_uploader()
+        self._params = {}
+        self._tags = {}
+        self._metrics = []
+
+    def log_param(self, key, value):
+        self._params[key] = str(value)
+
+    def set_tag(self, key, value):
+        self._tags[key] = str(value)
+
+    def log_metric(self, key, value, step=0):
+        if value is None:
+            return
+        self._metrics.append(Metric(key, float(value), int(time.time() * 1000), step))
+
+    def log_metrics(self, metrics, step=0):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step=step)
+
+    def log_text(self, text, artifact_file):
+        self.uploader.submit(self.client.log_text, self.run_id, text, artifact_file)
+
+    def log_dict(self, dictionary, artifact_file):
+        self.uploader.submit(self.client.log_dict, self.run_id, dictionary, artifact_file)
+
+    def flush(self):
+        """Writes the buffered params, metrics and tags in as few requests as possible."""
+        params = [Param(key, value) for key, value in self._params.items()]
+        tags = [RunTag(key, value) for key, value in self._tags.items()]
+        metrics = self._metrics
+        self._params, self._tags, self._metrics = {}, {}, []
+
+        while params or tags or metrics:
+            self.client.log_batch(self.run_id, metrics=metrics[:MAX_METRICS_PER_BATCH],
+                                  params=params[:MAX_PARAMS_PER_BATCH], tags=tags[:MAX_TAGS_PER_BATCH])
+            metrics = metrics[MAX_METRICS_PER_BATCH:]
+            params = params[MAX_PARAMS_PER_BATCH:]
+            tags = tags[MAX_TAGS_PER_BATCH:]
+
+
+_uploader = None
+_uploader_lock = threading.Lock()
+
+
+def get_artifact_uploader():
+    """Returns the process-wide artifact uploader."""
+    global _uploader
+    with _uploader_lock:
+        if _uploader is None:
+            _uploader = ArtifactUploader()
+        return _uploader
+
+
+def flush_artifacts():
+    """
+    Waits for the artifact uploads of the current :func:`upload_group` (or, outside of
+    one, for all queued uploads). Call when a batch completes.
+
+    Returns:
+        list: The exceptions raised by the uploads waited for.
+    """
+    group = _current_group.get()
+    if group is not None:
+        return group.wait()
+    return get_artifact_uploader().flush()
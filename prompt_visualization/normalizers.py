@@ -0,0 +1,185 @@
+import json
+import re
+from functools import lru_cache
+
+# One selector step: ..name | .name | .* | [*] | [3] | ['name'] | ["name"]
+_STEP_PATTERN = re.compile(
+    r"""\.\.(?P<descend>[A-Za-z_][\w-]*)"""
+    r"""|\.(?P<wildcard_dot>\*)"""
+    r"""|\.(?P<key>[A-Za-z_][\w-]*)"""
+    r"""|\[(?P<wildcard>\*)\]"""
+    r"""|\[(?P<index>-?\d+)\]"""
+    r"""|\[(?P<quote>['"])(?P<quoted>.*?)(?P=quote)\]"""
+)
+
+
+def _child(key):
+    def step(nodes):
+        return [node[key] for node in nodes if isinstance(node, dict) and key in node]
+    return step
+
+
+def _index(index):
+    def step(nodes):
+        return [node[index] for node in nodes if isinstance(node, list) and -len(node) <= index < len(node)]
+    return step
+
+
+def _wildcard(nodes):
+    children = []
+    for node in nodes:
+        if isinstance(node, dict):
+            children.extend(node.values())
+        elif isinstance(node, list):
+            children.extend(node)
+    return children
+
+
+def _descend(key):
+    def step(nodes):
+        found, stack = [], list(reversed(nodes))
+        while stack:
+            node = stack.pop()
+            if isinstance(node, dict):
+                if key in node:
+                    found.append(node[key])
+                stack.extend(reversed(list(node.values())))
+            elif isinstance(node, list):
+                stack.extend(reversed(node))
+        return found
+    return step
+
+
+@lru_cache(maxsize=256)
+def compile_selector(expression):
+    """
+    Compiles a JSONPath-like field selector into a function returning the matching values.
+
+    Supported syntax: ``$`` (the root, optional), ``.key``, ``['key']``, ``[3]``,
+    ``[*]`` or ``.*`` (every item or value) and ``..key`` (``key`` at any depth below).
+    Compiled selectors are cached, so a selector is parsed once per process.
+
+    Raises:
+        ValueError: If the expression can't be parsed.
+    """
+    text = expression.strip()
+    if text.startswith("$"):
+        text = text[1:]
+    elif text and text[0] not in ".[":
+        text = "." + text
+
+    steps, position = [], 0
+    while position < len(text):
+        match = _STEP_PATTERN.match(text, position)
+        if match is None:
+            raise ValueError(f"Invalid field selector '{expression}' at position {position + 1}.")
+        if match["descend"]:
+            steps.append(_descend(match["descend"]))
+        elif match["key"]:
+            steps.append(_child(match["key"]))
+        elif match["quote"]:
+            steps.append(_child(match["quoted"]))
+        elif match["index"]:
+            steps.append(_index(int(match["index"])))
+        else:
+            steps.append(_wildcard)
+        position = match.end()
+
+    def select(data):
+        nodes = [data]
+        for step in steps:
+            if not nodes:
+                break
+            nodes = step(nodes)
+        return nodes
+
+    return select
+
+
+def _scalars(values):
+    """Flattens selected values into scalars; objects are kept whole, as canonical JSON."""
+    for value in values:
+        if isinstance(value, list):
+            yield from _scalars(value)
+        elif isinstance(value, dict):
+            yield json.dumps(value, sort_keys=True)
+        elif value is not None:
+            yield str(value)
+
+
+class SchemaNormalizer:
+    """
+    Normalizes parsed outputs into sets of items using declared field selectors.
+
+    Each field maps a name to one selector (or a list of them, see
+    :func:`compile_selector`). The selectors are compiled once, when the normalizer is
+    built, and only visit the parts of an output they select, so one normalizer can be
+    applied to every output of a batch cheaply.
+
+    Calling the normalizer returns the items used for the overall consistency score:
+    the values of the only field, or ``field=value`` strings when there are several,
+    so equal values of different fields don't match each other.
+
+    Args:
+        fields (dict): Field name -> selector(s).
+        case_sensitive (bool): Keep the case of values; they're lowercased by default.
+
+    Example:
+        >>> SchemaNormalizer({"ingredients": "$.ingredient_composition[*].name"})
+    """
+
+    def __init__(self, fields, case_sensitive=False):
+        if not fields:
+            raise ValueError("A SchemaNormalizer needs at least one field.")
+        self.fields = dict(fields)
+        self.case_sensitive = case_sensitive
+        self._selectors = {
+            name: [compile_selector(s) for s in ([selectors] if isinstance(selectors, str) else selectors)]
+            for name, selectors in self.fields.items()
+        }
+
+    def __repr__(self):
+        return f"SchemaNormalizer({self.fields!r})"
+
+    def _clean(self, value):
+        value = value.strip()
+        return value if self.case_sensitive else value.lower()
+
+    def normalize_fields(self, content):
+        """
+        Returns the sorted, unique normalized values of every field (all empty for a
+        missing output).
+        """
+        if content is None:
+            return {name: [] for name in self._selectors}
+        return {
+            name: sorted({self._clean(v) for select in selectors for v in _scalars(select(content))})
+            for name, selectors in self._selectors.items()
+        }
+
+    def combine(self, field_values):
+        """Merges the output of :meth:`normalize_fields` into one list of items."""
+        if len(field_values) == 1:
+            return next(iter(field_values.values()))
+        return [f"{name}={value}" for name, values in field_values.items() for value in values]
+
+    def __call__(self, content):
+        return self.combine(self.normalize_fields(content))
+
+
+def parse_field_specs(specs):
+    """
+    Parses ``name=selector`` strings (as given on the command line or in the app) into
+    a fields dict for :class:`SchemaNormalizer`. A bare selector is named after itself;
+    repeating a name adds another selector to that field.
+    """
+    fields = {}
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
+            continue
+        name, separator, selector = spec.partition("=")
+        if not separator:
+            name, selector = spec, spec
+        fields.setdefault(name.strip(), []).append(selector.strip())
+    return fields
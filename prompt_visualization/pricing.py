@@ -0,0 +1,62 @@
+import threading
+
+# List prices in USD per million tokens: (input, output). Matched on the longest
+# model-name prefix, so "gemini-1.5-flash-002" uses the "gemini-1.5-flash" price.
+DEFAULT_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.0-flash-lite": (0.075, 0.30),
+    "gemini-2.0-flash": (0.10, 0.40),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash-8b": (0.0375, 0.15),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+# Share of the input price charged for prompt tokens read from a context cache
+# (Gemini bills them at a quarter of the input price; cache storage isn't included)
+CACHED_INPUT_PRICE_RATIO = 0.25
+
+_prices = dict(DEFAULT_PRICES)
+_prices_lock = threading.Lock()
+
+
+def _base_name(model_name):
+    # "models/gemini-2.0-flash" and "openrouter:google/gemini-2.0-flash" both price as "gemini-2.0-flash"
+    return model_name.rsplit("/", 1)[-1].lower()
+
+
+def configure_price(model_name, input_per_million, output_per_million):
+    """Sets (or overrides) the per-million-token prices of a model."""
+    with _prices_lock:
+        _prices[_base_name(model_name)] = (input_per_million, output_per_million)
+
+
+def get_price(model_name):
+    """
+    Returns the ``(input, output)`` USD prices per million tokens of a model, or None
+    if it has no known price.
+    """
+    name = _base_name(model_name)
+    with _prices_lock:
+        matches = [prefix for prefix in _prices if name.startswith(prefix)]
+        return _prices[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model_name, usage):
+    """
+    Estimates the USD cost of one call from its token ``usage``. Prompt tokens read
+    from a context cache (``cached_content_token_count``) are charged at
+    ``CACHED_INPUT_PRICE_RATIO`` of the input price.
+
+    Returns:
+        float: The cost, or None if the model has no known price or usage is missing.
+    """
+    price = get_price(model_name)
+    if price is None or not usage:
+        return None
+    prompt_tokens = usage.get("prompt_token_count") or 0
+    cached_tokens = min(usage.get("cached_content_token_count") or 0, prompt_tokens)
+    output_tokens = usage.get("candidates_token_count") or 0
+    input_cost = (prompt_tokens - cached_tokens + cached_tokens * CACHED_INPUT_PRICE_RATIO) * price[0]
+    return (input_cost + output_tokens * price[1]) / 1_000_000
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Cache modes
+OFF = "off"
+READ_WRITE = "read_write"  # serve hits, call the model and record on a miss
+RECORD = "record"          # always call the model, overwrite the recorded response
+REPLAY = "replay"          # only serve recorded responses; a miss is an error
+CACHE_MODES = (OFF, READ_WRITE, RECORD, REPLAY)
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "response_cache.sqlite")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheMissError(LookupError):
+    """Raised in replay mode when no recorded response exists for a request."""
+
+
+class ResponseCache:
+    """
+    A content-addressed, on-disk cache of model responses backed by SQLite.
+
+    Entries are keyed on a hash of everything that determines a response (model, prompt,
+    input, generation config and run index) and evicted least-recently-used once the
+    stored payloads exceed ``max_bytes``.
+
+    Args:
+        path (str): Location of the SQLite database file.
+        mode (str): One of ``CACHE_MODES``.
+        max_bytes (int): Size bound for the stored payloads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, mode=READ_WRITE, max_bytes=DEFAULT_MAX_BYTES):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: '{mode}'. Supported modes are {', '.join(CACHE_MODES)}.")
+        self.path = path
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model_name TEXT, payload TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    @property
+    def reads(self):
+        """True if lookups are served from the cache in this mode."""
+        return self.mode in (READ_WRITE, REPLAY)
+
+    @property
+    def writes(self):
+        """True if fresh responses are recorded in this mode."""
+        return self.mode in (READ_WRITE, RECORD)
+
+    @staticmethod
+    def make_key(model_name, system_prompt, raw_json_input, generation_config=None, run_index=0):
+        """Returns the content hash identifying a single model call."""
+        material = json.dumps([model_name, system_prompt, raw_json_input, generation_config, run_index],
+                              sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Returns the recorded response for ``key`` or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, record, model_name=None):
+        """Stores a response record and evicts old entries past the size bound."""
+        payload = json.dumps(record, default=str)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model_name, payload, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, payload, len(payload), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def stats(self):
+        """Returns ``(entries, total_bytes)`` currently stored."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+
+    def clear(self):
+        """Removes every recorded response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def configure_response_cache(mode=READ_WRITE, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Sets the process-wide response cache used by the engine.
+
+    Args:
+        mode (str): One of ``CACHE_MODES``; ``"off"`` disables the cache.
+        path (str): Location of the SQLite database file.
+        max_bytes (int): Size bound for the stored payloads.
+
+    Returns:
+        ResponseCache: The active cache, or None when disabled.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None if mode == OFF else ResponseCache(path=path, mode=mode, max_bytes=max_bytes)
+        return _cache
+
+
+def get_response_cache():
+    """Returns the active response cache, or None if caching is off."""
+    return _cache
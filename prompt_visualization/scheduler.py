@@ -0,0 +1,317 @@
+import asyncio
+import random
+import threading
+import time
+
+# HTTP status codes that mean "slow down" vs. "try again later"
+RATE_LIMIT_STATUS_CODES = {429}
+TRANSIENT_STATUS_CODES = {500, 502, 503, 504}
+
+
+def get_status_code(error):
+    """
+    Returns the HTTP status code carried by a provider exception, if any.
+
+    google.api_core exceptions expose it as ``code``, OpenAI/httpx style errors as
+    ``status_code``.
+    """
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_rate_limit_error(error):
+    """True if the error is a quota/429 response."""
+    return get_status_code(error) in RATE_LIMIT_STATUS_CODES
+
+
+def is_retryable_error(error):
+    """True if the call may succeed when retried (429s and transient 5xx errors)."""
+    status_code = get_status_code(error)
+    return status_code in RATE_LIMIT_STATUS_CODES or status_code in TRANSIENT_STATUS_CODES
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled continuously at ``rate_per_minute``.
+
+    Callers reserve capacity up front and are told how long to wait for it, so waiters
+    are served in arrival order and the sync and async paths share one bucket.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate_per_second = rate_per_minute / 60.0
+        self.capacity = float(capacity if capacity is not None else rate_per_minute)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def reserve(self, amount=1):
+        """Takes ``amount`` tokens and returns the seconds to wait before using them."""
+        amount = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    def adjust(self, amount):
+        """Returns (positive) or charges (negative) tokens once the real cost is known."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class AIMDLimiter:
+    """
+    Concurrency limit with additive increase / multiplicative decrease.
+
+    The limit starts at ``initial_limit`` (``max_limit`` by default). Every 429 halves
+    it and every successful call grows it by roughly one slot per window, so
+    concurrency settles just under the provider's quota.
+    """
+
+    def __init__(self, initial_limit=None, min_limit=1, max_limit=64, decrease_factor=0.5):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        if initial_limit is None:
+            initial_limit = max_limit
+        self.limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self.in_flight = 0
+        self._condition = threading.Condition()
+        # Coroutines waiting for a slot, as (event loop, future); woken by release()
+        self._async_waiters = []
+
+    def try_acquire(self):
+        """Takes a slot if one is free. Returns True on success."""
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        """Blocks until a slot is free. Returns the seconds spent waiting."""
+        start = time.monotonic()
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+        return time.monotonic() - start
+
+    async def acquire_async(self):
+        """Awaits a free slot without blocking the event loop. Returns the seconds waited."""
+        start = time.monotonic()
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return time.monotonic() - start
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            await waiter
+
+    def release(self, throttled=False):
+        """Frees a slot and adapts the limit to the outcome of the call."""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+            waiters, self._async_waiters = self._async_waiters, []
+        # Slots are freed from worker threads too, so waiters are woken on their own loop
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                pass  # the waiter's loop is closed
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class RetryPolicy:
+    """Jittered exponential backoff ("full jitter") for retryable provider errors."""
+
+    def __init__(self, max_retries=4, base_delay=1.0, max_delay=30.0):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt):
+        """Returns the delay before retry number ``attempt`` (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+class CallStats:
+    """Retry and throttling bookkeeping for a single scheduled call."""
+
+    def __init__(self):
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttle_time = 0.0
+        self.latency = 0.0
+
+    def as_metrics(self):
+        """Returns the stats as MLflow metric name/value pairs."""
+        return {
+            "retry_count": self.retries,
+            "rate_limited_count": self.rate_limited,
+            "throttle_time": self.throttle_time,
+        }
+
+
+class ProviderScheduler:
+    """
+    Rate limits, retries and adapts concurrency for calls to one provider/model.
+
+    Args:
+        requests_per_minute (int, optional): Request quota; unlimited if None.
+        tokens_per_minute (int, optional): Token quota; unlimited if None.
+        retry_policy (RetryPolicy, optional): Backoff settings for retryable errors.
+        limiter (AIMDLimiter, optional): Adaptive concurrency limit.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, retry_policy=None, limiter=None):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.limiter = limiter or AIMDLimiter()
+
+    def _reserve(self, estimated_tokens):
+        wait = 0.0
+        if self.request_bucket:
+            wait = max(wait, self.request_bucket.reserve(1))
+        if self.token_bucket and estimated_tokens:
+            wait = max(wait, self.token_bucket.reserve(estimated_tokens))
+        return wait
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Corrects the token bucket once a response reports its real token usage."""
+        if self.token_bucket and actual_tokens is not None:
+            self.token_bucket.adjust(estimated_tokens - actual_tokens)
+
+    def call(self, fn, estimated_tokens=0, stats=None):
+        """
+        Calls ``fn()`` under the rate limits, retrying 429s and transient 5xx errors.
+
+        Args:
+            fn (callable): The provider call to make.
+            estimated_tokens (int): Tokens the call is expected to use.
+            stats (CallStats, optional): Filled in with retries, throttle time and the
+                latency of the final attempt, even if the call ultimately fails.
+
+        Returns:
+            The return value of ``fn``.
+        """
+        stats = stats if stats is not None else CallStats()
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait:
+                time.sleep(wait)
+            stats.throttle_time += wait + self.limiter.acquire()
+            throttled = False
+            try:
+                start_time = time.time()
+                result = fn()
+                stats.latency = time.time() - start_time
+                return result
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                # Counted (and the limit decreased on release) even when this attempt was the last
+                stats.rate_limited += int(throttled)
+                if not is_retryable_error(e) or attempt >= self.retry_policy.max_retries:
+                    raise
+            finally:
+                self.limiter.release(throttled=throttled)
+
+            stats.retries += 1
+            delay = self.retry_policy.backoff(attempt)
+            stats.throttle_time += delay
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn, estimated_tokens=0, stats=None):
+        """Async counterpart of :meth:`call`; ``fn()`` must return an awaitable."""
+        stats = stats if stats is not None else CallStats()
+        attempt = 0
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait:
+                await asyncio.sleep(wait)
+            stats.throttle_time += wait + await self.limiter.acquire_async()
+            throttled = False
+            try:
+                start_time = time.time()
+                result = await fn()
+                stats.latency = time.time() - start_time
+                return result
+            except Exception as e:
+                throttled = is_rate_limit_error(e)
+                # Counted (and the limit decreased on release) even when this attempt was the last
+                stats.rate_limited += int(throttled)
+                if not is_retryable_error(e) or attempt >= self.retry_policy.max_retries:
+                    raise
+            finally:
+                self.limiter.release(throttled=throttled)
+
+            stats.retries += 1
+            delay = self.retry_policy.backoff(attempt)
+            stats.throttle_time += delay
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(model_name, provider="google"):
+    """Returns the shared scheduler for ``(provider, model_name)``, creating it with defaults."""
+    key = (provider.lower(), model_name)
+    with _schedulers_lock:
+        scheduler = _schedulers.get(key)
+        if scheduler is None:
+            scheduler = ProviderScheduler()
+            _schedulers[key] = scheduler
+    return scheduler
+
+
+def configure_scheduler(model_name, provider="google", requests_per_minute=None, tokens_per_minute=None,
+                        max_retries=4, max_concurrency=64, retry_base_delay=1.0):
+    """
+    Replaces the scheduler for ``(provider, model_name)`` with one using the given quotas.
+
+    Returns:
+        ProviderScheduler: The new scheduler.
+    """
+    scheduler = ProviderScheduler(
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        retry_policy=RetryPolicy(max_retries=max_retries, base_delay=retry_base_delay),
+        limiter=AIMDLimiter(max_limit=max_concurrency),
+    )
+    with _schedulers_lock:
+        _schedulers[(provider.lower(), model_name)] = scheduler
+    return scheduler
+
+
+def reset_schedulers():
+    """Drops all registered schedulers."""
+    with _schedulers_lock:
+        _schedulers.clear()
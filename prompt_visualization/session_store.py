@@ -0,0 +1,260 @@
+import array
+import json
+import mmap
+import os
+import shutil
+import sys
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+
+DEFAULT_SESSION_PATH = os.path.join(".cache", "sessions")
+DEFAULT_MAX_BATCHES = 4
+DEFAULT_PREVIEW_CHARS = 200
+
+# Kept in columns; every other key of a result dictionary is spilled with its output
+_COLUMN_KEYS = ("run_id", "parent_run_id", "status", "latency", "cache_hit")
+# UTF-8 takes at most 4 bytes per character
+_MAX_CHAR_BYTES = 4
+_MISSING = object()
+
+
+class StoredResult:
+    """
+    Read-only, dict-like view of one result of a :class:`ResultBatch`.
+
+    ``r["status"]``, ``r.get("parsed_output")``, ``"run_id" in r`` and the like work
+    as on the result dictionary it was stored from, except that a None run ID,
+    parent run ID or cache hit reads as missing. The output text and the spilled keys
+    (``parsed_output``, ``usage``...) are read back from disk on each access; nothing
+    but the batch and the position is held.
+    """
+
+    __slots__ = ("_batch", "_index")
+
+    def __init__(self, batch, index):
+        self._batch = batch
+        self._index = index
+
+    def __getitem__(self, key):
+        return self._batch._value(self._index, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def keys(self):
+        columns = [key for key in (*_COLUMN_KEYS, "output_text") if key in self]
+        return columns + list(self._batch._extras(self._index))
+
+    def preview(self, chars=DEFAULT_PREVIEW_CHARS):
+        """The first ``chars`` characters of the output, read without loading the rest."""
+        return self._batch.preview(self._index, chars)
+
+    def to_dict(self):
+        """Reads the whole result back into a plain dictionary."""
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"StoredResult(run_id={self.get('run_id')!r}, status={self.get('status')!r})"
+
+
+class ResultBatch:
+    """
+    The results of one batch, stored compactly.
+
+    Status, latency and cache hits live in typed arrays and run IDs in tuples; output
+    texts and the remaining keys of each result are written to one file per batch and
+    read back through a memory map, so the OS pages them in and out as needed instead
+    of every session holding them on the heap. Results are looked up by position or by
+    run ID (see :meth:`by_run_id`) and come back as :class:`StoredResult` views.
+
+    Use :meth:`SessionResultStore.put` rather than building batches directly.
+    """
+
+    __slots__ = ("name", "path", "_run_ids", "_parent_run_ids", "_status_names", "_statuses", "_latencies",
+                 "_cache_hits", "_offsets", "_positions", "_columns", "_file", "_map", "__weakref__")
+
+    def __init__(self, name, path, results):
+        self.name = name
+        self.path = path
+        status_names = {}
+        self._statuses = array.array("B")
+        self._latencies = array.array("d")
+        self._cache_hits = array.array("b")  # -1: not recorded
+        # Per result: where its text starts, where its spilled keys start, where they end
+        self._offsets = array.array("q")
+        run_ids, parent_run_ids = [], []
+        with open(path, "wb") as f:
+            for result in results:
+                run_ids.append(result.get("run_id"))
+                parent_run_ids.append(result.get("parent_run_id"))
+                self._statuses.append(status_names.setdefault(result.get("status"), len(status_names)))
+                self._latencies.append(result.get("latency") or 0.0)
+                cache_hit = result.get("cache_hit")
+                self._cache_hits.append(-1 if cache_hit is None else int(bool(cache_hit)))
+                text = (result.get("output_text") or "").encode("utf-8")
+                extras = {k: v for k, v in result.items() if k not in _COLUMN_KEYS and k != "output_text"}
+                self._offsets.append(f.tell())
+                f.write(text)
+                self._offsets.append(f.tell())
+                f.write(json.dumps(extras, default=str).encode("utf-8"))
+            self._offsets.append(f.tell())
+        self._run_ids = tuple(run_ids)
+        # Runs of a batch share their parent; keep one copy of the string
+        self._parent_run_ids = tuple(sys.intern(p) if isinstance(p, str) else p for p in parent_run_ids)
+        self._status_names = tuple(status_names)
+        self._positions = {run_id: i for i, run_id in enumerate(run_ids) if run_id is not None}
+        self._columns = {}
+        self._file = open(path, "rb")
+        size = self._offsets[-1] if self._offsets else 0
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def __len__(self):
+        return len(self._statuses)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [StoredResult(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("result index out of range")
+        return StoredResult(self, index)
+
+    def __iter__(self):
+        return (StoredResult(self, i) for i in range(len(self)))
+
+    def by_run_id(self, run_id):
+        """Returns the result of ``run_id``, or None."""
+        index = self._positions.get(run_id)
+        return StoredResult(self, index) if index is not None else None
+
+    def column(self, key):
+        """
+        The values of ``key`` across the batch, None where a result lacks it. Decoded
+        once and kept, so reading ``parsed_output`` again on a rerun costs no parsing.
+        """
+        values = self._columns.get(key)
+        if values is None:
+            values = self._columns[key] = tuple(StoredResult(self, i).get(key) for i in range(len(self)))
+        return list(values)
+
+    def _read(self, start, end):
+        if self._map is None or end <= start:
+            return b""
+        return self._map[start:end]
+
+    def text(self, index):
+        """The full output text of the result at ``index``."""
+        return self._read(self._offsets[2 * index], self._offsets[2 * index + 1]).decode("utf-8")
+
+    def preview(self, index, chars=DEFAULT_PREVIEW_CHARS):
+        """The first ``chars`` characters of the output at ``index``."""
+        start, end = self._offsets[2 * index], self._offsets[2 * index + 1]
+        head = self._read(start, min(end, start + chars * _MAX_CHAR_BYTES))
+        return head.decode("utf-8", errors="ignore")[:chars]
+
+    def _extras(self, index):
+        return json.loads(self._read(self._offsets[2 * index + 1], self._offsets[2 * index + 2]) or b"{}")
+
+    def _value(self, index, key):
+        if key == "output_text":
+            return self.text(index)
+        if key == "run_id" or key == "parent_run_id":
+            value = (self._run_ids if key == "run_id" else self._parent_run_ids)[index]
+        elif key == "status":
+            value = self._status_names[self._statuses[index]]
+        elif key == "latency":
+            value = self._latencies[index]
+        elif key == "cache_hit":
+            value = None if self._cache_hits[index] < 0 else bool(self._cache_hits[index])
+        else:
+            return self._extras(index)[key]
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def close(self):
+        """Releases the memory map; the batch can't be read afterwards."""
+        self._columns.clear()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class SessionResultStore:
+    """
+    Keeps the result batches of one UI session, at most ``max_batches`` of them.
+
+    Each batch is spilled to its own file under a directory of the session's own, so
+    a session's memory stays at a few arrays per batch however long the outputs are
+    or however many users share the server. The least recently used batch is evicted
+    (its file deleted) once the bound is reached, and the directory is removed when
+    the store is closed or garbage collected with its session.
+
+    Args:
+        root (str): Directory the session directories are created in.
+        max_batches (int): The most batches kept per session.
+    """
+
+    def __init__(self, root=DEFAULT_SESSION_PATH, max_batches=DEFAULT_MAX_BATCHES):
+        self.max_batches = max(1, int(max_batches))
+        self.directory = os.path.join(root, uuid.uuid4().hex)
+        os.makedirs(self.directory, exist_ok=True)
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.directory, True)
+
+    def put(self, name, results):
+        """
+        Stores a batch's result dictionaries under ``name`` (replacing an older batch of
+        that name) and returns the stored :class:`ResultBatch`.
+        """
+        batch = ResultBatch(name, os.path.join(self.directory, f"{uuid.uuid4().hex}.bin"), results)
+        with self._lock:
+            evicted = [self._batches.pop(name)] if name in self._batches else []
+            self._batches[name] = batch
+            while len(self._batches) > self.max_batches:
+                evicted.append(self._batches.popitem(last=False)[1])
+        for old in evicted:
+            _discard(old)
+        return batch
+
+    def get(self, name):
+        """Returns the batch stored under ``name`` (marking it recently used), or None."""
+        with self._lock:
+            batch = self._batches.get(name)
+            if batch is not None:
+                self._batches.move_to_end(name)
+            return batch
+
+    def __contains__(self, name):
+        return name in self._batches
+
+    def __len__(self):
+        return len(self._batches)
+
+    def close(self):
+        """Drops every batch and deletes the session's directory."""
+        with self._lock:
+            batches = list(self._batches.values())
+            self._batches.clear()
+        for batch in batches:
+            batch.close()
+        self._finalizer()
+
+
+def _discard(batch):
+    batch.close()
+    try:
+        os.remove(batch.path)
+    except OSError as e:
+        print(f"Error removing spilled results {batch.path}: {e}")
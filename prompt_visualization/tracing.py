@@ -0,0 +1,302 @@
+import contextvars
+import cProfile
+import itertools
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Where the time of a span goes; the breakdown answers "model, tracking server or us?"
+MODEL = "model"
+TRACKING = "tracking"
+EVALUATOR = "evaluator"
+ENGINE = "engine"
+CATEGORIES = (MODEL, TRACKING, EVALUATOR, ENGINE)
+
+_current_span = contextvars.ContextVar("prompt_visualization_span", default=None)
+_current_profiler = contextvars.ContextVar("prompt_visualization_profiler", default=None)
+
+
+class Span:
+    """One timed stage. Times are ``time.perf_counter()`` values."""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "category", "lane", "attributes", "thread", "start", "end")
+
+    def __init__(self, trace, span_id, parent_id, name, category, lane, attributes):
+        self.trace = trace
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.lane = lane
+        self.attributes = attributes
+        self.thread = threading.current_thread().name
+        self.start = time.perf_counter()
+        self.end = None
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Trace:
+    """
+    Collects the spans of a batch (or of any block run under :func:`tracing`).
+
+    Spans follow the ``contextvars`` context, so they nest across ``await`` and into
+    worker threads started with ``contextvars.copy_context().run``. A span's lane is
+    the run it belongs to, which is what the waterfall groups by.
+    """
+
+    def __init__(self, name="trace"):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _open(self, name, category, parent, attributes):
+        lane = attributes.pop("lane", None) or (parent.lane if parent is not None else self.name)
+        return Span(self, next(self._ids), parent.span_id if parent is not None else None, name, category, lane,
+                    attributes)
+
+    def _close(self, span):
+        span.end = time.perf_counter()
+        with self._lock:
+            self.spans.append(span)
+
+    def _finished(self):
+        with self._lock:
+            return list(self.spans)
+
+    def self_times(self):
+        """
+        Returns ``{span_id: seconds}``: each span's duration minus the time covered by
+        its children. Children running concurrently (the runs of a batch) are merged
+        first, so a span waiting on its children gets ~0 of its own.
+        """
+        spans = self._finished()
+        children = {}
+        for span in spans:
+            children.setdefault(span.parent_id, []).append(span)
+        times = {}
+        for span in spans:
+            covered, cursor = 0.0, span.start
+            for child in sorted(children.get(span.span_id, ()), key=lambda s: s.start):
+                start, end = max(child.start, cursor), min(child.end, span.end)
+                if end > start:
+                    covered += end - start
+                    cursor = end
+            times[span.span_id] = max(0.0, span.duration - covered)
+        return times
+
+    def breakdown(self):
+        """Returns the seconds spent in each category (see :data:`CATEGORIES`), summed over spans."""
+        times = self.self_times()
+        totals = dict.fromkeys(CATEGORIES, 0.0)
+        for span in self._finished():
+            totals[span.category] = totals.get(span.category, 0.0) + times[span.span_id]
+        return totals
+
+    def stage_totals(self):
+        """
+        Returns per-stage aggregates, ``{name: {"category", "count", "total", "mean", "max"}}``
+        over the spans' own time, the most expensive stage first.
+        """
+        times = self.self_times()
+        stages = {}
+        for span in self._finished():
+            stage = stages.setdefault(span.name, {"category": span.category, "count": 0, "total": 0.0, "max": 0.0})
+            stage["count"] += 1
+            stage["total"] += times[span.span_id]
+            stage["max"] = max(stage["max"], times[span.span_id])
+        for stage in stages.values():
+            stage["mean"] = stage["total"] / stage["count"]
+        return dict(sorted(stages.items(), key=lambda item: -item[1]["total"]))
+
+    def waterfall(self):
+        """
+        Returns one row per span, in start order, with ``start``/``end`` in seconds since
+        the trace began and ``depth`` below the trace's root.
+        """
+        spans = sorted(self._finished(), key=lambda s: (s.start, s.span_id))
+        parents = {span.span_id: span.parent_id for span in spans}
+
+        def depth(span_id):
+            level = 0
+            while parents.get(span_id) is not None:
+                span_id, level = parents[span_id], level + 1
+            return level
+
+        return [{
+            "lane": span.lane,
+            "stage": span.name,
+            "category": span.category,
+            "start": span.start - self.origin,
+            "end": span.end - self.origin,
+            "duration": span.duration,
+            "depth": depth(span.span_id),
+            "thread": span.thread,
+        } for span in spans]
+
+    def as_metrics(self):
+        """Returns the breakdown as MLflow metrics (``time_<category>`` seconds and the wall time)."""
+        spans = self._finished()
+        metrics = {f"time_{category}": seconds for category, seconds in self.breakdown().items()}
+        metrics["time_wall"] = max((s.end for s in spans), default=self.origin) - self.origin
+        return metrics
+
+    def to_chrome_trace(self):
+        """
+        Exports the spans in the Chrome trace event format, which chrome://tracing,
+        Perfetto and speedscope render as a flame chart.
+        """
+        threads = {}
+        events = []
+        for span in sorted(self._finished(), key=lambda s: s.start):
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start - self.origin) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": 1,
+                "tid": tid,
+                "args": {"lane": span.lane, **{k: str(v) for k, v in span.attributes.items()}},
+            })
+        events.extend({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}}
+                      for thread, tid in threads.items())
+        return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace": self.name}}
+
+
+def current_trace():
+    """Returns the trace spans are currently recorded to, or None."""
+    span = _current_span.get()
+    return span.trace if span is not None else None
+
+
+@contextmanager
+def _enter(span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.attributes["error"] = type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        span.trace._close(span)
+
+
+@contextmanager
+def tracing(trace, name, category=ENGINE, **attributes):
+    """
+    Records the block as a root span of ``trace`` and everything inside it as nested
+    spans. When ``trace`` is already being recorded to, the block nests under the
+    current span instead. A None ``trace`` records nothing.
+    """
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    parent = parent if parent is not None and parent.trace is trace else None
+    with _enter(trace._open(name, category, parent, attributes)) as span:
+        yield span
+
+
+@contextmanager
+def span(name, category=ENGINE, **attributes):
+    """
+    Times a stage under the current span. Outside of :func:`tracing` this is a no-op,
+    so instrumented code costs next to nothing when no one is collecting.
+
+    Pass ``lane=`` to start a new waterfall lane (e.g. one per run).
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    with _enter(parent.trace._open(name, category, parent, attributes)) as child:
+        yield child
+
+
+class Profiler:
+    """
+    Merges cProfile stats collected in several threads.
+
+    Before Python 3.12 a profiler only sees the thread that enabled it, so each
+    :meth:`section` profiles its own thread. From 3.12 on, the first profiler sees
+    every thread and the others are skipped.
+    """
+
+    def __init__(self):
+        self._profiles = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def section(self):
+        """Profiles the block on this thread unless it already is being profiled."""
+        if getattr(self._local, "active", False):
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active and covers this thread
+            yield
+            return
+        self._local.active = True
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._local.active = False
+            with self._lock:
+                self._profiles.append(profile)
+
+    def stats(self):
+        """Returns the merged ``pstats.Stats``, or None if nothing was profiled."""
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        return stats
+
+    def dump(self, path):
+        """Writes the merged stats to ``path`` (open it with ``snakeviz`` or ``pstats``)."""
+        stats = self.stats()
+        if stats is not None:
+            stats.dump_stats(path)
+
+
+@contextmanager
+def profiling(path=None):
+    """
+    Opt-in cProfile hook: profiles the block, including the runs it starts on worker
+    threads, and writes the merged stats to ``path`` when it ends.
+
+    For sampling profilers such as py-spy no hook is needed; the engine's worker
+    threads are named (``prompt-run``, ``prompt-compare``, ``sweep``,
+    ``mlflow-artifact-upload``) so their stacks are easy to tell apart.
+    """
+    profiler = Profiler()
+    token = _current_profiler.set(profiler)
+    try:
+        with profiler.section():
+            yield profiler
+    finally:
+        _current_profiler.reset(token)
+        if path:
+            profiler.dump(path)
+
+
+def profiled():
+    """Profiles the block on this thread if a :func:`profiling` block is active."""
+    profiler = _current_profiler.get()
+    return profiler.section() if profiler is not None else nullcontext()
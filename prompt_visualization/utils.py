@@ -1,11 +1,224 @@
 import json
+import re
 
-def get_clean_json(raw_text):
-    """Cleans raw model output and attempts to parse it as JSON."""
-    if not isinstance(raw_text, str):
-        return None
-    clean_text = raw_text.strip().replace("```json", "").replace("```", "")
+_DECODER = json.JSONDecoder()
+_FENCE = "```"
+# Where a JSON object or array may start
+_OPENING = re.compile(r"[\[{]")
+# The characters that matter while scanning a JSON object or array
+_STRUCTURAL = re.compile(r'[\[\]{}"\\]')
+# An opening fence and its language tag, e.g. ```json
+_FENCE_OPENING = re.compile(r"```[\w-]*")
+_LEADING_SPACE = re.compile(r"\s*")
+_TRAILING_SPACE = re.compile(r"\s*(?:```\s*)?\Z")
+
+
+def _search_start(text):
+    """Models often wrap their JSON in a fenced block; prefer what's inside the first one."""
+    fence = _FENCE_OPENING.search(text)
+    return fence.end() if fence is not None else 0
+
+
+def _decode_scalar(text, position):
+    # A bare number/string/literal only counts when nothing but whitespace follows it
+    match = _LEADING_SPACE.match(text, position)
     try:
-        return json.loads(clean_text)
+        value, end = _DECODER.raw_decode(text, match.end())
     except json.JSONDecodeError:
-        return None
\ No newline at end of file
+        return None
+    if _TRAILING_SPACE.match(text, end) is None:
+        return None
+    return value, match.end(), end
+
+
+def _decode_container(text, position):
+    """Decodes the first object or array at or after ``position`` that is valid JSON."""
+    while True:
+        match = _OPENING.search(text, position)
+        if match is None:
+            return None
+        try:
+            value, end = _DECODER.raw_decode(text, match.start())
+            return value, match.start(), end
+        except json.JSONDecodeError:
+            position = match.start() + 1
+
+
+def find_json(text):
+    """
+    Locates and parses the JSON value in raw model output.
+
+    The text is never copied: candidate objects/arrays are decoded in place, starting
+    at the first fenced block if there is one, so Markdown fences and leading or
+    trailing chatter are skipped. A fence only counts as opening a block when JSON
+    follows it; otherwise (e.g. a closing fence after bare JSON) the whole text is
+    searched.
+
+    Returns:
+        tuple: ``(value, start, end)`` with the span of the value in ``text``, or None
+        if it holds no JSON.
+    """
+    if not isinstance(text, str):
+        return None
+    search_start = _search_start(text)
+    found = _decode_container(text, search_start) or _decode_scalar(text, search_start)
+    if found is None and search_start > 0:
+        found = _decode_container(text, 0) or _decode_scalar(text, 0)
+    return found
+
+
+def extract_json(text):
+    """Returns the JSON value in raw model output (see :func:`find_json`), or None."""
+    found = find_json(text)
+    return found[0] if found is not None else None
+
+
+def get_clean_json(raw_text):
+    """Cleans raw model output and attempts to parse it as JSON."""
+    return extract_json(raw_text)
+
+
+class _ContainerScan:
+    """
+    The incremental form of :func:`_decode_container`: finds the first object or array
+    at or after ``position`` that is valid JSON, one chunk of the response at a time.
+    """
+
+    def __init__(self, position):
+        self.origin = position
+        self.found = None
+        self._reset(position)
+
+    def _reset(self, position):
+        self.start = None
+        self._depth = 0
+        self._in_string = False
+        self.position = position
+
+    def scan(self, extractor, text, base):
+        """Scans ``text``, the part of the response from offset ``base`` on, from where the last scan stopped."""
+        position = self.position - base
+        while True:
+            if self.start is None:
+                match = _OPENING.search(text, position)
+                if match is None:
+                    position = max(position, len(text))
+                    break
+                self.start, self._depth, position = base + match.start(), 1, match.end()
+                continue
+            match = _STRUCTURAL.search(text, position)
+            if match is None:
+                position = max(position, len(text))
+                break
+            char, position = match.group(), match.end()
+            if char == "\\":
+                # Skip the escaped character, even if it's still to come
+                position += 1
+            elif char == '"':
+                self._in_string = not self._in_string
+            elif self._in_string:
+                continue
+            elif char in "[{":
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    # Only now is the candidate's text needed in one piece
+                    text, base = extractor.text, 0
+                    try:
+                        value, end = _DECODER.raw_decode(text, self.start)
+                    except json.JSONDecodeError:
+                        # Not JSON after all (e.g. "[sic]" in prose); look again after it
+                        self._reset(self.start + 1)
+                        position = self.position
+                        continue
+                    self.found = (value, self.start, end)
+                    break
+        self.position = base + position
+
+    def finish(self, text):
+        """Returns what :func:`_decode_container` finds in the complete ``text``, or None."""
+        if self.found is not None:
+            return self.found
+        # Left with an unclosed candidate; there may be JSON after its opening bracket
+        return _decode_container(text, self.start + 1) if self.start is not None else None
+
+
+class JSONStreamExtractor:
+    """
+    Finds the JSON value in a response while it streams in.
+
+    Each chunk is scanned once, only for brackets, quotes and escapes, as it arrives,
+    and chunks are only joined when a candidate value is decoded or :attr:`text` is
+    read. The value is decoded as soon as its closing bracket comes in, so a finished
+    stream needs no further scan. The result is the same as :func:`extract_json` over
+    the full text.
+
+    Example:
+        >>> extractor = JSONStreamExtractor()
+        >>> for chunk in response:
+        ...     extractor.feed(chunk.text)
+        >>> parsed = extractor.finish()
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._length = 0
+        # The last characters received, to find a fence split across chunks
+        self._tail = ""
+        # Searches from the start of the response and, once there is a fence, from it
+        self._plain = _ContainerScan(0)
+        self._fenced = None
+
+    @property
+    def text(self):
+        """The response received so far."""
+        if len(self._chunks) > 1:
+            self._chunks[:] = ["".join(self._chunks)]
+        return self._chunks[0] if self._chunks else ""
+
+    def _scan_fence(self, chunk, base):
+        window = self._tail + chunk
+        fence = window.find(_FENCE)
+        if fence < 0:
+            self._tail = window[-(len(_FENCE) - 1):]
+            return
+        self._fenced = _ContainerScan(base - len(self._tail) + fence + len(_FENCE))
+
+    def feed(self, chunk):
+        """
+        Adds the next chunk of the response.
+
+        Returns:
+            bool: Whether a complete JSON value has been found so far.
+        """
+        base = self._length
+        self._chunks.append(chunk)
+        self._length += len(chunk)
+        if self._fenced is None:
+            self._scan_fence(chunk, base)
+        # What follows a fence wins, as in find_json
+        for scan in (self._fenced, self._plain):
+            if scan is not None and scan.found is None:
+                scan.scan(self, chunk, base)
+        plain, fenced = self._plain, self._fenced
+        if plain is not None and fenced is not None and plain.found is None and plain.start is None \
+                and plain.position >= fenced.origin:
+            # No valid value starts before this point, so both searches now find the same one
+            self._plain = None
+        return any(scan is not None and scan.found is not None for scan in (self._fenced, self._plain))
+
+    def finish(self):
+        """
+        Returns the JSON value of the complete response, or None if there is none.
+        """
+        text = self.text
+        search_start = _search_start(text)
+        found = self._fenced.finish(text) if self._fenced is not None else None
+        if found is None and self._fenced is not None:
+            found = _decode_scalar(text, search_start)
+        if found is None and self._plain is not None:
+            found = self._plain.finish(text)
+        if found is None:
+            found = _decode_scalar(text, 0)
+        return found[0] if found is not None else None
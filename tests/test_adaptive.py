@@ -0,0 +1,61 @@
+import math
+import statistics
+from unittest.mock import patch
+import pytest
+from prompt_visualization.adaptive import AdaptiveStopRule, RunningStat
+from prompt_visualization.llm_engine import run_adaptive_experiment
+
+CAKE = {"ingredient_composition": [{"name": "Flour"}, {"name": "Sugar"}, {"name": "Eggs"}]}
+BREAD = {"ingredient_composition": [{"name": "Flour"}, {"name": "Water"}, {"name": "Yeast"}]}
+
+def make_result(parsed_output, latency=1.0, total_tokens=100):
+    return {"status": "Pass", "output_text": "", "latency": latency, "run_id": "run",
+            "parsed_output": parsed_output, "usage": {"total_token_count": total_tokens}}
+
+def test_running_stat_matches_statistics_module():
+    values = [1.0, 2.5, 3.0, 4.5, 10.0]
+    stat = RunningStat()
+    for value in values:
+        stat.add(value)
+    assert stat.mean == pytest.approx(statistics.mean(values))
+    assert stat.variance == pytest.approx(statistics.variance(values))
+    assert RunningStat().half_width(1.96) == math.inf
+
+def test_stop_rule_waits_for_min_runs():
+    rule = AdaptiveStopRule(min_runs=5)
+    for _ in range(4):
+        rule.add_result(make_result(CAKE))
+    assert not rule.is_satisfied()
+    rule.add_result(make_result(CAKE))
+    assert rule.is_satisfied()
+
+def test_stop_rule_requires_stable_latency():
+    rule = AdaptiveStopRule(min_runs=5, metric_precision=0.05)
+    for latency in [0.5, 3.0, 1.0, 6.0, 0.2, 4.0]:
+        rule.add_result(make_result(CAKE, latency=latency))
+    assert not rule.is_satisfied()
+
+@patch("prompt_visualization.llm_engine.mlflow")
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+def test_adaptive_experiment_stops_once_stable(mock_run, mock_mlflow):
+    mock_run.side_effect = lambda *args, **kwargs: make_result(CAKE)
+    rule = AdaptiveStopRule(min_runs=5)
+
+    results = run_adaptive_experiment("{}", "Prompt", "batch", "model", rule, max_runs=100, max_concurrency=2)
+
+    assert 5 <= len(results) < 100
+    # Waves continue the run numbering so cache keys and MLflow run names stay unique
+    run_indexes = sorted(call.kwargs["run_index"] for call in mock_run.call_args_list)
+    assert run_indexes == list(range(len(run_indexes)))
+
+@patch("prompt_visualization.llm_engine.mlflow")
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+def test_adaptive_experiment_respects_budget(mock_run, mock_mlflow):
+    outputs = iter([CAKE, BREAD, None] * 10)
+    mock_run.side_effect = lambda *args, **kwargs: make_result(next(outputs))
+    rule = AdaptiveStopRule(min_runs=5, consistency_precision=0.01)
+
+    results = run_adaptive_experiment("{}", "Prompt", "batch", "model", rule, max_runs=12, max_concurrency=4)
+
+    assert len(results) == 12
+    assert not rule.is_satisfied()
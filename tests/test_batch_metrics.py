@@ -0,0 +1,74 @@
+import pytest
+from prompt_visualization.batch_metrics import summarize_results
+from prompt_visualization.pricing import configure_price, estimate_cost, get_price
+
+def result(latency, items=("a", "b"), status="Pass", tokens=(100, 50)):
+    return {"status": status, "latency": latency, "parsed_output": list(items),
+            "usage": {"prompt_token_count": tokens[0], "candidates_token_count": tokens[1],
+                      "total_token_count": sum(tokens)}}
+
+def test_summarize_results_aggregates_passed_runs():
+    results = [result(1.0), result(2.0), result(3.0), dict(result(0, status="Fail"), parsed_output=None)]
+
+    summary = summarize_results(results, model_name="gemini-1.5-flash")
+
+    assert summary["runs"] == 4
+    assert summary["passed"] == 3
+    assert summary["failure_rate"] == 0.25
+    assert summary["latency_p50"] == 2.0
+    assert 2.0 < summary["latency_p95"] <= 3.0
+    assert summary["total_tokens"] == 450
+    # The failed run scores as an empty output, so it lowers consistency
+    assert summary["consistency_score"] == pytest.approx(0.5)
+    assert summary["cost"] == pytest.approx(3 * (100 * 0.075 + 50 * 0.30) / 1_000_000)
+
+def test_summarize_results_without_usable_runs():
+    summary = summarize_results([result(0, status="Fail")], model_name="unknown-model")
+
+    assert summary["latency_p50"] is None
+    assert summary["cost"] is None
+    assert summary["consistency_score"] is None
+
+def test_price_lookup_uses_longest_prefix():
+    assert get_price("gemini-1.5-flash-8b-001") == (0.0375, 0.15)
+    assert get_price("models/gemini-1.5-flash-002") == (0.075, 0.30)
+    assert get_price("openrouter:google/gemini-2.0-flash") == (0.10, 0.40)
+    assert estimate_cost("some-local-model", {"prompt_token_count": 10}) is None
+
+    configure_price("openrouter:vendor/custom-model", 1.0, 2.0)
+    assert estimate_cost("openrouter:vendor/custom-model", {"prompt_token_count": 1_000_000,
+                                                            "candidates_token_count": 1_000_000}) == 3.0
+
+def test_summarize_results_adds_per_field_consistency():
+    results = [dict(result(1.0), parsed_output={"a": "x", "b": "y"}),
+               dict(result(2.0), parsed_output={"a": "x", "b": "z"})]
+
+    summary = summarize_results(results, normalizer={"a": "$.a", "b": "$.b"})
+
+    assert summary["consistency_a"] == 1.0
+    assert summary["consistency_b"] == 0.0
+    assert summary["consistency_score"] == pytest.approx(1 / 3)
+
+def test_cached_prompt_tokens_are_counted_and_discounted():
+    cached = dict(result(1.0, tokens=(1000, 50)))
+    cached["usage"] = dict(cached["usage"], cached_content_token_count=800)
+
+    summary = summarize_results([cached, result(2.0, tokens=(1000, 50))], model_name="gemini-1.5-flash")
+
+    assert summary["prompt_tokens"] == 2000
+    assert summary["cached_prompt_tokens"] == 800
+    full = (1000 * 0.075 + 50 * 0.30) / 1_000_000
+    assert estimate_cost("gemini-1.5-flash", cached["usage"]) == pytest.approx(full - 800 * 0.75 * 0.075 / 1_000_000)
+    assert summary["cost"] == pytest.approx(2 * full - 800 * 0.75 * 0.075 / 1_000_000)
+
+def test_cache_hits_are_not_billed():
+    hit = dict(result(0.01), cache_hit=True)
+    results = [result(1.0), dict(result(2.0), cache_hit=False), hit]
+
+    summary = summarize_results(results, model_name="gemini-1.5-flash")
+
+    assert summary["total_tokens"] == 450
+    assert summary["billed_tokens"] == 300
+    assert summary["cache_hit_tokens"] == 150
+    assert summary["cache_hits"] == 1
+    assert summary["cost"] == pytest.approx(2 * (100 * 0.075 + 50 * 0.30) / 1_000_000)
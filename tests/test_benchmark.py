@@ -0,0 +1,33 @@
+import mlflow
+import pytest
+from prompt_visualization.benchmark import configure_local_tracking, configure_mock_provider, run_benchmarks
+from prompt_visualization.history_store import configure_results_store
+from prompt_visualization.llm_engine import get_engine
+
+@pytest.fixture(autouse=True)
+def restore_tracking():
+    tracking_uri = mlflow.get_tracking_uri()
+    yield
+    mlflow.set_tracking_uri(tracking_uri)
+    configure_results_store(enabled=False)
+    get_engine().clear()
+
+def test_run_benchmarks_offline(tmp_path):
+    configure_local_tracking(tmp_path)
+    model_spec = configure_mock_provider(latency=0.001, prompt_latency=0.01, rate_limit_rate=0.2, seed=5)
+    rows = []
+
+    returned = run_benchmarks(concurrency_levels=(2,), batch_sizes=(3,), model_spec=model_spec, on_row=rows.append)
+
+    assert returned == rows
+    assert [row["benchmark"] for row in rows] == [
+        "experiment_throughput", "batch_latency", "context_cache", "logging_overhead", "evaluator"]
+    # Simulated 429s are retried by the scheduler
+    assert rows[0]["passed"] == 3
+    assert rows[1]["passed"] == 3
+    # The cached batch sends its long system prompt once, not once per run
+    assert rows[2]["cached_prompt_tokens"] < rows[2]["uncached_prompt_tokens"] / 10
+    assert rows[2]["cached_latency_ms"] < rows[2]["uncached_latency_ms"]
+    assert rows[3]["overhead_ms"] > 0
+    assert rows[4]["jaccard_batch_ms"] >= 0
+    assert (tmp_path / "mlflow.db").exists()
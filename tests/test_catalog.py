@@ -0,0 +1,63 @@
+import json
+from unittest.mock import MagicMock, patch
+from llm_providers.base import Model
+from llm_providers.catalog import ModelCatalog
+
+def fake_provider(*names, provider="Google"):
+    provider_instance = MagicMock()
+    provider_instance.list_models.return_value = [Model(name=name, provider=provider) for name in names]
+    return provider_instance
+
+@patch("llm_providers.catalog.get_provider")
+def test_catalog_lists_providers_concurrently_and_caches_on_disk(mock_get_provider, tmp_path):
+    providers = {"google": fake_provider("models/gemini-pro"),
+                 "openrouter": fake_provider("openai/gpt-4", provider="OpenRouter")}
+    mock_get_provider.side_effect = providers.get
+    path = str(tmp_path / "catalog.json")
+
+    models = ModelCatalog(providers=["google", "openrouter"], path=path).list_models()
+    assert [m.name for m in models] == ["models/gemini-pro", "openai/gpt-4"]
+    assert [p.list_models.call_count for p in providers.values()] == [1, 1]
+
+    # A new catalog instance is served from disk without listing again
+    cached = ModelCatalog(providers=["google", "openrouter"], path=path)
+    assert [m.name for m in cached.list_models(provider="openrouter")] == ["openai/gpt-4"]
+    assert providers["google"].list_models.call_count == 1
+
+@patch("llm_providers.catalog.get_provider")
+def test_stale_catalog_is_served_while_revalidating(mock_get_provider, tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"fetched_at": 0, "models": {"google": [{"name": "old", "provider": "Google"}]}}))
+    mock_get_provider.return_value = fake_provider("new")
+    catalog = ModelCatalog(providers=["google"], path=str(path), ttl_seconds=60)
+
+    assert [m.name for m in catalog.list_models()] == ["old"]
+    catalog.wait_for_refresh(timeout=5)
+    assert [m.name for m in catalog.list_models()] == ["new"]
+    assert not catalog.is_stale()
+
+@patch("llm_providers.catalog.get_provider")
+def test_failing_provider_keeps_last_listing_and_instances_are_reused(mock_get_provider, tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps({"fetched_at": 0, "models": {"google": [{"name": "kept", "provider": "Google"}]}}))
+    failing = MagicMock()
+    failing.list_models.side_effect = ConnectionError("offline")
+    mock_get_provider.return_value = failing
+    catalog = ModelCatalog(providers=["google"], path=str(path))
+
+    catalog.refresh()
+    catalog.refresh()
+
+    assert [m.name for m in catalog.list_models()] == ["kept"]
+    mock_get_provider.assert_called_once_with("google")
+
+@patch("llm_providers.catalog.get_provider")
+def test_catalog_lists_through_the_given_provider_factory(mock_get_provider, tmp_path):
+    google = fake_provider("models/gemini-pro")
+    factory = MagicMock(return_value=google)
+    catalog = ModelCatalog(providers=["google"], path=str(tmp_path / "catalog.json"), provider_factory=factory)
+
+    assert [m.name for m in catalog.list_models()] == ["models/gemini-pro"]
+    assert catalog.get_provider("Google") is google
+    factory.assert_called_with("google")
+    mock_get_provider.assert_not_called()
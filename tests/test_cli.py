@@ -0,0 +1,148 @@
+import json
+import os
+from unittest.mock import patch
+from click.testing import CliRunner
+from prompt_visualization.cli import iter_dataset, main
+
+CAKE = {"ingredient_composition": [{"name": "Flour"}, {"name": "Sugar"}]}
+
+def fake_run(raw_json_input, system_prompt, run_name, model_name, run_index=0):
+    return {"status": "Pass", "output_text": json.dumps(CAKE), "latency": 0.5, "run_id": run_name,
+            "cache_hit": False, "parsed_output": CAKE, "usage": None}
+
+def write_inputs(tmp_path):
+    dataset = tmp_path / "cases.jsonl"
+    dataset.write_text('{"id": "a", "recipe_text": "cake"}\n{"id": "b", "recipe_text": "bread"}\n')
+    prompt = tmp_path / "extractor.txt"
+    prompt.write_text("Extract the ingredients.")
+    return dataset, prompt
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def test_iter_dataset_reads_jsonl_and_csv(tmp_path):
+    jsonl = tmp_path / "cases.jsonl"
+    jsonl.write_text('{"id": "a", "text": "x"}\n\n{"text": "y"}\n')
+    csv_file = tmp_path / "cases.csv"
+    csv_file.write_text("id,text\nc1,hello\n")
+
+    assert list(iter_dataset(str(jsonl))) == [("a", '{"id": "a", "text": "x"}'), ("3", '{"text": "y"}')]
+    assert list(iter_dataset(str(csv_file), input_field="text")) == [("c1", "hello")]
+
+@patch("prompt_visualization.cli.configure_experiment")
+@patch("prompt_visualization.cli.init_tracking")
+@patch("prompt_visualization.cli.configure_genai")
+@patch("prompt_visualization.cli.run_prompt_experiment", side_effect=fake_run)
+def test_sweep_writes_results_and_resumes(mock_run, mock_configure, mock_init, mock_experiment, tmp_path):
+    dataset, prompt = write_inputs(tmp_path)
+    output = tmp_path / "results.jsonl"
+    args = ["--dataset", str(dataset), "--prompt", str(prompt), "--model", "m1", "--model", "m2",
+            "--repeats", "3", "--output", str(output)]
+    runner = CliRunner(env={"GOOGLE_API_KEY": "key"})
+
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0, result.output
+    assert len(read_jsonl(output)) == 2 * 2 * 3
+    summary = read_jsonl(tmp_path / "results.summary.jsonl")
+    assert len(summary) == 4
+    assert all(group["consistency_score"] == 1.0 for group in summary)
+
+    # Simulate a crash: drop the last two results and the summaries they completed
+    lines = output.read_text().splitlines(keepends=True)
+    output.write_text("".join(lines[:-2]) + '{"task_id": "torn')
+    (tmp_path / "results.summary.jsonl").write_text("".join(
+        json.dumps(g) + "\n" for g in summary if g["group_id"] != "b:extractor:m2"))
+    mock_run.reset_mock()
+
+    result = runner.invoke(main, args)
+    assert result.exit_code == 0, result.output
+    assert mock_run.call_count == 2
+    assert len(read_jsonl(tmp_path / "results.summary.jsonl")) == 4
+
+def test_sweep_requires_api_key(tmp_path):
+    dataset, prompt = write_inputs(tmp_path)
+    result = CliRunner(env={"GOOGLE_API_KEY": ""}).invoke(
+        main, ["--dataset", str(dataset), "--prompt", str(prompt), "--model", "m1"])
+    assert result.exit_code != 0
+    assert "GOOGLE_API_KEY" in result.output
+
+@patch("prompt_visualization.cli.configure_experiment")
+@patch("prompt_visualization.cli.init_tracking")
+@patch("prompt_visualization.cli.configure_genai")
+@patch("prompt_visualization.cli.run_prompt_experiment", side_effect=fake_run)
+def test_sweep_without_gemini_models_needs_no_api_key(mock_run, mock_configure, mock_init, mock_experiment, tmp_path):
+    dataset, prompt = write_inputs(tmp_path)
+    result = CliRunner(env={"GOOGLE_API_KEY": ""}).invoke(main, [
+        "--dataset", str(dataset), "--prompt", str(prompt), "--model", "mock:mock-model",
+        "--model", "openrouter:openai/gpt-4o-mini", "--output", str(tmp_path / "results.jsonl")])
+
+    assert result.exit_code == 0, result.output
+    assert mock_run.call_count == 2 * 2 * 3
+    mock_configure.assert_not_called()
+
+@patch("prompt_visualization.cli.configure_experiment")
+@patch("prompt_visualization.cli.init_tracking")
+@patch("prompt_visualization.cli.configure_genai")
+@patch("prompt_visualization.cli.run_prompt_experiment", side_effect=fake_run)
+def test_sweep_scores_declared_fields(mock_run, mock_configure, mock_init, mock_experiment, tmp_path):
+    dataset, prompt = write_inputs(tmp_path)
+    output = tmp_path / "results.jsonl"
+
+    result = CliRunner(env={"GOOGLE_API_KEY": "key"}).invoke(main, [
+        "--dataset", str(dataset), "--prompt", str(prompt), "--model", "m1", "--output", str(output),
+        "--field", "names=$.ingredient_composition[*].name", "--field", "first=$.ingredient_composition[0].name"])
+
+    assert result.exit_code == 0, result.output
+    summary = read_jsonl(tmp_path / "results.summary.jsonl")
+    assert all(group["consistency_names"] == group["consistency_first"] == 1.0 for group in summary)
+
+def test_sweep_rejects_invalid_field(tmp_path):
+    dataset, prompt = write_inputs(tmp_path)
+
+    result = CliRunner(env={"GOOGLE_API_KEY": "key"}).invoke(main, [
+        "--dataset", str(dataset), "--prompt", str(prompt), "--model", "m1", "--field", "x=$.items[*"])
+
+    assert result.exit_code != 0
+    assert "Invalid field selector" in result.output
+
+@patch("prompt_visualization.cli.configure_experiment")
+@patch("prompt_visualization.cli.init_tracking")
+@patch("prompt_visualization.cli.configure_genai")
+@patch("prompt_visualization.cli.run_prompt_experiment")
+def test_sweep_writes_trace_and_profile(mock_run, mock_configure, mock_init, mock_experiment, tmp_path):
+    from prompt_visualization.tracing import MODEL, span
+    def traced_run(*args, **kwargs):
+        with span("run", lane=args[2]), span("model_call", MODEL):
+            return fake_run(*args, **kwargs)
+    mock_run.side_effect = traced_run
+    dataset, prompt = write_inputs(tmp_path)
+    trace_path, profile_path = tmp_path / "sweep.trace.json", tmp_path / "sweep.prof"
+
+    result = CliRunner(env={"GOOGLE_API_KEY": "key"}).invoke(main, [
+        "--dataset", str(dataset), "--prompt", str(prompt), "--model", "m1", "--repeats", "2",
+        "--output", str(tmp_path / "results.jsonl"), "--trace", str(trace_path), "--profile", str(profile_path)])
+
+    assert result.exit_code == 0, result.output
+    events = [e for e in json.loads(trace_path.read_text())["traceEvents"] if e["ph"] == "X"]
+    assert sum(e["name"] == "model_call" for e in events) == 4
+    assert "Time by category: model" in result.output
+    assert profile_path.exists()
+
+@patch("prompt_visualization.cli.configure_results_store")
+@patch("prompt_visualization.cli.configure_experiment")
+@patch("prompt_visualization.cli.init_tracking")
+@patch("prompt_visualization.cli.configure_genai")
+@patch("prompt_visualization.cli.run_prompt_experiment", side_effect=fake_run)
+def test_history_archive_is_opt_in(mock_run, mock_configure, mock_init, mock_experiment, mock_store, tmp_path):
+    dataset, prompt = write_inputs(tmp_path)
+    args = ["--dataset", str(dataset), "--prompt", str(prompt), "--model", "mock:mock-model",
+            "--output", str(tmp_path / "results.jsonl")]
+    result = CliRunner().invoke(main, args)
+    assert result.exit_code == 0, result.output
+    mock_store.assert_not_called()
+
+    history = str(tmp_path / "history")
+    result = CliRunner().invoke(main, args + ["--history", history])
+    assert result.exit_code == 0, result.output
+    mock_store.assert_called_once_with(history)
@@ -0,0 +1,148 @@
+import json
+from unittest.mock import patch
+import numpy as np
+import pytest
+from prompt_visualization.embeddings import Embedder
+from prompt_visualization.consistency_evaluator import (
+    IncrementalConsistencyEvaluator, calculate_consistency_from_outputs, calculate_consistency_from_results, calculate_consistency_metric,
+    field_consistency_from_outputs, mean_pairwise_similarity, normalize_ingredients, pairwise_similarity_matrix,
+    score_outputs, similarity_matrix_from_outputs
+)
+
+CAKE = {"ingredient_composition": [{"name": "Flour"}, {"name": "Sugar"}, {"name": "Eggs"}]}
+CAKE_REORDERED = {"ingredient_composition": [{"name": "eggs"}, {"name": "flour "}, {"name": "sugar"}]}
+BREAD = {"ingredient_composition": [{"name": "Flour"}, {"name": "Water"}, {"name": "Yeast"}]}
+
+def test_normalize_ingredients_is_order_and_case_insensitive():
+    assert normalize_ingredients(CAKE["ingredient_composition"]) == ["eggs", "flour", "sugar"]
+    assert normalize_ingredients(CAKE_REORDERED["ingredient_composition"]) == ["eggs", "flour", "sugar"]
+
+def test_identical_outputs_score_one():
+    assert calculate_consistency_from_outputs([CAKE, CAKE_REORDERED, CAKE]) == 1.0
+
+def test_unparsed_outputs_lower_the_score():
+    assert calculate_consistency_from_outputs([CAKE, None]) < calculate_consistency_from_outputs([CAKE, BREAD])
+
+def test_fewer_than_two_outputs_score_zero():
+    assert calculate_consistency_from_outputs([CAKE]) == 0.0
+
+def test_results_are_scored_from_parsed_output():
+    results = [{"status": "Pass", "parsed_output": CAKE}, {"status": "Pass", "parsed_output": CAKE_REORDERED}]
+    assert calculate_consistency_from_results(results) == 1.0
+
+@patch("prompt_visualization.consistency_evaluator.MlflowClient")
+def test_historical_runs_download_once_into_cache(mock_client_cls, tmp_path):
+    def download(run_id, artifact_path, dst_path):
+        local_path = tmp_path / "cache" / run_id / artifact_path
+        local_path.write_text(json.dumps(CAKE))
+        return str(local_path)
+    mock_client_cls.return_value.download_artifacts.side_effect = download
+    cache_dir = str(tmp_path / "cache")
+
+    first = calculate_consistency_metric("exp", ["run_1", "run_2"], cache_dir=cache_dir)
+    second = calculate_consistency_metric("exp", ["run_1", "run_2"], cache_dir=cache_dir)
+
+    assert first == second == pytest.approx(1.0)
+    assert mock_client_cls.return_value.download_artifacts.call_count == 2
+
+def test_jaccard_and_dice_scores():
+    lists = [["eggs", "flour", "sugar"], ["flour", "water", "yeast"]]
+    assert mean_pairwise_similarity(pairwise_similarity_matrix(lists, method="jaccard")) == pytest.approx(1 / 5)
+    assert mean_pairwise_similarity(pairwise_similarity_matrix(lists, method="dice")) == pytest.approx(2 / 6)
+
+def test_similarity_matrix_is_symmetric_with_unit_diagonal():
+    matrix = similarity_matrix_from_outputs([CAKE, BREAD, None, None])
+    assert matrix.shape == (4, 4)
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(np.diag(matrix), 1.0)
+    assert matrix[0, 2] == 0.0  # parsed vs unparsed
+    assert matrix[2, 3] == 1.0  # two empty outputs are identical
+
+def test_minhash_approximates_jaccard():
+    base = [f"item_{i}" for i in range(100)]
+    lists = [base, base[:50] + [f"other_{i}" for i in range(50)]]
+    exact = pairwise_similarity_matrix(lists, method="jaccard")[0, 1]
+    approx = pairwise_similarity_matrix(lists, method="minhash", num_perm=256)[0, 1]
+    assert approx == pytest.approx(exact, abs=0.1)
+
+def test_unknown_similarity_method_rejected():
+    with pytest.raises(ValueError):
+        pairwise_similarity_matrix([["a"], ["b"]], method="levenshtein")
+
+@pytest.mark.parametrize("method", ["jaccard", "dice", "minhash", "semantic"])
+def test_incremental_evaluator_matches_batch_scoring(method):
+    outputs = [CAKE, BREAD, None, CAKE_REORDERED, {"ingredient_composition": [{"name": "Flour"}]}] * 3
+    evaluator = IncrementalConsistencyEvaluator(method=method)
+    for output in outputs:
+        evaluator.add_output(output)
+
+    expected = similarity_matrix_from_outputs(outputs, method=method)
+    assert evaluator.n == len(outputs)
+    assert np.allclose(evaluator.similarity_matrix, expected)
+    assert evaluator.score == pytest.approx(mean_pairwise_similarity(expected))
+
+def test_semantic_similarity_matches_paraphrased_items():
+    paraphrased = {"ingredient_composition": [{"name": "egg"}, {"name": "Flour"}, {"name": "white sugar"}]}
+    lists = [["all-purpose flour", "eggs"], ["flour, all purpose", "egg"], ["water", "yeast"], []]
+
+    semantic = pairwise_similarity_matrix(lists, method="semantic")
+    assert pairwise_similarity_matrix(lists, method="jaccard")[0, 1] == 0.0
+    assert semantic[0, 1] > 0.7
+    assert semantic[0, 2] == 0.0 and semantic[0, 3] == 0.0
+    assert np.allclose(semantic, semantic.T) and np.allclose(np.diag(semantic), 1.0)
+    assert (calculate_consistency_from_outputs([CAKE, paraphrased], method="semantic")
+            > calculate_consistency_from_outputs([CAKE, paraphrased], method="jaccard"))
+
+def test_semantic_scoring_embeds_each_distinct_item_once():
+    embedded = []
+
+    def backend(texts):
+        embedded.extend(texts)
+        return np.eye(8, dtype=np.float32)[[len(text) % 8 for text in texts]]
+
+    similarity = pairwise_similarity_matrix([["a", "bb"], ["bb", "a"], ["a"]], method="semantic",
+                                            embedder=Embedder(backend))
+
+    assert sorted(embedded) == ["a", "bb"]
+    assert similarity[0, 1] == pytest.approx(1.0)
+    assert similarity[0, 2] == pytest.approx(2 / 3)
+
+def test_incremental_evaluator_converges_on_stable_outputs():
+    evaluator = IncrementalConsistencyEvaluator()
+    assert evaluator.confidence_interval() == (0.0, 1.0)
+    for _ in range(5):
+        evaluator.add_output(CAKE)
+    assert evaluator.score == 1.0
+    assert evaluator.is_converged(tolerance=0.01)
+
+def test_incremental_evaluator_not_converged_on_mixed_outputs():
+    evaluator = IncrementalConsistencyEvaluator()
+    for output in [CAKE, BREAD, None, CAKE, BREAD, None]:
+        evaluator.add_output(output)
+    assert not evaluator.is_converged(tolerance=0.01)
+
+ORDERS = [
+    {"items": [{"name": "Widget"}, {"name": "Gadget"}], "status": "open"},
+    {"items": [{"name": "gadget"}, {"name": "widget"}], "status": "closed"},
+]
+
+def test_schema_normalizer_scores_any_shape():
+    assert calculate_consistency_from_outputs(ORDERS, normalizer={"items": "$.items[*].name"}) == 1.0
+    assert calculate_consistency_from_outputs(ORDERS, normalizer="$.status") == 0.0
+
+def test_score_outputs_returns_per_field_scores():
+    fields = {"items": "$.items[*].name", "status": "$.status"}
+
+    overall, field_scores = score_outputs(ORDERS, normalizer=fields)
+
+    assert field_scores == {"items": 1.0, "status": 0.0}
+    assert overall == pytest.approx(2 / 4)
+    assert field_consistency_from_outputs(ORDERS, fields) == field_scores
+    assert score_outputs([CAKE, CAKE]) == (1.0, {})
+
+def test_incremental_evaluator_uses_normalizer():
+    evaluator = IncrementalConsistencyEvaluator(normalizer={"items": "$.items[*].name"})
+    for output in ORDERS:
+        evaluator.add_output(output)
+
+    assert evaluator.score == 1.0
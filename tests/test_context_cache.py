@@ -0,0 +1,58 @@
+import time
+import pytest
+from unittest.mock import MagicMock
+from llm_providers.base import ContextCache
+from prompt_visualization.context_cache import OFF, ContextCacheRegistry
+
+def handle(name="cachedContents/1", ttl=600):
+    return ContextCache(name, "model", "Mock", token_count=2000, expire_time=time.time() + ttl)
+
+def test_acquire_creates_one_cache_per_prompt():
+    create = MagicMock(side_effect=lambda model, prompt, ttl: handle(f"cachedContents/{prompt}"))
+    registry = ContextCacheRegistry(create, ttl=120)
+
+    first = registry.acquire("mock:model", "a", 2000)
+
+    assert registry.acquire("mock:model", "a", 2000) is first
+    assert registry.get("mock:model", "a") is first
+    assert registry.get("mock:model", "b") is None
+    assert registry.get("mock:other", "a") is None
+    create.assert_called_once_with("mock:model", "a", 120)
+
+def test_acquire_skips_short_prompts_and_off_mode():
+    create = MagicMock(return_value=handle())
+    registry = ContextCacheRegistry(create, min_tokens=1024)
+
+    assert registry.acquire("mock:model", "short", 100) is None
+    registry.configure(mode=OFF)
+    assert registry.acquire("mock:model", "long", 5000) is None
+    create.assert_not_called()
+    with pytest.raises(ValueError):
+        registry.configure(mode="always")
+
+def test_failed_creation_is_not_retried():
+    create = MagicMock(side_effect=RuntimeError("400 Cached content is too small"))
+    registry = ContextCacheRegistry(create)
+
+    assert registry.acquire("mock:model", "prompt", 2000) is None
+    assert registry.acquire("mock:model", "prompt", 2000) is None
+    create.assert_called_once()
+
+def test_expiring_cache_is_replaced():
+    create = MagicMock(side_effect=[handle("cachedContents/old", ttl=10), handle("cachedContents/new")])
+    registry = ContextCacheRegistry(create)
+
+    registry.acquire("mock:model", "prompt", 2000)
+    # Too close to expiry to hand out to runs that may still be queued
+    assert registry.get("mock:model", "prompt") is None
+    assert registry.acquire("mock:model", "prompt", 2000).name == "cachedContents/new"
+
+def test_clear_deletes_caches():
+    delete = MagicMock()
+    registry = ContextCacheRegistry(MagicMock(return_value=handle()), delete)
+    created = registry.acquire("mock:model", "prompt", 2000)
+
+    registry.clear()
+
+    delete.assert_called_once_with("mock:model", created)
+    assert registry.get("mock:model", "prompt") is None
@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock
+from prompt_visualization.diffing import (
+    DiffMemo, diff_runs, field_variance, field_variance_for_runs, paginate, structural_diff, text_diff,
+)
+
+RECIPE_A = {"name": "Tea", "ingredients": ["Water", "Tea", "Sugar"], "time": 5, "notes": "hot"}
+RECIPE_B = {"name": "Tea", "ingredients": ["Water", "Tea", "Milk"], "time": 6, "serves": 2}
+
+def test_structural_diff_reports_field_paths():
+    hunks = {(h["kind"], h["path"]): h for h in structural_diff(RECIPE_A, RECIPE_B)}
+
+    assert hunks[("changed", "$.time")]["old"] == 5
+    assert hunks[("changed", "$.time")]["new"] == 6
+    assert hunks[("changed", "$.ingredients[2]")]["new"] == "Milk"
+    assert hunks[("added", "$.serves")]["new"] == 2
+    assert hunks[("removed", "$.notes")]["old"] == "hot"
+    assert not any(path == "$.name" for _, path in hunks)
+
+def test_structural_diff_of_equal_and_mismatched_outputs():
+    assert structural_diff(RECIPE_A, dict(RECIPE_A)) == []
+    assert structural_diff({"a": 1}, [1]) == [{"kind": "changed", "path": "$", "old": {"a": 1}, "new": [1]}]
+
+def test_text_diff_groups_lines_into_hunks():
+    hunks = text_diff("a\nb\nc", "a\nx\nc\nd")
+
+    assert [h["kind"] for h in hunks] == ["changed", "added"]
+    assert hunks[0]["old"] == "b" and hunks[0]["new"] == "x"
+    assert hunks[1]["new"] == "d"
+
+def test_diff_runs_is_memoized_per_run_pair():
+    memo = DiffMemo()
+    run_a = {"run_id": "a", "parsed_output": RECIPE_A, "output_text": ""}
+    run_b = {"run_id": "b", "parsed_output": RECIPE_B, "output_text": ""}
+
+    first = diff_runs(run_a, run_b, memo=memo)
+    run_b["parsed_output"] = RECIPE_A
+
+    assert diff_runs(run_a, run_b, memo=memo) is first
+    assert diff_runs(run_b, run_a, memo=memo) == []
+    assert len(memo) == 2
+
+def test_diff_runs_falls_back_to_text_for_invalid_json():
+    hunks = diff_runs({"run_id": "a", "parsed_output": None, "output_text": "not json"},
+                      {"run_id": "b", "parsed_output": {}, "output_text": "{}"}, memo=DiffMemo())
+
+    assert hunks == [{"kind": "changed", "path": "lines 1-1", "old": "not json", "new": "{}"}]
+
+def test_diff_memo_evicts_least_recently_used():
+    memo = DiffMemo(max_entries=2)
+    memo.get_or_compute("a", lambda: 1)
+    memo.get_or_compute("b", lambda: 2)
+    memo.get_or_compute("a", lambda: 1)
+    memo.get_or_compute("c", lambda: 3)
+
+    compute = MagicMock(return_value=2)
+    memo.get_or_compute("b", compute)
+    compute.assert_called_once()
+    assert memo.get_or_compute("c", lambda: None) == 3
+
+def test_paginate_clamps_page():
+    hunks = list(range(45))
+
+    assert paginate(hunks, page=1, page_size=20) == (list(range(20)), 3)
+    assert paginate(hunks, page=9, page_size=20) == (list(range(40, 45)), 3)
+    assert paginate([], page=1) == ([], 1)
+
+def test_field_variance_ranks_differing_fields_first():
+    outputs = [RECIPE_A, dict(RECIPE_A), RECIPE_B, None]
+
+    fields = {f["path"]: f for f in field_variance(outputs)}
+    ordered = [f["path"] for f in field_variance(outputs)]
+
+    assert fields["$.name"]["agreement"] == 1.0
+    assert fields["$.time"]["distinct"] == 2
+    assert fields["$.time"]["most_common"] == 5
+    assert fields["$.serves"]["present"] == 1
+    assert fields["$.serves"]["agreement"] == 1 / 3
+    assert ordered.index("$.serves") < ordered.index("$.time") < ordered.index("$.name")
+
+def test_field_variance_for_runs_is_memoized_per_batch():
+    memo = DiffMemo()
+    results = [{"run_id": "a", "parsed_output": RECIPE_A}, {"run_id": "b", "parsed_output": RECIPE_B}]
+
+    first = field_variance_for_runs(results, memo=memo)
+
+    assert field_variance_for_runs(results, memo=memo) is first
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from unittest.mock import patch
+from prompt_visualization.embeddings import (
+    EmbeddingCache, Embedder, GeminiEmbedder, HashingEmbedder, configure_embeddings, get_embedder
+)
+
+def test_hashing_embedder_is_deterministic_and_order_insensitive():
+    first = Embedder(HashingEmbedder()).embed(["all-purpose flour", "flour, all purpose", "eggs", "egg", "sugar"])
+    second = Embedder(HashingEmbedder()).embed(["all-purpose flour"])
+
+    assert np.array_equal(first[0], second[0])
+    assert np.allclose(np.linalg.norm(first, axis=1), 1.0)
+    cosine = first @ first.T
+    assert cosine[0, 1] == pytest.approx(1.0)
+    assert cosine[2, 3] > 0.5
+    assert cosine[0, 4] < 0.2
+
+def test_cached_vectors_are_not_recomputed(tmp_path):
+    calls = []
+
+    def backend(texts):
+        calls.append(list(texts))
+        return np.arange(len(texts) * 4, dtype=np.float32).reshape(len(texts), 4) + 1
+    backend.name = "counting"
+
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+    vectors = Embedder(backend, cache=cache).embed(["a", "b", "a"])
+    again = Embedder(backend, cache=cache).embed(["b", "c", "a"])
+
+    assert calls == [["a", "b"], ["c"]]
+    assert np.allclose(vectors[0], vectors[2])
+    assert np.allclose(again[0], vectors[1]) and np.allclose(again[2], vectors[0])
+    assert cache.stats() == 3
+    cache.close()
+
+def test_configure_embeddings_replaces_the_process_wide_embedder(tmp_path):
+    default = get_embedder()
+    try:
+        embedder = configure_embeddings(cache_path=str(tmp_path / "embeddings.sqlite"))
+        assert get_embedder() is embedder
+        assert embedder.cache is not None
+        with pytest.raises(ValueError):
+            configure_embeddings("word2vec")
+    finally:
+        configure_embeddings(cache_path=None)
+    assert get_embedder().cache is None and get_embedder() is not default
+
+@patch("prompt_visualization.embeddings.genai")
+def test_gemini_embedder_splits_requests_and_keeps_the_order(mock_genai):
+    def embed_content(model, content, task_type):
+        return {"embedding": [[float(text.split()[1]), 1.0] for text in content]}
+    mock_genai.embed_content.side_effect = embed_content
+    texts = [f"text {i}" for i in range(250)]
+
+    vectors = GeminiEmbedder()(texts)
+
+    assert [len(call.kwargs["content"]) for call in mock_genai.embed_content.call_args_list] == [100, 100, 50]
+    assert vectors.shape == (250, 2)
+    assert list(vectors[:, 0]) == list(range(250))
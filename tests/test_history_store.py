@@ -0,0 +1,64 @@
+import os
+from prompt_visualization.history_store import ResultsStore, prompt_hash, summarize_history
+
+def row(experiment, prompt, model, latency, status="Pass", timestamp=None, run_id=None):
+    return {"experiment": experiment, "prompt_hash": prompt_hash(prompt), "model_name": model,
+            "latency": latency, "status": status, "total_token_count": 10, "timestamp": timestamp,
+            "run_id": run_id or f"{model}_{latency}", "output_text": "out", "system_prompt": prompt}
+
+def test_store_partitions_and_filters_runs(tmp_path):
+    store = ResultsStore(str(tmp_path), flush_rows=2)
+    store.append(row("1", "prompt v1", "gemini-pro", 1.0, timestamp=100))
+    store.append(row("1", "prompt v2", "gemini-pro", 2.0, timestamp=200))
+    store.append(row("2", "prompt v1", "gemini-flash", 3.0, timestamp=300))
+
+    # The first two rows hit flush_rows and were written, one file per prompt partition
+    partition = tmp_path / "experiment=1" / f"prompt_hash={prompt_hash('prompt v1')}"
+    assert len(os.listdir(partition)) == 1
+
+    assert list(store.query()["latency"]) == [3.0, 2.0, 1.0]
+    assert list(store.query(experiment="1", prompt_hash=prompt_hash("prompt v1"))["latency"]) == [1.0]
+    assert list(store.query(model_names=["gemini-flash"])["experiment"]) == ["2"]
+    assert list(store.query(since=150)["timestamp"]) == [300, 200]
+
+def test_empty_store_returns_empty_frame(tmp_path):
+    frame = ResultsStore(str(tmp_path / "missing")).query()
+    assert frame.empty
+    assert summarize_history(frame).empty
+
+def test_compact_merges_part_files(tmp_path):
+    store = ResultsStore(str(tmp_path), flush_rows=1, compact_parts=None)
+    for latency in (1.0, 2.0, 3.0):
+        store.append(row("1", "prompt", "gemini-pro", latency, timestamp=latency))
+    partition = tmp_path / "experiment=1" / f"prompt_hash={prompt_hash('prompt')}"
+    assert len(os.listdir(partition)) == 3
+
+    store.compact()
+
+    assert len(os.listdir(partition)) == 1
+    assert sorted(store.query()["latency"]) == [1.0, 2.0, 3.0]
+
+def test_flush_compacts_partitions_with_too_many_parts(tmp_path):
+    store = ResultsStore(str(tmp_path), flush_rows=1, compact_parts=3)
+    partition = tmp_path / "experiment=1" / f"prompt_hash={prompt_hash('prompt')}"
+    for latency in (1.0, 2.0):
+        store.append(row("1", "prompt", "gemini-pro", latency, timestamp=latency))
+    assert len(os.listdir(partition)) == 2
+
+    store.append(row("1", "prompt", "gemini-pro", 3.0, timestamp=3.0))
+
+    assert len(os.listdir(partition)) == 1
+    assert sorted(store.query()["latency"]) == [1.0, 2.0, 3.0]
+
+def test_summarize_history_groups_by_prompt_and_model(tmp_path):
+    store = ResultsStore(str(tmp_path))
+    for latency in (1.0, 2.0, 3.0):
+        store.append(row("1", "prompt", "gemini-pro", latency, timestamp=latency))
+    store.append(row("1", "prompt", "gemini-pro", 0.0, status="Fail", timestamp=4))
+
+    summary = summarize_history(store.query())
+
+    assert len(summary) == 1
+    assert summary["runs"][0] == 4
+    assert summary["pass_rate"][0] == 0.75
+    assert summary["last_run"][0] == 4
@@ -0,0 +1,30 @@
+import json
+import subprocess
+import sys
+
+# Generous enough for a slow CI box; importing MLflow or a provider SDK alone blows it
+IMPORT_BUDGET_SECONDS = 1.0
+HEAVY_MODULES = ["mlflow", "google.generativeai", "openai", "huggingface_hub"]
+
+def import_in_fresh_interpreter(*modules):
+    """Imports ``modules`` in a new interpreter and reports the time taken and what got loaded."""
+    code = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {list(modules)!r}:\n"
+        "    __import__(name)\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"print(json.dumps({{'elapsed': elapsed, 'loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))\n"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_engine_and_cli_import_without_heavy_sdks():
+    report = import_in_fresh_interpreter("prompt_visualization.llm_engine", "prompt_visualization.cli",
+                                         "prompt_visualization.consistency_evaluator")
+    assert report["loaded"] == []
+    assert report["elapsed"] < IMPORT_BUDGET_SECONDS
+
+def test_provider_package_imports_only_requested_sdk():
+    report = import_in_fresh_interpreter("llm_providers", "llm_providers.openrouter")
+    assert report["loaded"] == ["openai"]
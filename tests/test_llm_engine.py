@@ -1,13 +1,52 @@
+import time
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
-from prompt_visualization.llm_engine import run_prompt_experiment, configure_genai
+from unittest.mock import AsyncMock, MagicMock, patch
+from prompt_visualization.response_cache import configure_response_cache
+from prompt_visualization.mlflow_logger import flush_artifacts
+from prompt_visualization.history_store import configure_results_store, prompt_hash
+from prompt_visualization.utils import extract_json
+from prompt_visualization.llm_engine import (
+    run_prompt_experiment, run_prompt_batch, arun_prompt_experiment, arun_prompt_batch, configure_genai, get_engine
+)
+
+def logged_batch(mock_mlflow):
+    """Collects the params and metrics sent through MlflowClient.log_batch."""
+    params, metrics = {}, {}
+    for call in mock_mlflow.tracking.MlflowClient.return_value.log_batch.call_args_list:
+        params.update({p.key: p.value for p in call.kwargs["params"]})
+        metrics.update({m.key: m.value for m in call.kwargs["metrics"]})
+    return params, metrics
+
+@pytest.fixture(autouse=True)
+def isolated_results_store(tmp_path):
+    # Keep the run archive out of the working tree
+    store = configure_results_store(str(tmp_path / "history"))
+    yield store
+    configure_results_store(enabled=False)
+
+@pytest.fixture(autouse=True)
+def reset_engine():
+    # Model clients are cached per process; don't leak mocks between tests
+    get_engine().clear()
+    yield
+    get_engine().clear()
+
+@pytest.fixture(autouse=True)
+def google_api_key(monkeypatch):
+    monkeypatch.setenv("GOOGLE_API_KEY", "test_key")
 
 @patch("prompt_visualization.llm_engine.genai")
-def test_configure_genai(mock_genai):
+def test_configure_genai(mock_genai, monkeypatch):
+    monkeypatch.delenv("GOOGLE_API_KEY")
     configure_genai("test_key")
     mock_genai.configure.assert_called_once_with(api_key="test_key")
+    # The Google provider is built with the configured key, not the environment's
+    with patch("llm_providers.google.genai") as provider_genai:
+        get_engine().get_provider("google")
+    provider_genai.configure.assert_called_once_with(api_key="test_key")
 
-@patch("prompt_visualization.llm_engine.genai")
+@patch("llm_providers.google.genai")
 @patch("prompt_visualization.llm_engine.mlflow")
 def test_run_prompt_experiment_success(mock_mlflow, mock_genai):
     # --- Setup Mocks ---
@@ -48,12 +87,20 @@ def test_run_prompt_experiment_success(mock_mlflow, mock_genai):
     assert result["output_text"] == '{"result": "success"}'
     assert result["run_id"] == "test_run_id_123"
     assert result["latency"] > 0
+    # The system prompt is sent as the system instruction, not pasted into the message
+    mock_genai.GenerativeModel.assert_called_once_with("gemini-pro", system_instruction="System Prompt")
+    mock_model.generate_content.assert_called_once_with('{"input": "test"}')
     
-    mock_mlflow.log_param.assert_any_call("model_name", "gemini-pro")
-    mock_mlflow.log_metric.assert_any_call("total_token_count", 30)
-    mock_mlflow.log_dict.assert_called() # Should log the parsed JSON
+    flush_artifacts()
+    params, metrics = logged_batch(mock_mlflow)
+    assert params["model_name"] == "gemini-pro"
+    assert metrics["total_token_count"] == 30
+    # Everything but the artifacts goes out in one log_batch request
+    mock_client = mock_mlflow.tracking.MlflowClient.return_value
+    mock_client.log_batch.assert_called_once()
+    mock_client.log_dict.assert_called() # Should log the parsed JSON
 
-@patch("prompt_visualization.llm_engine.genai")
+@patch("llm_providers.google.genai")
 @patch("prompt_visualization.llm_engine.mlflow")
 def test_run_prompt_experiment_failure(mock_mlflow, mock_genai):
     # Mock GenAI to raise an exception
@@ -62,4 +109,411 @@ def test_run_prompt_experiment_failure(mock_mlflow, mock_genai):
     result = run_prompt_experiment("{}", "Prompt", "run", "model")
     
     assert result["status"] == "Fail"
-    assert "API Error" in result["output_text"]
\ No newline at end of file
+    assert "API Error" in result["output_text"]
+
+@patch("prompt_visualization.llm_engine.mlflow")
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+def test_run_prompt_batch_preserves_submission_order(mock_run, mock_mlflow):
+    # Later runs finish first, results must still come back in run order
+    def fake_run(raw_json_input, system_prompt, run_name, model_name, **kwargs):
+        run_number = int(run_name.rsplit("_", 1)[1])
+        time.sleep(0.01 * (5 - run_number))
+        return {"status": "Pass", "output_text": run_name, "latency": 0.1, "run_id": run_name}
+    mock_run.side_effect = fake_run
+    progress = []
+
+    results = run_prompt_batch("{}", "Prompt", "batch", "model", 4, max_concurrency=4,
+                               on_result=lambda completed, index, result: progress.append(completed))
+
+    assert [r["run_id"] for r in results] == ["batch_run_1", "batch_run_2", "batch_run_3", "batch_run_4"]
+    assert progress == [1, 2, 3, 4]
+    assert mock_run.call_count == 4
+
+
+@patch("llm_providers.google.genai")
+def test_engine_reuses_model_client(mock_genai):
+    engine = get_engine()
+    first = engine.get_model("gemini-pro")
+    second = engine.get_model("gemini-pro")
+
+    assert first is second
+    mock_genai.GenerativeModel.assert_called_once_with("gemini-pro")
+
+def test_engine_rejects_unknown_provider():
+    with pytest.raises(ValueError):
+        get_engine().get_model("gemini-pro", provider="invalid_provider")
+
+@patch("llm_providers.google.genai")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_arun_prompt_batch_uses_async_path(mock_mlflow, mock_genai):
+    mock_run = MagicMock()
+    mock_mlflow.start_run.return_value.__enter__.return_value = mock_run
+    mock_run.info.run_id = "async_run_id"
+
+    mock_response = MagicMock()
+    mock_response.text = '{"result": "success"}'
+    mock_response.prompt_feedback.safety_ratings = []
+    mock_model = MagicMock()
+    mock_model.generate_content_async = AsyncMock(return_value=mock_response)
+    mock_genai.GenerativeModel.return_value = mock_model
+
+    results = asyncio.run(arun_prompt_batch("{}", "Prompt", "batch", "gemini-pro", 3, max_concurrency=2))
+
+    assert [r["status"] for r in results] == ["Pass", "Pass", "Pass"]
+    assert mock_model.generate_content_async.await_count == 3
+    mock_model.generate_content.assert_not_called()
+    # The system prompt is the client's system instruction; only the input is sent per run
+    mock_genai.GenerativeModel.assert_called_once_with("gemini-pro", system_instruction="Prompt")
+    mock_model.generate_content_async.assert_awaited_with("{}")
+
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_empty_batches_open_no_parent_run(mock_mlflow):
+    assert run_prompt_batch("{}", "Prompt", "batch", "gemini-pro", 0) == []
+    assert asyncio.run(arun_prompt_batch("{}", "Prompt", "batch", "gemini-pro", 0)) == []
+    mock_mlflow.tracking.MlflowClient.return_value.create_run.assert_not_called()
+
+@patch("llm_providers.google.genai")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_arun_prompt_experiment_failure(mock_mlflow, mock_genai):
+    mock_model = MagicMock()
+    mock_model.generate_content_async = AsyncMock(side_effect=Exception("API Error"))
+    mock_genai.GenerativeModel.return_value = mock_model
+
+    result = asyncio.run(arun_prompt_experiment("{}", "Prompt", "run", "model"))
+
+    assert result["status"] == "Fail"
+    assert "API Error" in result["output_text"]
+
+
+@patch("llm_providers.google.genai")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_experiment_replays_cached_response(mock_mlflow, mock_genai, tmp_path):
+    mock_mlflow.start_run.return_value.__enter__.return_value.info.run_id = "cached_run"
+    mock_response = MagicMock()
+    mock_response.text = '{"result": "success"}'
+    mock_response.usage_metadata.prompt_token_count = 10
+    mock_response.usage_metadata.candidates_token_count = 20
+    mock_response.usage_metadata.total_token_count = 30
+    mock_response.candidates[0].finish_reason.name = "STOP"
+    mock_response.prompt_feedback.safety_ratings = []
+    mock_genai.GenerativeModel.return_value.generate_content.return_value = mock_response
+
+    configure_response_cache("read_write", path=str(tmp_path / "cache.sqlite"))
+    try:
+        first = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro", run_index=0)
+        second = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro", run_index=0)
+        other_index = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro", run_index=1)
+
+        configure_response_cache("replay", path=str(tmp_path / "cache.sqlite"))
+        replayed = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro", run_index=1)
+        missing = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro", run_index=2)
+    finally:
+        configure_response_cache("off")
+
+    assert [first["cache_hit"], second["cache_hit"], other_index["cache_hit"]] == [False, True, False]
+    assert second["output_text"] == first["output_text"]
+    # A hit reports the time of its lookup; the recorded call's latency is kept apart
+    assert second["recorded_latency"] == first["latency"]
+    assert "recorded_latency" not in first
+    assert replayed["cache_hit"] is True
+    assert missing["status"] == "Fail"
+    assert mock_genai.GenerativeModel.return_value.generate_content.call_count == 2
+    assert logged_batch(mock_mlflow)[1]["cache_hit"] == 1
+
+@patch("prompt_visualization.llm_engine.mlflow")
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+def test_run_prompt_batch_stops_early(mock_run, mock_mlflow):
+    def slow_run(*args, **kwargs):
+        time.sleep(0.01)
+        return {"status": "Pass", "output_text": "{}", "latency": 0.01, "run_id": "run"}
+    mock_run.side_effect = slow_run
+    finished = []
+
+    results = run_prompt_batch("{}", "Prompt", "batch", "model", 50, max_concurrency=1,
+                               on_result=lambda completed, index, result: finished.append(index),
+                               should_stop=lambda: len(finished) >= 3)
+
+    # Runs already in flight finish, the rest are never started
+    assert 3 <= len(results) < 50
+    assert mock_run.call_count == len(results)
+
+@patch("llm_providers.google.genai")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_experiment_parses_output_once(mock_mlflow, mock_genai, tmp_path):
+    mock_mlflow.start_run.return_value.__enter__.return_value.info.run_id = "chatty_run"
+    mock_response = MagicMock()
+    mock_response.text = 'Here is the recipe:\n```json\n{"result": "success"}\n```\nEnjoy!'
+    mock_response.usage_metadata.prompt_token_count = 10
+    mock_response.usage_metadata.candidates_token_count = 20
+    mock_response.usage_metadata.total_token_count = 30
+    mock_response.candidates[0].finish_reason.name = "STOP"
+    mock_response.prompt_feedback.safety_ratings = []
+    mock_genai.GenerativeModel.return_value.generate_content.return_value = mock_response
+
+    configure_response_cache("read_write", path=str(tmp_path / "cache.sqlite"))
+    try:
+        with patch("prompt_visualization.llm_engine.extract_json", wraps=extract_json) as mock_extract:
+            first = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro")
+            # The cached record carries the parsed output, so a cache hit doesn't parse again
+            second = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro")
+    finally:
+        configure_response_cache("off")
+
+    assert first["parsed_output"] == second["parsed_output"] == {"result": "success"}
+    assert second["cache_hit"] is True
+    assert mock_extract.call_count == 1
+    flush_artifacts()
+    log_dict = mock_mlflow.tracking.MlflowClient.return_value.log_dict
+    assert log_dict.call_args.args[1:] == ({"result": "success"}, "output.json")
+
+@patch("llm_providers.google.genai")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_experiment_streams_chunks(mock_mlflow, mock_genai):
+    mock_mlflow.start_run.return_value.__enter__.return_value.info.run_id = "stream_run"
+    chunks = [MagicMock(text='{"result": '), MagicMock(text='"streamed"}')]
+    mock_response = MagicMock()
+    mock_response.__iter__.return_value = iter(chunks)
+    mock_response.text = '{"result": "streamed"}'
+    mock_response.usage_metadata.candidates_token_count = 20
+    mock_response.usage_metadata.total_token_count = 30
+    mock_response.candidates[0].finish_reason.name = "STOP"
+    mock_response.prompt_feedback.safety_ratings = []
+    mock_model = mock_genai.GenerativeModel.return_value
+    mock_model.generate_content.return_value = mock_response
+    seen = []
+
+    result = run_prompt_experiment("{}", "Prompt", "run", "gemini-pro", stream=True, on_chunk=seen.append)
+
+    assert result["status"] == "Pass"
+    assert result["output_text"] == '{"result": "streamed"}'
+    assert result["parsed_output"] == {"result": "streamed"}
+    assert mock_model.generate_content.call_args.kwargs["stream"] is True
+    # Each callback gets the accumulated text, not just the new chunk
+    assert seen == ['{"result": ', '{"result": "streamed"}']
+    flush_artifacts()
+    _, metrics = logged_batch(mock_mlflow)
+    assert metrics["chunk_count"] == 2
+    assert metrics["time_to_first_token"] >= 0
+    assert "output_tokens_per_sec" in metrics
+
+@patch("prompt_visualization.llm_engine.mlflow")
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+def test_run_prompt_batch_forwards_chunks_to_calling_thread(mock_run, mock_mlflow):
+    import threading
+    def fake_run(raw_json_input, system_prompt, run_name, model_name, run_index=0, stream=False, on_chunk=None,
+                 parent_run_id=None, experiment_id=None):
+        on_chunk("partial")
+        time.sleep(0.01)
+        return {"status": "Pass", "output_text": "partial", "latency": 0.1, "run_id": run_name}
+    mock_run.side_effect = fake_run
+    caller = threading.current_thread()
+    chunks = []
+
+    def on_chunk(index, text):
+        assert threading.current_thread() is caller
+        chunks.append((index, text))
+
+    run_prompt_batch("{}", "Prompt", "batch", "model", 3, max_concurrency=3, stream=True, on_chunk=on_chunk)
+
+    assert sorted(chunks) == [(0, "partial"), (1, "partial"), (2, "partial")]
+    assert all(call.kwargs["stream"] for call in mock_run.call_args_list)
+
+def test_parse_model_spec():
+    from prompt_visualization.llm_engine import parse_model_spec
+    assert parse_model_spec("gemini-pro") == ("google", "gemini-pro")
+    assert parse_model_spec("openrouter:meta-llama/llama-3-8b:free") == ("openrouter", "meta-llama/llama-3-8b:free")
+    assert parse_model_spec("HuggingFace:gpt2") == ("huggingface", "gpt2")
+
+@patch("prompt_visualization.llm_engine.create_provider")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_experiment_routes_other_providers(mock_mlflow, mock_create_provider):
+    from llm_providers.base import Generation
+    mock_provider = mock_create_provider.return_value
+    mock_provider.generate.return_value = Generation(
+        text='["a"]', model="openai/gpt-4", provider="OpenRouter", latency=0.1,
+        usage={"prompt_token_count": 1, "candidates_token_count": 2, "total_token_count": 3}, finish_reason="STOP")
+
+    first = run_prompt_experiment("{}", "Prompt", "run", "openrouter:openai/gpt-4")
+    run_prompt_experiment("{}", "Prompt", "run", "openrouter:openai/gpt-4")
+
+    assert first["status"] == "Pass"
+    assert first["parsed_output"] == ["a"]
+    assert first["usage"]["total_token_count"] == 3
+    mock_provider.generate.assert_called_with("openai/gpt-4", "{}", "Prompt", None)
+    # The provider and its client are created once and reused
+    mock_create_provider.assert_called_once_with("openrouter")
+
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_model_comparison_interleaves_models_under_parent_run(mock_mlflow, mock_run):
+    from prompt_visualization.llm_engine import run_model_comparison
+    mock_client = mock_mlflow.tracking.MlflowClient.return_value
+    mock_client.create_run.side_effect = lambda experiment_id, run_name, tags: MagicMock(
+        info=MagicMock(run_id=run_name))
+    calls = []
+    def fake_run(raw_json_input, system_prompt, run_name, model_name, run_index=0, generation_config=None,
+                 parent_run_id=None, experiment_id=None):
+        calls.append((model_name, parent_run_id))
+        return {"status": "Pass", "output_text": "", "latency": 0.5 if model_name == "fast" else 2.0,
+                "parsed_output": ["x"], "usage": {"total_token_count": 10}}
+    mock_run.side_effect = fake_run
+
+    comparison = run_model_comparison("{}", "Prompt", "cmp", ["fast", "slow"], 3, max_concurrency=1)
+
+    assert comparison["parent_run_id"] == "cmp"
+    # One worker runs the queue in submission order: models alternate
+    assert [model for model, _ in calls] == ["fast", "slow"] * 3
+    assert {parent for model, parent in calls if model == "slow"} == {"cmp_slow"}
+    # The model runs are siblings under the comparison run
+    model_runs = [call for call in mock_client.create_run.call_args_list if call.kwargs["run_name"] != "cmp"]
+    assert [call.kwargs["tags"]["mlflow.parentRunId"] for call in model_runs] == ["cmp", "cmp"]
+    assert comparison["models"]["fast"]["summary"]["latency_p50"] == 0.5
+    assert comparison["models"]["slow"]["summary"]["total_tokens"] == 30
+    assert comparison["models"]["slow"]["summary"]["consistency_score"] == 1.0
+
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_batch_runs_are_logged_to_the_configured_experiment(mock_mlflow, mock_run, monkeypatch):
+    from prompt_visualization.llm_engine import configure_experiment
+    # Restored after the test
+    monkeypatch.setattr("prompt_visualization.llm_engine._experiment_id", None)
+    mock_mlflow.set_experiment.return_value.experiment_id = "5"
+    mock_run.return_value = {"status": "Pass", "output_text": "", "latency": 0.1, "parsed_output": ["x"]}
+    mock_client = mock_mlflow.tracking.MlflowClient.return_value
+
+    configure_experiment("sweeps")
+    run_prompt_batch("{}", "Prompt", "batch", "model", 2, max_concurrency=1)
+    run_prompt_batch("{}", "Prompt", "batch", "model", 1, experiment_id="9")
+
+    mock_mlflow.set_experiment.assert_called_once_with("sweeps")
+    assert [call.args[0] for call in mock_client.create_run.call_args_list] == ["5", "9"]
+    assert [call.kwargs["experiment_id"] for call in mock_run.call_args_list] == ["5", "5", "9"]
+
+@patch("prompt_visualization.llm_engine.run_prompt_experiment")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_batch_logs_aggregates_on_parent_run(mock_mlflow, mock_run):
+    mock_client = mock_mlflow.tracking.MlflowClient.return_value
+    mock_client.create_run.return_value.info.run_id = "batch_parent"
+    latencies = iter([1.0, 2.0, 3.0, 4.0])
+    def fake_run(raw_json_input, system_prompt, run_name, model_name, parent_run_id=None, **kwargs):
+        if run_name.endswith("_4"):
+            return {"status": "Fail", "output_text": "error", "latency": 0, "parent_run_id": parent_run_id}
+        return {"status": "Pass", "output_text": "", "latency": next(latencies), "parsed_output": ["x"],
+                "usage": {"total_token_count": 10}, "parent_run_id": parent_run_id}
+    mock_run.side_effect = fake_run
+
+    results = run_prompt_batch("{}", "Prompt", "batch", "model", 4, max_concurrency=1)
+
+    assert {r["parent_run_id"] for r in results} == {"batch_parent"}
+    assert mock_client.create_run.call_args.kwargs["run_name"] == "batch"
+    assert all(call.kwargs["parent_run_id"] == "batch_parent" for call in mock_run.call_args_list)
+    params, metrics = logged_batch(mock_mlflow)
+    assert params["num_runs"] == "4"
+    assert metrics["failure_rate"] == 0.25
+    assert metrics["latency_p50"] == 2.0
+    assert metrics["total_tokens"] == 30
+    # The failed run counts as an empty output
+    assert metrics["consistency_score"] == 0.5
+    mock_client.set_terminated.assert_called_once_with("batch_parent")
+
+@patch("llm_providers.google.genai")
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_experiment_archives_to_results_store(mock_mlflow, mock_genai, isolated_results_store):
+    run = mock_mlflow.start_run.return_value.__enter__.return_value
+    run.info.run_id = "archived_run"
+    run.info.experiment_id = "7"
+    mock_response = mock_genai.GenerativeModel.return_value.generate_content.return_value
+    mock_response.text = '{"result": "ok"}'
+    mock_response.usage_metadata.prompt_token_count = 1
+    mock_response.usage_metadata.candidates_token_count = 2
+    mock_response.usage_metadata.total_token_count = 3
+    mock_response.candidates[0].finish_reason.name = "STOP"
+    mock_response.prompt_feedback.safety_ratings = []
+
+    run_prompt_experiment("{}", "Prompt", "run", "gemini-pro")
+    history = isolated_results_store.query(experiment="7", prompt_hash=prompt_hash("Prompt"))
+
+    assert list(history["run_id"]) == ["archived_run"]
+    assert history["total_token_count"][0] == 3
+    assert history["finish_reason"][0] == "STOP"
+    assert history["output_text"][0] == '{"result": "ok"}'
+
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_experiment_streams_from_mock_provider(mock_mlflow):
+    mock_mlflow.start_run.return_value.__enter__.return_value.info.run_id = "mock_run"
+    get_engine().get_provider("mock").configure(latency=0.01, chunk_size=8, seed=3)
+    seen = []
+
+    result = run_prompt_experiment("{}", "Prompt", "run", "mock:mock-fast", stream=True, on_chunk=seen.append)
+
+    assert result["status"] == "Pass"
+    assert result["parsed_output"]["ingredient_composition"]
+    # Each callback gets the accumulated text
+    assert seen[-1] == result["output_text"]
+    assert len(seen) > 1
+    flush_artifacts()
+    _, metrics = logged_batch(mock_mlflow)
+    assert metrics["chunk_count"] == len(seen)
+    assert metrics["time_to_first_token"] > 0
+
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_batch_traces_every_stage(mock_mlflow):
+    from prompt_visualization.tracing import Trace
+    mock_client = mock_mlflow.tracking.MlflowClient.return_value
+    mock_client.create_run.return_value.info.run_id = "batch_parent"
+    mock_mlflow.start_run.return_value.__enter__.return_value.info.run_id = "child_run"
+    get_engine().get_provider("mock").configure(latency=0.01, latency_distribution="constant")
+    trace = Trace("batch")
+
+    run_prompt_batch("{}", "Prompt", "batch", "mock:mock-fast", 3, max_concurrency=3, trace=trace)
+
+    stages = trace.stage_totals()
+    assert stages["run"]["count"] == 3
+    assert stages["model_call"]["category"] == "model"
+    assert stages["model_call"]["count"] == 3
+    for stage in ("client", "parse", "mlflow.run", "mlflow.flush", "archive", "mlflow.upload_artifact",
+                  "mlflow.start_batch_run", "evaluate", "mlflow.finish_batch_run"):
+        assert stage in stages
+    assert trace.breakdown()["model"] >= 0.03
+    # Each run's stages sit in the run's lane
+    assert {row["lane"] for row in trace.waterfall() if row["stage"] == "model_call"} == {
+        "batch_run_1", "batch_run_2", "batch_run_3"}
+    _, metrics = logged_batch(mock_mlflow)
+    assert metrics["time_model"] >= 0.03
+    assert "time_tracking" in metrics and "time_wall" in metrics
+    assert any(call.args[0] == "batch_parent" and call.args[2] == "trace.json"
+               for call in mock_client.log_dict.call_args_list)
+
+@patch("prompt_visualization.llm_engine.mlflow")
+def test_run_prompt_batch_shares_context_cache(mock_mlflow):
+    mock_mlflow.tracking.MlflowClient.return_value.create_run.return_value.info.run_id = "batch_parent"
+    mock_mlflow.start_run.return_value.__enter__.return_value.info.run_id = "child_run"
+    provider = get_engine().get_provider("mock")
+    provider.configure(latency=0.0, latency_distribution="constant")
+    system_prompt = "Extract the recipe. " * 400  # ~2,000 tokens
+
+    with patch.object(provider, "create_context_cache", wraps=provider.create_context_cache) as create:
+        results = run_prompt_batch("{}", system_prompt, "batch", "mock:mock-fast", 3, max_concurrency=3)
+        run_prompt_batch("{}", system_prompt, "batch", "mock:mock-fast", 2)
+
+    # One cache for both batches; every run reads the system prompt from it
+    create.assert_called_once()
+    for result in results:
+        assert result["usage"]["cached_content_token_count"] == len(system_prompt) // 4
+        assert result["usage"]["prompt_token_count"] == len(system_prompt) // 4
+    flush_artifacts()
+    _, metrics = logged_batch(mock_mlflow)
+    assert metrics["uncached_prompt_token_count"] == 0
+    assert metrics["cached_prompt_tokens"] == 2 * (len(system_prompt) // 4)
+
+@patch("llm_providers.google.genai")
+def test_engine_builds_client_from_context_cache(mock_genai):
+    from llm_providers.base import ContextCache
+    handle = ContextCache("cachedContents/abc", "gemini-pro", "Google", resource=MagicMock())
+    engine = get_engine()
+
+    model = engine.get_model("gemini-pro", system_prompt="Prompt", context_cache=handle)
+
+    assert model is engine.get_model("gemini-pro", system_prompt="Prompt", context_cache=handle)
+    mock_genai.GenerativeModel.from_cached_content.assert_called_once_with(handle.resource)
+    mock_genai.GenerativeModel.assert_not_called()
@@ -77,4 +77,227 @@ def test_huggingface_provider_list(mock_hf_api):
         models = provider.list_models()
         
         assert len(models) == 1
-        assert models[0].name == "meta-llama/Llama-2-7b"
\ No newline at end of file
+        assert models[0].name == "meta-llama/Llama-2-7b"
+# --- Inference Tests ---
+def chat_completion_response(text, finish_reason="stop"):
+    response = MagicMock()
+    response.choices[0].message.content = text
+    response.choices[0].finish_reason = finish_reason
+    response.usage.prompt_tokens = 5
+    response.usage.completion_tokens = 7
+    response.usage.total_tokens = 12
+    return response
+
+@patch("llm_providers.google.genai")
+def test_google_provider_generate_normalizes_response(mock_genai):
+    with patch.dict(os.environ, {"GOOGLE_API_KEY": "fake_key"}):
+        mock_response = MagicMock()
+        mock_response.text = "hello"
+        mock_response.usage_metadata.prompt_token_count = 3
+        mock_response.usage_metadata.candidates_token_count = 4
+        mock_response.usage_metadata.total_token_count = 7
+        mock_response.candidates[0].finish_reason.name = "STOP"
+        mock_genai.GenerativeModel.return_value.generate_content.return_value = mock_response
+
+        provider = GoogleProvider()
+        first = provider.generate("gemini-pro", "hi", system_prompt="Be brief")
+        provider.generate("gemini-pro", "hi again", system_prompt="Be brief")
+
+        assert first.text == "hello"
+        assert first.usage == {"prompt_token_count": 3, "candidates_token_count": 4, "total_token_count": 7}
+        assert first.finish_reason == "STOP"
+        assert first.provider == "Google"
+        # The model client is built once and the system prompt goes in as a system instruction
+        mock_genai.GenerativeModel.assert_called_once_with("gemini-pro", system_instruction="Be brief")
+
+@patch("llm_providers.google.MAX_CACHED_MODELS", 2)
+@patch("llm_providers.google.genai")
+def test_google_provider_keeps_the_most_recently_used_models(mock_genai):
+    mock_genai.GenerativeModel.side_effect = lambda *args, **kwargs: MagicMock()
+    provider = GoogleProvider(api_key="key")
+    first = provider.get_model("gemini-pro", "prompt 1")
+    provider.get_model("gemini-pro", "prompt 2")
+    # Using the first model again makes the second the least recently used
+    assert provider.get_model("gemini-pro", "prompt 1") is first
+    provider.get_model("gemini-pro", "prompt 3")
+
+    assert len(provider._models) == 2
+    assert provider.get_model("gemini-pro", "prompt 1") is first
+    assert mock_genai.GenerativeModel.call_count == 3
+    provider.get_model("gemini-pro", "prompt 2")
+    assert mock_genai.GenerativeModel.call_count == 4
+    # Keys hold a hash of the prompt, not the prompt itself
+    assert all("prompt 2" not in key for key in provider._models)
+
+@patch("llm_providers.google.caching")
+@patch("llm_providers.google.genai")
+def test_google_provider_generates_from_context_cache(mock_genai, mock_caching):
+    with patch.dict(os.environ, {"GOOGLE_API_KEY": "fake_key"}):
+        cached = mock_caching.CachedContent.create.return_value
+        cached.name = "cachedContents/abc"
+        cached.usage_metadata.total_token_count = 2048
+        mock_response = mock_genai.GenerativeModel.from_cached_content.return_value.generate_content.return_value
+        mock_response.text = "hello"
+        mock_response.usage_metadata.prompt_token_count = 2050
+        mock_response.usage_metadata.candidates_token_count = 4
+        mock_response.usage_metadata.total_token_count = 2054
+        mock_response.usage_metadata.cached_content_token_count = 2048
+
+        provider = GoogleProvider()
+        handle = provider.create_context_cache("gemini-pro", "Be brief", ttl=300)
+        generation = provider.generate("gemini-pro", "hi", system_prompt="Be brief", context_cache=handle)
+
+        assert handle.name == "cachedContents/abc"
+        assert handle.token_count == 2048
+        assert 290 < handle.expires_in() <= 300
+        assert mock_caching.CachedContent.create.call_args.kwargs["system_instruction"] == "Be brief"
+        assert generation.usage["cached_content_token_count"] == 2048
+        # The system prompt is read from the cache, not sent again
+        mock_genai.GenerativeModel.from_cached_content.assert_called_once_with(cached)
+        mock_genai.GenerativeModel.assert_not_called()
+
+        provider.delete_context_cache(handle)
+        cached.delete.assert_called_once()
+
+def test_chat_completion_reports_cached_prompt_tokens():
+    from llm_providers.base import generation_from_chat_completion
+    response = chat_completion_response("hi")
+    response.usage.prompt_tokens_details.cached_tokens = 4
+
+    generation = generation_from_chat_completion(response, "openai/gpt-4", "OpenRouter", 0.1)
+
+    assert generation.usage["cached_content_token_count"] == 4
+    # Counts the API doesn't report are left out rather than guessed
+    assert "cached_content_token_count" not in generation_from_chat_completion(
+        chat_completion_response("hi"), "openai/gpt-4", "OpenRouter", 0.1).usage
+
+@patch("llm_providers.openrouter.OpenAI")
+def test_openrouter_provider_generate_uses_shared_client(mock_openai):
+    with patch.dict(os.environ, {"OPENROUTER_API_KEY": "fake_key"}):
+        mock_create = mock_openai.return_value.chat.completions.create
+        mock_create.return_value = chat_completion_response("hi", finish_reason="length")
+
+        provider = OpenRouterProvider()
+        results = provider.generate_batch("openai/gpt-4", ["a", "b", "c"], system_prompt="sys",
+                                          generation_config={"max_output_tokens": 10})
+
+        assert [r.text for r in results] == ["hi", "hi", "hi"]
+        assert results[0].finish_reason == "MAX_TOKENS"
+        assert results[0].usage["total_token_count"] == 12
+        mock_openai.assert_called_once()
+        kwargs = mock_create.call_args.kwargs
+        assert kwargs["max_tokens"] == 10
+        assert kwargs["messages"][0] == {"role": "system", "content": "sys"}
+
+@patch("llm_providers.openrouter.AsyncOpenAI")
+@patch("llm_providers.openrouter.OpenAI")
+def test_openrouter_async_client_is_kept_per_event_loop(mock_openai, mock_async_openai):
+    import asyncio
+    mock_async_openai.side_effect = lambda **kwargs: MagicMock()
+    with patch.dict(os.environ, {"OPENROUTER_API_KEY": "fake_key"}):
+        provider = OpenRouterProvider()
+
+    async def clients():
+        return provider.async_client, provider.async_client
+
+    first, again = asyncio.run(clients())
+    second, _ = asyncio.run(clients())
+
+    assert first is again
+    # A new loop (each asyncio.run) gets a client of its own
+    assert second is not first
+    assert mock_async_openai.call_count == 2
+
+@patch("llm_providers.openrouter.OpenAI")
+def test_generate_batch_reports_failures_in_order(mock_openai):
+    with patch.dict(os.environ, {"OPENROUTER_API_KEY": "fake_key"}):
+        def create(model, messages, **kwargs):
+            if messages[-1]["content"] == "bad":
+                raise RuntimeError("boom")
+            return chat_completion_response(messages[-1]["content"])
+        mock_openai.return_value.chat.completions.create.side_effect = create
+
+        results = OpenRouterProvider().generate_batch("m", ["ok", "bad", "fine"])
+
+        assert [r.text for r in results] == ["ok", "", "fine"]
+        assert results[1].error == "boom"
+        assert results[0].error is None
+
+@patch("llm_providers.huggingface.InferenceClient")
+@patch("llm_providers.huggingface.HfApi")
+def test_huggingface_provider_agenerate(mock_hf_api, mock_inference_client):
+    import asyncio
+    mock_inference_client.return_value.chat_completion.return_value = chat_completion_response("async hi")
+
+    result = asyncio.run(HuggingFaceProvider().agenerate("meta-llama/Llama-2-7b", "hi"))
+
+    assert result.text == "async hi"
+    assert result.finish_reason == "STOP"
+    assert result.provider == "HuggingFace"
+
+# --- Mock Provider Tests ---
+def test_mock_provider_is_deterministic():
+    from llm_providers.mock import MockProvider
+    first = MockProvider(latency=0, variability=0.5, seed=7)
+    second = MockProvider(latency=0, variability=0.5, seed=7)
+
+    texts = [first.generate("mock-fast", "{}").text for _ in range(5)]
+
+    assert texts == [second.generate("mock-fast", "{}").text for _ in range(5)]
+    assert len(set(texts)) > 1
+    assert get_provider("mock").display_name == "Mock"
+
+def test_mock_provider_simulates_retryable_errors():
+    from llm_providers.mock import MockProvider, MockProviderError
+    provider = MockProvider(latency=0, rate_limit_rate=1.0)
+    with pytest.raises(MockProviderError) as excinfo:
+        provider.generate("mock-fast", "{}")
+    assert excinfo.value.status_code == 429
+
+    provider.configure(rate_limit_rate=0.0, error_rate=1.0)
+    with pytest.raises(MockProviderError) as excinfo:
+        provider.generate("mock-fast", "{}")
+    assert excinfo.value.status_code == 503
+
+def test_mock_provider_streams_chunks():
+    import asyncio
+    from llm_providers.mock import MockProvider
+    provider = MockProvider(latency=0, chunk_size=10, seed=1)
+    chunks = []
+
+    generation = provider.stream("mock-fast", "{}", on_chunk=chunks.append)
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == generation.text
+    assert all(len(chunk) <= 10 for chunk in chunks)
+    async_chunks = []
+    provider.configure(seed=1)
+    asyncio.run(provider.astream("mock-fast", "{}", on_chunk=async_chunks.append))
+    assert async_chunks == chunks
+
+def test_mock_provider_rejects_unknown_options():
+    from llm_providers.mock import MockProvider
+    with pytest.raises(ValueError):
+        MockProvider().configure(colour="blue")
+    with pytest.raises(ValueError):
+        MockProvider(latency_distribution="pareto")
+
+def test_mock_provider_simulates_context_cache():
+    from llm_providers.mock import MockProvider, MockProviderError
+    provider = MockProvider(latency=0, latency_distribution="constant", prompt_latency=0.01)
+    system_prompt = "x" * 40_000  # 10,000 tokens, 0.1s of prefill
+
+    uncached = provider.generate("mock-fast", "{}", system_prompt)
+    handle = provider.create_context_cache("mock-fast", system_prompt, ttl=60)
+    cached = provider.generate("mock-fast", "{}", system_prompt, context_cache=handle)
+
+    assert "cached_content_token_count" not in uncached.usage
+    assert cached.usage["cached_content_token_count"] == 10_000
+    assert cached.usage["prompt_token_count"] == uncached.usage["prompt_token_count"]
+    assert uncached.latency >= 0.1
+    assert cached.latency < 0.01
+
+    provider.delete_context_cache(handle)
+    with pytest.raises(MockProviderError) as excinfo:
+        provider.generate("mock-fast", "{}", system_prompt, context_cache=handle)
+    assert excinfo.value.status_code == 404
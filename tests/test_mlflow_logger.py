@@ -0,0 +1,79 @@
+import threading
+from unittest.mock import MagicMock
+from prompt_visualization.mlflow_logger import (
+    ArtifactUploader, RunLogger, flush_artifacts, get_artifact_uploader, upload_group
+)
+
+def test_run_logger_sends_one_log_batch():
+    client = MagicMock()
+    run_logger = RunLogger(client, "run_1", uploader=ArtifactUploader())
+    run_logger.log_param("model_name", "gemini-pro")
+    run_logger.log_metric("latency", 1.25)
+    run_logger.log_metrics({"prompt_token_count": 10, "unknown": None})
+    run_logger.set_tag("batch", "b1")
+    run_logger.flush()
+
+    client.log_batch.assert_called_once()
+    kwargs = client.log_batch.call_args.kwargs
+    assert [(p.key, p.value) for p in kwargs["params"]] == [("model_name", "gemini-pro")]
+    assert {m.key: m.value for m in kwargs["metrics"]} == {"latency": 1.25, "prompt_token_count": 10.0}
+    assert [(t.key, t.value) for t in kwargs["tags"]] == [("batch", "b1")]
+
+    # Nothing buffered, nothing sent
+    run_logger.flush()
+    client.log_batch.assert_called_once()
+
+def test_run_logger_splits_params_over_api_limit():
+    client = MagicMock()
+    run_logger = RunLogger(client, "run_1", uploader=ArtifactUploader())
+    for i in range(150):
+        run_logger.log_param(f"param_{i}", i)
+    run_logger.flush()
+
+    assert client.log_batch.call_count == 2
+
+def test_artifact_uploader_flush_waits_for_uploads():
+    uploaded = []
+    release = threading.Event()
+    def slow_upload(run_id, text, artifact_file):
+        release.wait(1)
+        uploaded.append(artifact_file)
+    uploader = ArtifactUploader(max_backlog=4)
+    uploader.submit(slow_upload, "run_1", "text", "a.txt")
+    uploader.submit(slow_upload, "run_1", "text", "b.txt")
+    release.set()
+
+    assert uploader.flush() == []
+    assert sorted(uploaded) == ["a.txt", "b.txt"]
+    uploader.close()
+
+def test_artifact_uploader_reports_errors():
+    def failing_upload(run_id, text, artifact_file):
+        raise IOError("tracking server unavailable")
+    uploader = ArtifactUploader()
+    uploader.submit(failing_upload, "run_1", "text", "a.txt")
+
+    errors = uploader.flush()
+    assert len(errors) == 1
+    assert uploader.flush() == []
+    uploader.close()
+
+def test_upload_group_flush_waits_only_for_its_own_uploads():
+    release = threading.Event()
+    def slow_upload(run_id, text, artifact_file):
+        release.wait(5)
+    def failing_upload(run_id, text, artifact_file):
+        raise IOError("tracking server unavailable")
+    uploader = get_artifact_uploader()
+    # Another session's upload, stuck on a slow tracking server
+    with upload_group():
+        other = uploader.submit(slow_upload, "run_1", "text", "slow.txt")
+
+    with upload_group() as group:
+        uploader.submit(failing_upload, "run_2", "text", "a.txt")
+        assert len(flush_artifacts()) == 1
+        assert not other.done()
+        assert group.wait() == []
+    release.set()
+    other.result(timeout=5)
+    assert uploader.flush() == []
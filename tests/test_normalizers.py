@@ -0,0 +1,47 @@
+import pytest
+from prompt_visualization.normalizers import SchemaNormalizer, compile_selector, parse_field_specs
+
+ORDER = {
+    "customer": {"name": "Ada", "tags": ["VIP", "early"]},
+    "items": [
+        {"sku": "A1", "name": "Widget", "options": {"color": "Red"}},
+        {"sku": "B2", "name": "Gadget ", "options": {"color": "blue"}},
+    ],
+}
+
+@pytest.mark.parametrize("expression, expected", [
+    ("$.customer.name", ["Ada"]),
+    ("customer.name", ["Ada"]),
+    ("$['customer'][\"tags\"]", [["VIP", "early"]]),
+    ("$.items[*].sku", ["A1", "B2"]),
+    ("$.items.*.sku", ["A1", "B2"]),
+    ("$.items[-1].sku", ["B2"]),
+    ("$..color", ["Red", "blue"]),
+    ("$.items[5].sku", []),
+    ("$.missing[*].name", []),
+])
+def test_compile_selector(expression, expected):
+    assert compile_selector(expression)(ORDER) == expected
+
+def test_compile_selector_is_cached_and_rejects_bad_syntax():
+    assert compile_selector("$.items[*].sku") is compile_selector("$.items[*].sku")
+    with pytest.raises(ValueError, match="position"):
+        compile_selector("$.items[*")
+
+def test_schema_normalizer_fields_are_sorted_unique_and_lowercased():
+    normalizer = SchemaNormalizer({"items": "$.items[*].name", "tags": "$.customer.tags"})
+
+    assert normalizer.normalize_fields(ORDER) == {"items": ["gadget", "widget"], "tags": ["early", "vip"]}
+    assert normalizer(ORDER) == ["items=gadget", "items=widget", "tags=early", "tags=vip"]
+    assert normalizer(None) == []
+
+def test_single_field_normalizer_returns_plain_values():
+    normalizer = SchemaNormalizer({"colors": ["$..color", "$.customer.name"]}, case_sensitive=True)
+
+    assert normalizer(ORDER) == ["Ada", "Red", "blue"]
+
+def test_parse_field_specs():
+    assert parse_field_specs(["items=$.items[*].name", " ", "items = $..sku", "$.customer.name"]) == {
+        "items": ["$.items[*].name", "$..sku"],
+        "$.customer.name": ["$.customer.name"],
+    }
@@ -0,0 +1,32 @@
+import pytest
+from prompt_visualization.response_cache import ResponseCache
+
+def test_make_key_depends_on_every_input():
+    base = ResponseCache.make_key("model", "prompt", "{}", None, 0)
+    assert base == ResponseCache.make_key("model", "prompt", "{}", None, 0)
+    assert base != ResponseCache.make_key("other", "prompt", "{}", None, 0)
+    assert base != ResponseCache.make_key("model", "prompt", "{}", {"temperature": 0}, 0)
+    assert base != ResponseCache.make_key("model", "prompt", "{}", None, 1)
+
+def test_put_and_get_round_trip(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"))
+    record = {"text": "hello", "latency": 1.5, "usage": None}
+    cache.put("key", record, model_name="model")
+
+    assert cache.get("key") == record
+    assert cache.get("missing") is None
+
+def test_evicts_least_recently_used_past_size_bound(tmp_path):
+    cache = ResponseCache(path=str(tmp_path / "cache.sqlite"), max_bytes=100)
+    cache.put("a", {"text": "x" * 30})
+    cache.put("b", {"text": "y" * 30})
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.put("c", {"text": "z" * 30})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+def test_unknown_mode_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ResponseCache(path=str(tmp_path / "cache.sqlite"), mode="sometimes")
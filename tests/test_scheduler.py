@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from prompt_visualization.scheduler import (
+    AIMDLimiter, CallStats, ProviderScheduler, RetryPolicy, TokenBucket, is_retryable_error
+)
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+def make_scheduler(**kwargs):
+    return ProviderScheduler(retry_policy=RetryPolicy(max_retries=3, base_delay=0.001, max_delay=0.01), **kwargs)
+
+def test_is_retryable_error():
+    assert is_retryable_error(FakeAPIError(429))
+    assert is_retryable_error(FakeAPIError(503))
+    assert not is_retryable_error(FakeAPIError(400))
+    assert not is_retryable_error(ValueError("bad input"))
+
+def test_token_bucket_reports_wait_once_empty():
+    bucket = TokenBucket(rate_per_minute=60, capacity=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # Third request has to wait roughly one second for a token at 1 token/s
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+
+def test_call_retries_rate_limits_and_records_stats():
+    attempts = []
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeAPIError(429)
+        return "ok"
+    scheduler = make_scheduler()
+    stats = CallStats()
+
+    assert scheduler.call(flaky, stats=stats) == "ok"
+    assert stats.retries == 2
+    assert stats.rate_limited == 2
+    assert stats.throttle_time > 0
+    assert scheduler.limiter.in_flight == 0
+
+def test_call_does_not_retry_client_errors():
+    calls = []
+    def bad_request():
+        calls.append(1)
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        make_scheduler().call(bad_request)
+    assert len(calls) == 1
+
+def test_acall_gives_up_after_max_retries():
+    async def unavailable():
+        raise FakeAPIError(503)
+    stats = CallStats()
+
+    with pytest.raises(FakeAPIError):
+        asyncio.run(make_scheduler().acall(unavailable, stats=stats))
+    assert stats.retries == 3
+
+def test_aimd_limiter_halves_on_throttle_and_recovers():
+    limiter = AIMDLimiter(max_limit=8)
+    limiter.acquire()
+    limiter.release(throttled=True)
+    assert limiter.limit == 4
+
+    for _ in range(8):
+        limiter.acquire()
+        limiter.release()
+    assert 5 <= limiter.limit <= 8
+
+def test_final_rate_limit_is_recorded_before_it_is_raised():
+    async def throttled():
+        raise FakeAPIError(429)
+    scheduler = ProviderScheduler(retry_policy=RetryPolicy(max_retries=0), limiter=AIMDLimiter(max_limit=8))
+    stats = CallStats()
+
+    with pytest.raises(FakeAPIError):
+        asyncio.run(scheduler.acall(throttled, stats=stats))
+    assert stats.rate_limited == 1
+    assert scheduler.limiter.limit == 4
+
+def test_async_waiters_are_woken_by_release():
+    limiter = AIMDLimiter(max_limit=1)
+
+    async def scenario():
+        await limiter.acquire_async()
+        waiter = asyncio.create_task(limiter.acquire_async())
+        await asyncio.sleep(0)
+        assert not waiter.done() and len(limiter._async_waiters) == 1
+        # Released from another thread, as the sync path does
+        await asyncio.to_thread(limiter.release)
+        await asyncio.wait_for(waiter, timeout=1)
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+import gc
+import os
+import pytest
+from unittest.mock import patch
+from prompt_visualization.diffing import DiffMemo, diff_runs
+from prompt_visualization.session_store import ResultBatch, SessionResultStore
+
+def result(i, text=None, status="Pass"):
+    return {"status": status, "output_text": text if text is not None else f'{{"n": {i}}}', "latency": i / 10,
+            "run_id": f"run_{i}", "cache_hit": False, "parsed_output": {"n": i},
+            "usage": {"prompt_token_count": 10, "candidates_token_count": 5, "total_token_count": 15},
+            "parent_run_id": "parent"}
+
+@pytest.fixture
+def store(tmp_path):
+    store = SessionResultStore(root=str(tmp_path), max_batches=2)
+    yield store
+    store.close()
+
+def test_results_read_back_like_dictionaries(store):
+    failed = {"status": "Fail", "output_text": "boom", "latency": 0, "parent_run_id": "parent"}
+    batch = store.put("batch", [result(1), failed])
+
+    assert len(batch) == 2
+    first, second = batch
+    assert first.to_dict() == result(1)
+    assert first["status"] == "Pass" and first["latency"] == 0.1
+    assert first.get("parsed_output") == {"n": 1}
+    assert batch[-1]["output_text"] == "boom"
+    # Missing keys behave as on the original dictionary
+    assert "run_id" not in second
+    assert second.get("parsed_output") is None
+    with pytest.raises(KeyError):
+        second["usage"]
+    assert batch.by_run_id("run_1")["output_text"] == '{"n": 1}'
+    assert batch.by_run_id("missing") is None
+
+def test_output_is_spilled_and_previewed_lazily(store):
+    text = "ü" * 10_000
+    batch = store.put("batch", [result(1, text=text)])
+
+    # Only arrays and run IDs stay in memory; the text is in the batch's file
+    assert os.path.getsize(batch.path) > len(text)
+    assert batch[0].preview(5) == "üüüüü"
+    assert batch[0]["output_text"] == text
+
+def test_least_recently_used_batch_is_evicted(store):
+    first = store.put("a", [result(1)])
+    store.put("b", [result(2)])
+    store.get("a")
+    store.put("c", [result(3)])
+
+    assert "a" in store and "c" in store and "b" not in store
+    assert len(store) == 2
+    assert os.path.exists(first.path)
+    assert len(os.listdir(store.directory)) == 2
+
+def test_session_directory_removed_with_the_store(tmp_path):
+    store = SessionResultStore(root=str(tmp_path))
+    store.put("batch", [result(1)])
+    directory = store.directory
+    assert os.path.isdir(directory)
+
+    del store
+    gc.collect()
+
+    assert not os.path.exists(directory)
+
+def test_stored_results_can_be_diffed(store):
+    batch = store.put("batch", [result(1), result(2)])
+
+    hunks = diff_runs(batch[0], batch[1], memo=DiffMemo())
+
+    assert [(h["kind"], h["path"]) for h in hunks] == [("changed", "$.n")]
+
+def test_columns_are_decoded_once(store):
+    batch = store.put("batch", [result(1), {"status": "Fail", "output_text": "", "latency": 0}])
+
+    assert batch.column("parsed_output") == [{"n": 1}, None]
+    assert batch.column("run_id") == ["run_1", None]
+    with patch.object(ResultBatch, "_extras", side_effect=AssertionError("decoded again")):
+        assert batch.column("parsed_output") == [{"n": 1}, None]
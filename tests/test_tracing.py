@@ -0,0 +1,92 @@
+import contextvars
+import pstats
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from prompt_visualization.tracing import (
+    ENGINE, MODEL, TRACKING, Trace, current_trace, profiled, profiling, span, tracing
+)
+
+def test_span_outside_a_trace_records_nothing():
+    with span("stage") as recorded:
+        assert recorded is None
+    assert current_trace() is None
+
+def test_breakdown_uses_self_time():
+    trace = Trace("batch")
+    with tracing(trace, "run"):
+        assert current_trace() is trace
+        with span("model_call", MODEL):
+            time.sleep(0.02)
+        with span("mlflow.flush", TRACKING):
+            time.sleep(0.01)
+
+    breakdown = trace.breakdown()
+    assert breakdown[MODEL] == pytest.approx(0.02, abs=0.01)
+    assert breakdown[TRACKING] == pytest.approx(0.01, abs=0.01)
+    # The run itself only did the bookkeeping between its stages
+    assert breakdown[ENGINE] < 0.005
+    assert list(trace.stage_totals())[0] == "model_call"
+    assert trace.as_metrics()["time_wall"] >= 0.03
+
+def test_spans_follow_the_context_into_worker_threads():
+    trace = Trace("batch")
+
+    def run(index):
+        with span("run", lane=f"run_{index}"), span("model_call", MODEL):
+            time.sleep(0.02)
+        return threading.current_thread().name
+
+    with tracing(trace, "batch"):
+        with ThreadPoolExecutor(max_workers=4, thread_name_prefix="worker") as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run, i) for i in range(4)]
+            threads = {future.result() for future in futures}
+
+    rows = trace.waterfall()
+    assert rows[0]["stage"] == "batch" and rows[0]["depth"] == 0
+    runs = [row for row in rows if row["stage"] == "run"]
+    assert sorted(row["lane"] for row in runs) == ["run_0", "run_1", "run_2", "run_3"]
+    assert all(row["depth"] == 1 for row in runs)
+    # Calls inherit their run's lane
+    assert {row["lane"] for row in rows if row["stage"] == "model_call"} == {"run_0", "run_1", "run_2", "run_3"}
+    # Waiting on concurrent runs isn't counted as the batch's own time
+    assert trace.breakdown()[MODEL] == pytest.approx(0.08, abs=0.03)
+    assert trace.breakdown()[ENGINE] < 0.01
+    assert {row["thread"] for row in runs} == threads
+
+def test_failed_span_is_recorded_with_its_error():
+    trace = Trace("batch")
+    with pytest.raises(ValueError):
+        with tracing(trace, "run"), span("parse"):
+            raise ValueError("bad")
+    assert {s.name: s.attributes.get("error") for s in trace.spans} == {"parse": "ValueError", "run": "ValueError"}
+
+def test_chrome_trace_export():
+    trace = Trace("batch")
+    with tracing(trace, "batch"), span("model_call", MODEL, retries=2):
+        pass
+
+    exported = trace.to_chrome_trace()
+    events = [e for e in exported["traceEvents"] if e["ph"] == "X"]
+    assert [e["name"] for e in events] == ["batch", "model_call"]
+    assert events[1]["cat"] == MODEL
+    assert events[1]["args"]["retries"] == "2"
+    assert any(e["ph"] == "M" and e["args"]["name"] == "MainThread" for e in exported["traceEvents"])
+
+def test_profiling_covers_worker_threads(tmp_path):
+    def busy_worker_function():
+        return sum(i * i for i in range(10000))
+
+    def run():
+        with profiled():
+            return busy_worker_function()
+
+    path = tmp_path / "sweep.prof"
+    with profiling(str(path)):
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run) for _ in range(2)]
+            [future.result() for future in futures]
+
+    functions = {name for _, _, name in pstats.Stats(str(path)).stats}
+    assert "busy_worker_function" in functions
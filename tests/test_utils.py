@@ -1,4 +1,5 @@
-from prompt_visualization.utils import get_clean_json
+import pytest
+from prompt_visualization.utils import JSONStreamExtractor, extract_json, find_json, get_clean_json
 
 def test_get_clean_json_valid():
     raw = '{"key": "value"}'
@@ -15,4 +16,51 @@ def test_get_clean_json_invalid_json():
 def test_get_clean_json_non_string():
     assert get_clean_json(None) is None
     assert get_clean_json(123) is None
-    assert get_clean_json({}) is None
\ No newline at end of file
+    assert get_clean_json({}) is None
+@pytest.mark.parametrize("raw, expected", [
+    ('Sure! Here is the JSON:\n{"key": "value"}\nLet me know if you need more.', {"key": "value"}),
+    ('```\n[1, 2]\n```', [1, 2]),
+    ('See [note] below.\n```json\n{"key": [1, {"b": "}"}]}\n```\nDone.', {"key": [1, {"b": "}"}]}),
+    ('[sic] the answer is {"key": "value"}', {"key": "value"}),
+    ('```json\n42\n```', 42),
+    ('The answer is 42', None),
+    # A fence with no JSON after it doesn't open a block
+    ('{"a": 1}\n```', {"a": 1}),
+    ('Result:\n{"a": 1}\n```\nNote: ```x```', {"a": 1}),
+    ('{"a": "```"}', {"a": "```"}),
+])
+def test_extract_json_skips_fences_and_chatter(raw, expected):
+    assert extract_json(raw) == expected
+
+def test_find_json_returns_the_span():
+    raw = 'Output: {"a": 1} done'
+    value, start, end = find_json(raw)
+    assert value == {"a": 1}
+    assert raw[start:end] == '{"a": 1}'
+
+@pytest.mark.parametrize("raw", [
+    '```json\n{"items": [{"name": "x}\\"y"}, {"name": "z"}]}\n```',
+    'Here you go: [note] then ```json {"a": 1}``` bye',
+    '{"key": "value"',
+    '{ broken [1, 2]',
+    '"just a string"',
+    'no json',
+    '{"a": 1}\n```',
+    'Result:\n{"a": 1}\n```\nNote: ```x```',
+    '[sic] {"a": "```"} then ```json\n{"b": 2}\n```',
+    '42\n```',
+])
+@pytest.mark.parametrize("chunk_size", [1, 3, 7])
+def test_stream_extractor_matches_extract_json(raw, chunk_size):
+    extractor = JSONStreamExtractor()
+    for i in range(0, len(raw), chunk_size):
+        extractor.feed(raw[i:i + chunk_size])
+
+    assert extractor.text == raw
+    assert extractor.finish() == extract_json(raw)
+
+def test_stream_extractor_reports_a_complete_value_early():
+    extractor = JSONStreamExtractor()
+    assert extractor.feed('{"a": ') is False
+    assert extractor.feed('1} and some trailing text') is True
+    assert extractor.finish() == {"a": 1}